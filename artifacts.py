@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+"""
+Almacén de artefactos por estudiante con un índice único
+
+Dónde vive cada archivo de un estudiante depende del layout de scores/:
+  flat     (por omisión) todo en scores/, como siempre
+  sharded  scores/<aa>/<id>/, con aa = dos primeros dígitos hex de sha1(id)
+           (256 directorios; ninguno crece con el tamaño del grupo)
+Los nombres de archivo son los mismos en ambos layouts. El layout se guarda en
+scores/.layout (ARTIFACT_LAYOUT=sharded lo elige para un scores/ nuevo;
+`migrate` convierte uno existente).
+
+scores/.index.sqlite mapea (estudiante, tipo) → ruta, tamaño, sha256 y mtime.
+Los lectores (consolidación, estadísticas, bind, replay, uso del LLM, consenso)
+listan con el índice en lugar de hacer glob sobre scores/. Se actualiza cada
+vez que una etapa se registra en el manifiesto, pero no todos los escritores lo
+hacen (test.sh, generate_report.py o generate_pdf.py sueltos): antes de cada
+lectura se compara el mtime de los directorios de artefactos con el último
+registrado (tabla dirs) y solo los que cambiaron se vuelven a listar. Un
+directorio modificado hace menos de RACY_SECONDS no se da por sincronizado,
+para no perder un archivo creado en el mismo tick del reloj.
+
+Uso:
+  python3 artifacts.py dir msc25ahl           # directorio de artefactos del estudiante
+  python3 artifacts.py index msc25ahl         # re-indexar a un estudiante
+  python3 artifacts.py reindex                # re-indexar todo scores/
+  python3 artifacts.py ls report              # rutas de un tipo de artefacto
+  python3 artifacts.py migrate sharded        # mover scores/ plano a shards
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+LAYOUT_FILE = '.layout'
+INDEX_FILE = '.index.sqlite'
+LAYOUTS = ('flat', 'sharded')
+
+# Tipo de artefacto → nombre de archivo dentro del directorio del estudiante
+KINDS = {
+    'scores': '{id}.json',
+    'tests': '{id}.csv',
+    'evaluation': 'evaluation_results_{id}.json',
+    'report': 'final_report_{id}.pdf',
+    'calificaciones': 'calificaciones_{id}.pdf',
+    'testing': 'testing_{id}.pdf',
+    'test_outputs': 'test_outputs_{id}.txt',
+    'style': 'style_{id}.json',
+    'llm_usage': 'llm_usage_{id}.json',
+    'consensus': 'consensus_{id}.json',
+    'fuzz': 'fuzz_{id}.json',
+    'libtest': 'libtest_{id}.json',
+    'corpus': os.path.join('.corpus', '{id}.tar.gz'),
+}
+
+# Archivos de todo el grupo en scores/ que no son de un estudiante
+COHORT_FILES = {'cohort_stats.json', 'cohort_stats.csv', 'student_scores.csv', 'evaluation_results.csv',
+                'all_scores_merged.csv', 'scores_summary.csv', 'similarity_report.json', 'similarity_pairs.csv', 'llm_usage_summary.json',
+                'consensus_review.csv', 'replay_diff.csv', 'bench_results.json'}
+
+# Un directorio con mtime más reciente que esto se vuelve a listar en la siguiente lectura
+RACY_SECONDS = 2
+
+KIND_PATTERNS = [(kind, re.compile('^' + re.escape(pattern).replace(re.escape('{id}'), '(?P<id>.+)') + '$'))
+                 for kind, pattern in KINDS.items()]
+CORPUS_PATTERN = dict(KIND_PATTERNS)['corpus']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    student_id TEXT NOT NULL,
+    kind       TEXT NOT NULL,
+    path       TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    sha256     TEXT NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    PRIMARY KEY (student_id, kind)
+);
+CREATE INDEX IF NOT EXISTS artifacts_kind ON artifacts (kind, student_id);
+CREATE TABLE IF NOT EXISTS dirs (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+_layouts = {}
+_lock = threading.Lock()
+
+
+def layout(scores_dir='scores'):
+    """'flat' o 'sharded' según scores/.layout (o ARTIFACT_LAYOUT si no existe)"""
+    key = os.path.abspath(scores_dir)
+    with _lock:
+        if key not in _layouts:
+            try:
+                with open(os.path.join(scores_dir, LAYOUT_FILE), 'r', encoding='utf-8') as f:
+                    _layouts[key] = f.read().strip()
+            except FileNotFoundError:
+                _layouts[key] = os.environ.get('ARTIFACT_LAYOUT', 'flat')
+            if _layouts[key] not in LAYOUTS:
+                raise ValueError(f"Layout desconocido en {scores_dir}: {_layouts[key]}")
+        return _layouts[key]
+
+
+def shard(student_id):
+    return hashlib.sha1(student_id.encode('utf-8')).hexdigest()[:2]
+
+
+def student_dir(scores_dir, student_id, layout_name=None):
+    """Directorio de artefactos de un estudiante"""
+    if (layout_name or layout(scores_dir)) == 'sharded':
+        return os.path.join(scores_dir, shard(student_id), student_id)
+    return scores_dir
+
+
+def artifact_path(scores_dir, student_id, kind, layout_name=None):
+    """Ruta donde se escribe (o se lee) un artefacto"""
+    return os.path.join(student_dir(scores_dir, student_id, layout_name), KINDS[kind].format(id=student_id))
+
+
+def _hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _connect(scores_dir):
+    os.makedirs(scores_dir, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(scores_dir, INDEX_FILE), timeout=60, isolation_level=None)
+    connection.execute('PRAGMA busy_timeout = 60000')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _student_rows(connection, scores_dir, student_id):
+    """Filas actuales de un estudiante y tipos que ya no están en disco: un stat por tipo, sha256 solo si cambió"""
+    known = {kind: (size, mtime_ns, sha256) for kind, size, mtime_ns, sha256 in connection.execute(
+        'SELECT kind, size, mtime_ns, sha256 FROM artifacts WHERE student_id = ?', (student_id,))}
+    rows, missing = [], []
+    for kind in KINDS:
+        path = artifact_path(scores_dir, student_id, kind)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if kind in known:
+                missing.append(kind)
+            continue
+        previous = known.get(kind)
+        if previous and previous[:2] == (stat.st_size, stat.st_mtime_ns):
+            digest = previous[2]
+        else:
+            digest = _hash(path)
+        rows.append((student_id, kind, os.path.relpath(path, scores_dir), stat.st_size, digest, stat.st_mtime_ns))
+    return rows, missing
+
+
+def index_student(scores_dir, student_id):
+    """Actualiza las entradas de un estudiante: un stat por tipo, sha256 solo si cambió el archivo"""
+    connection = _connect(scores_dir)
+    try:
+        rows, missing = _student_rows(connection, scores_dir, student_id)
+        connection.execute('BEGIN IMMEDIATE')
+        connection.executemany('INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)', rows)
+        connection.executemany('DELETE FROM artifacts WHERE student_id = ? AND kind = ?',
+                               [(student_id, kind) for kind in missing])
+        connection.execute('COMMIT')
+    finally:
+        connection.close()
+    return len(rows)
+
+
+def classify(name):
+    """(student_id, tipo) de un nombre de archivo en scores/ plano, o None
+
+    Solo por el patrón del nombre (KINDS); los archivos del grupo (COHORT_FILES)
+    no son de ningún estudiante.
+    """
+    if name in COHORT_FILES:
+        return None
+    for kind, pattern in KIND_PATTERNS:
+        match = pattern.match(name)
+        # '{id}.json' también coincide con evaluation_results_<id>.json y similares
+        if match and not (kind in ('scores', 'tests') and any(
+                other.match(name) for other_kind, other in KIND_PATTERNS if other_kind not in ('scores', 'tests'))):
+            return match.group('id'), kind
+    return None
+
+
+def artifact_dirs(scores_dir):
+    """{directorio relativo a scores/: mtime_ns} de los directorios donde puede haber artefactos"""
+    found = {}
+
+    def add(rel):
+        try:
+            found[rel] = os.stat(os.path.join(scores_dir, rel)).st_mtime_ns
+        except FileNotFoundError:
+            pass
+
+    if layout(scores_dir) == 'flat':
+        add('.')
+        add('.corpus')
+        return found
+    add('.')
+    for entry in os.scandir(scores_dir):
+        if entry.is_dir() and len(entry.name) == 2 and not entry.name.startswith('.'):
+            found[entry.name] = entry.stat().st_mtime_ns
+            for student in os.scandir(entry.path):
+                if student.is_dir():
+                    rel = os.path.join(entry.name, student.name)
+                    found[rel] = student.stat().st_mtime_ns
+                    add(os.path.join(rel, '.corpus'))
+    return found
+
+
+def _dir_artifacts(scores_dir, rel):
+    """{(student_id, tipo): ruta relativa} de los artefactos que hay en un directorio"""
+    directory = os.path.join(scores_dir, rel)
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return {}
+    parts = os.path.normpath(rel).split(os.sep)
+    if parts[-1] == '.corpus':
+        owner = parts[-2] if len(parts) == 3 else None
+        found = {}
+        for name in names:
+            match = CORPUS_PATTERN.match(os.path.join('.corpus', name))
+            if match and (owner is None or match.group('id') == owner):
+                found[(match.group('id'), 'corpus')] = os.path.normpath(os.path.join(rel, name))
+        return found
+    if parts == ['.']:
+        if layout(scores_dir) == 'sharded':
+            return {}
+        return {key: name for name in names
+                if (key := classify(name)) and key[1] != 'corpus'}
+    if len(parts) == 2:
+        # scores/<aa>/<id>/: cada tipo tiene un nombre fijo para ese estudiante
+        student_id = parts[1]
+        present = set(names)
+        return {(student_id, kind): os.path.join(rel, pattern.format(id=student_id))
+                for kind, pattern in KINDS.items() if kind != 'corpus' and pattern.format(id=student_id) in present}
+    return {}
+
+
+def _sync(connection, scores_dir):
+    """Vuelve a listar los directorios cuyo mtime cambió desde la última lectura; regresa cuántos"""
+    current = artifact_dirs(scores_dir)
+    recorded = dict(connection.execute('SELECT path, mtime_ns FROM dirs'))
+    if all(recorded.get(rel) == mtime_ns for rel, mtime_ns in current.items()) and set(recorded) <= set(current):
+        return 0
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        # Otro lector pudo sincronizar mientras esperábamos el lock
+        recorded = dict(connection.execute('SELECT path, mtime_ns FROM dirs'))
+        changed = {rel for rel, mtime_ns in current.items() if recorded.get(rel) != mtime_ns} | (set(recorded) - set(current))
+        indexed = {}
+        if changed:
+            for student_id, kind, path, size, mtime_ns, sha256 in connection.execute(
+                    'SELECT student_id, kind, path, size, mtime_ns, sha256 FROM artifacts'):
+                rel = os.path.dirname(path) or '.'
+                if rel in changed:
+                    indexed[(student_id, kind)] = (path, size, mtime_ns, sha256)
+        on_disk = {}
+        for rel in changed:
+            on_disk.update(_dir_artifacts(scores_dir, rel))
+        rows = []
+        for key, path in on_disk.items():
+            try:
+                stat = os.stat(os.path.join(scores_dir, path))
+            except FileNotFoundError:
+                continue
+            previous = indexed.get(key)
+            if previous and previous[:3] == (path, stat.st_size, stat.st_mtime_ns):
+                continue
+            rows.append(key + (path, stat.st_size, _hash(os.path.join(scores_dir, path)), stat.st_mtime_ns))
+        connection.executemany('INSERT OR REPLACE INTO artifacts VALUES (?, ?, ?, ?, ?, ?)', rows)
+        connection.executemany('DELETE FROM artifacts WHERE student_id = ? AND kind = ? AND path = ?',
+                               [key + (value[0],) for key, value in indexed.items() if key not in on_disk])
+        # Un directorio recién modificado queda registrado con -1: se vuelve a listar en la siguiente lectura
+        settled = time.time_ns() - RACY_SECONDS * 1_000_000_000
+        connection.executemany('DELETE FROM dirs WHERE path = ?', [(rel,) for rel in changed])
+        connection.executemany('INSERT INTO dirs VALUES (?, ?)',
+                               [(rel, current[rel] if current[rel] < settled else -1) for rel in changed if rel in current])
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return len(changed)
+
+
+def scan_students(scores_dir):
+    """IDs con algún artefacto en disco (un listdir por directorio; para migrate)"""
+    found = set()
+    if not os.path.isdir(scores_dir):
+        return found
+    if layout(scores_dir) == 'sharded':
+        for entry in os.scandir(scores_dir):
+            if entry.is_dir() and len(entry.name) == 2 and not entry.name.startswith('.'):
+                found.update(student.name for student in os.scandir(entry.path) if student.is_dir())
+        return found
+    return {student_id for student_id, _ in
+            list(_dir_artifacts(scores_dir, '.')) + list(_dir_artifacts(scores_dir, '.corpus'))}
+
+
+def reindex(scores_dir='scores'):
+    """Reconstruye el índice completo a partir de lo que hay en disco; regresa (artefactos, estudiantes)"""
+    connection = _connect(scores_dir)
+    try:
+        connection.execute('BEGIN IMMEDIATE')
+        connection.execute('DELETE FROM artifacts')
+        connection.execute('DELETE FROM dirs')
+        connection.execute('COMMIT')
+        _sync(connection, scores_dir)
+        artifacts, students = connection.execute('SELECT COUNT(*), COUNT(DISTINCT student_id) FROM artifacts').fetchone()
+    finally:
+        connection.close()
+    return artifacts, students
+
+
+def list_artifacts(scores_dir, kind, students=None):
+    """[(student_id, ruta)] de un tipo de artefacto, ordenados por estudiante"""
+    if not os.path.isdir(scores_dir):
+        return []
+    connection = _connect(scores_dir)
+    try:
+        _sync(connection, scores_dir)
+        rows = connection.execute('SELECT student_id, path FROM artifacts WHERE kind = ? ORDER BY student_id',
+                                  (kind,)).fetchall()
+    finally:
+        connection.close()
+    return [(student_id, os.path.join(scores_dir, path)) for student_id, path in rows
+            if not students or student_id in students]
+
+
+def lookup(scores_dir, student_id, kind):
+    """Ruta indexada de un artefacto, o None"""
+    if not os.path.isdir(scores_dir):
+        return None
+    connection = _connect(scores_dir)
+    try:
+        _sync(connection, scores_dir)
+        row = connection.execute('SELECT path FROM artifacts WHERE student_id = ? AND kind = ?',
+                                 (student_id, kind)).fetchone()
+    finally:
+        connection.close()
+    return os.path.join(scores_dir, row[0]) if row else None
+
+
+def _remove_empty(directory, with_parents):
+    """Borra .corpus/ y .manifest/ (y en sharded el directorio del estudiante y su shard) si quedaron vacíos"""
+    paths = [os.path.join(directory, '.corpus'), os.path.join(directory, '.manifest')]
+    if with_parents:
+        paths += [directory, os.path.dirname(directory)]
+    for path in paths:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+
+
+def _move_manifest(scores_dir, student_id, current, target):
+    """Mueve el manifiesto con las rutas de sus entradas y salidas ya traducidas, para que nada quede pendiente"""
+    source = os.path.join(student_dir(scores_dir, student_id, current), '.manifest', f"{student_id}.json")
+    try:
+        with open(source, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    renamed = {artifact_path(scores_dir, student_id, kind, current): artifact_path(scores_dir, student_id, kind, target)
+               for kind in KINDS}
+    for stage in data.get('stages', {}).values():
+        stage['inputs'] = {renamed.get(path, path): digest for path, digest in stage.get('inputs', {}).items()}
+        stage['outputs'] = [renamed.get(path, path) for path in stage.get('outputs', [])]
+    dest = os.path.join(student_dir(scores_dir, student_id, target), '.manifest', f"{student_id}.json")
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with open(dest + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(dest + '.tmp', dest)
+    for path in (source, source + '.lock'):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def migrate(scores_dir, target):
+    """Mueve los artefactos de todos los estudiantes al layout target y re-indexa"""
+    current = layout(scores_dir)
+    if current == target:
+        return 0
+    students = scan_students(scores_dir)
+    moved = 0
+    for student_id in sorted(students):
+        for kind in KINDS:
+            source = artifact_path(scores_dir, student_id, kind, current)
+            if os.path.exists(source):
+                dest = artifact_path(scores_dir, student_id, kind, target)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(source, dest)
+                moved += 1
+        _move_manifest(scores_dir, student_id, current, target)
+        _remove_empty(student_dir(scores_dir, student_id, current), current == 'sharded')
+    with open(os.path.join(scores_dir, LAYOUT_FILE), 'w', encoding='utf-8') as f:
+        f.write(target + '\n')
+    with _lock:
+        _layouts[os.path.abspath(scores_dir)] = target
+    reindex(scores_dir)
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Almacén de artefactos por estudiante e índice de scores/')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub):
+        sub.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+
+    directory = subparsers.add_parser('dir', help='Directorio de artefactos de un estudiante')
+    directory.add_argument('student_id', help='ID del estudiante')
+    add_common(directory)
+
+    index = subparsers.add_parser('index', help='Actualizar el índice de algunos estudiantes')
+    index.add_argument('students', nargs='+', help='IDs de estudiantes')
+    add_common(index)
+
+    reindex_parser = subparsers.add_parser('reindex', help='Reconstruir el índice completo')
+    add_common(reindex_parser)
+
+    listing = subparsers.add_parser('ls', help='Rutas de un tipo de artefacto')
+    listing.add_argument('kind', choices=list(KINDS), help='Tipo de artefacto')
+    add_common(listing)
+
+    migrate_parser = subparsers.add_parser('migrate', help='Cambiar el layout de scores/')
+    migrate_parser.add_argument('layout', choices=LAYOUTS, help='Layout destino')
+    add_common(migrate_parser)
+
+    args = parser.parse_args()
+    if args.command == 'dir':
+        print(student_dir(args.scores_dir, args.student_id))
+    elif args.command == 'index':
+        for student_id in args.students:
+            index_student(args.scores_dir, student_id)
+    elif args.command == 'reindex':
+        artifacts, students = reindex(args.scores_dir)
+        print(f"🗂️  {artifacts} artefactos de {students} estudiantes ({layout(args.scores_dir)})")
+    elif args.command == 'ls':
+        for student_id, path in list_artifacts(args.scores_dir, args.kind):
+            print(f"{student_id}\t{path}")
+    else:
+        moved = migrate(args.scores_dir, args.layout)
+        print(f"📦 {moved} artefactos movidos; layout: {args.layout}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Ejecutor por lotes con métricas en vivo
+
+Alternativa a all.sh: ejecuta general.sh para cada estudiante con un límite
+de concurrencia, guarda la salida de cada estudiante en _logs/<id>.log y
+publica métricas de Prometheus (archivo de texto y http://127.0.0.1:<puerto>/metrics)
+mientras la corrida avanza.
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import subprocess
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import MetricsCollector, serve_metrics, start_trace_follower
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def discover_students(base_dir='.'):
+    """Directorios de estudiantes: todo <id>/ que contenga TAREA01/"""
+    return sorted(os.path.basename(os.path.dirname(path.rstrip('/')))
+                  for path in glob.glob(os.path.join(base_dir, '*', 'TAREA01', '')))
+
+
+def run_student(student_id, collector, env, logs_dir, force=()):
+    collector.student_started(student_id)
+    log_path = os.path.join(logs_dir, f"{student_id}.log")
+    cmd = [os.path.join(REPO_DIR, 'general.sh'), student_id]
+    for stage in force:
+        cmd += ['--force', stage]
+    with open(log_path, 'w', encoding='utf-8') as log:
+        result = subprocess.run(cmd,
+                                stdout=log, stderr=subprocess.STDOUT, env=dict(env, TRACE_STUDENT=student_id))
+    collector.student_finished(student_id, result.returncode)
+    return student_id, result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluación por lotes con métricas en vivo')
+    parser.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los <id>/TAREA01)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    parser.add_argument('--logs-dir', default='_logs', help='Directorio para logs, trazas y métricas (por defecto: _logs)')
+    parser.add_argument('--trace', help='Archivo de trazas (por defecto: <logs-dir>/trace_<fecha>.jsonl)')
+    parser.add_argument('--metrics-file', help='Archivo de métricas Prometheus (por defecto: <logs-dir>/metrics.prom)')
+    parser.add_argument('--metrics-port', type=int, default=9464, help='Puerto del endpoint /metrics en 127.0.0.1 (0 lo desactiva)')
+    parser.add_argument('--force', action='append', default=[], choices=['score', 'test', 'report', 'all'],
+                        help='Volver a ejecutar la etapa aunque sus entradas no hayan cambiado (repetible)')
+    parser.add_argument('--no-aggregate', action='store_true', help='No ejecutar generate_scores_csv.py ni generate_cohort_stats.py al final')
+    args = parser.parse_args()
+
+    students = args.students or discover_students()
+    if not students:
+        print("❌ Error: no se encontraron directorios <id>/TAREA01")
+        sys.exit(1)
+
+    os.makedirs(args.logs_dir, exist_ok=True)
+    trace_path = args.trace or os.path.join(args.logs_dir, f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    metrics_path = args.metrics_file or os.path.join(args.logs_dir, 'metrics.prom')
+    env = dict(os.environ, GRADER_TRACE=os.path.abspath(trace_path))
+
+    collector = MetricsCollector(students, args.jobs)
+    stop, follower = start_trace_follower(collector, trace_path, metrics_path)
+    server = None
+    if args.metrics_port:
+        try:
+            server = serve_metrics(collector, args.metrics_port)
+            print(f"📈 Métricas: http://127.0.0.1:{args.metrics_port}/metrics")
+        except OSError as e:
+            print(f"⚠️  No se pudo abrir el puerto {args.metrics_port}: {e}")
+    print(f"🚀 {len(students)} estudiantes, {args.jobs} en paralelo")
+    print(f"📄 Trazas: {trace_path} | Métricas: {metrics_path}")
+
+    started = time.time()
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(run_student, student, collector, env, args.logs_dir, args.force) for student in students]
+        for done, future in enumerate(as_completed(futures), 1):
+            student_id, status = future.result()
+            eta = collector.eta_seconds()
+            eta_text = f", ETA {eta / 60:.1f} min" if eta is not None else ""
+            mark = "✅" if status == 0 else "❌"
+            print(f"{mark} [{done}/{len(students)}] {student_id}{eta_text}")
+            if status:
+                failed.append(student_id)
+
+    if not args.no_aggregate:
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, 'generate_scores_csv.py'), '-d', 'scores'], env=env)
+        subprocess.run([sys.executable, os.path.join(REPO_DIR, 'generate_cohort_stats.py'), '-d', 'scores'], env=env)
+
+    stop.set()
+    follower.join()
+    if server:
+        server.shutdown()
+
+    print("")
+    print(f"🎉 Lote terminado en {(time.time() - started) / 60:.1f} min: {len(students) - len(failed)} ok, {len(failed)} con error")
+    if failed:
+        print(f"   Con error (ver {args.logs_dir}/<id>.log): {', '.join(failed)}")
+    print(f"   Resumen de tiempos: python3 trace_summary.py {trace_path}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Benchmark end-to-end del pipeline con un grupo sintético
+
+Genera N estudiantes falsos en <dir>/<id>/TAREA01/ con una mezcla de
+programas correctos, con errores, que no compilan, faltantes y con ciclos
+infinitos, más el JSON que devolvería el LLM. Ejecuta las etapas del
+pipeline para N = 10, 100 y 1000 y guarda throughput, latencia por etapa
+y memoria pico en un archivo JSON comparable entre commits.
+
+ru_maxrss es la marca máxima de todo el proceso, así que cada tamaño corre
+en su propio proceso: la memoria pico de un tamaño no arrastra la de los
+anteriores.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import resource
+import subprocess
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import tracing
+import trace_summary
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+VARIANT_WEIGHTS = {
+    'correct': 0.55,
+    'buggy': 0.2,
+    'non_compiling': 0.1,
+    'missing': 0.1,
+    'infinite_loop': 0.05,
+}
+
+# Calificación que devolvería el LLM para cada variante
+LLM_SCORES = {
+    'correct': 10,
+    'buggy': 7,
+    'non_compiling': 4,
+    'missing': 0,
+    'infinite_loop': 5,
+}
+
+PROGRAM_SOURCES = {
+    'operaciones.c': {
+        'correct': '''#include <stdio.h>
+int suma(int valor1, int valor2);
+int resta(int valor1, int valor2);
+int multiplicacion(int valor1, int valor2);
+int division(int valor1, int valor2);
+int residuo(int valor1, int valor2);
+
+int main() {
+    int a, b;
+    /* Leer los dos enteros */
+    fscanf(stdin, "%d", &a);
+    fscanf(stdin, "%d", &b);
+    fprintf(stdout, "La suma de %d y %d es %d\\n", a, b, suma(a, b));
+    fprintf(stdout, "La resta de %d y %d es %d\\n", a, b, resta(a, b));
+    fprintf(stdout, "La multiplicacion de %d y %d es %d\\n", a, b, multiplicacion(a, b));
+    fprintf(stdout, "La division de %d y %d es %d\\n", a, b, division(a, b));
+    fprintf(stdout, "El residuo de la division de %d y %d es %d\\n", a, b, residuo(a, b));
+    return 0;
+}
+
+int suma(int valor1, int valor2) { return valor1 + valor2; }
+int resta(int valor1, int valor2) { return valor1 - valor2; }
+int multiplicacion(int valor1, int valor2) { return valor1 * valor2; }
+int division(int valor1, int valor2) { return valor2 != 0 ? valor1 / valor2 : 0; }
+int residuo(int valor1, int valor2) { return valor2 != 0 ? valor1 % valor2 : 0; }
+''',
+        'buggy': '''#include <stdio.h>
+int main() {
+    int a, b;
+    scanf("%d", &a);
+    scanf("%d", &b);
+    printf("La suma de %d y %d es %d\\n", a, b, a + b);
+    printf("La resta de %d y %d es %d\\n", a, b, b - a);
+    printf("La multiplicacion de %d y %d es %d\\n", a, b, a * b);
+    printf("La division de %d y %d es %d\\n", a, b, b != 0 ? a / b : 0);
+    printf("El residuo de la division de %d y %d es %d\\n", a, b, b != 0 ? a / b : 0);
+    return 0;
+}
+''',
+        'non_compiling': '''#include <stdio.h>
+int main() {
+    int a, b
+    scanf("%d", &a);
+    printf("La suma es %d\\n", a + b)
+}
+''',
+        'infinite_loop': '''#include <stdio.h>
+int main() {
+    int a, b;
+    scanf("%d", &a);
+    scanf("%d", &b);
+    while (b > 0) {
+        a = a + 1;
+    }
+    printf("La suma de %d y %d es %d\\n", a, b, a + b);
+    return 0;
+}
+''',
+    },
+    'resistencia.c': {
+        'correct': '''#include <stdio.h>
+#define PI 3.1416
+#define RHO 1.72e-8
+
+int main() {
+    double longitud, radio, area, resistencia;
+    /* Solicitar datos */
+    fscanf(stdin, "%lf", &longitud);
+    fscanf(stdin, "%lf", &radio);
+    area = PI * radio * radio;
+    resistencia = RHO * longitud / area;
+    fprintf(stdout, "La resistencia de tu conductor es %e Ohms\\n", resistencia);
+    return 0;
+}
+''',
+        'buggy': '''#include <stdio.h>
+int main() {
+    double longitud, radio;
+    scanf("%lf", &longitud);
+    scanf("%lf", &radio);
+    double area = 3.1416 * radio;
+    printf("La resistencia de tu conductor es %f\\n", 1.72e-8 * longitud / area);
+    return 0;
+}
+''',
+        'non_compiling': '''#include <stdio.h>
+int main() {
+    double longitud;
+    scanf("%lf", &longitud);
+    resistencia = 1.72e-8 * longitud;
+    printf("%f\\n", resistencia);
+    return 0;
+}
+''',
+        'infinite_loop': '''#include <stdio.h>
+int main() {
+    double longitud, radio;
+    scanf("%lf", &longitud);
+    scanf("%lf", &radio);
+    while (radio < 1.0) {
+        printf("Calculando resistencia...\\n");
+    }
+    return 0;
+}
+''',
+    },
+    'conversionCmsMts.c': {
+        'correct': '''#include <stdio.h>
+int division(int valor1, int valor2);
+int residuo(int valor1, int valor2);
+
+int main() {
+    int centimetros;
+    fscanf(stdin, "%d", &centimetros);
+    fprintf(stdout, "%d convertido es %d metros con %d centímetros\\n",
+            centimetros, division(centimetros, 100), residuo(centimetros, 100));
+    return 0;
+}
+
+int division(int valor1, int valor2) { return valor1 / valor2; }
+int residuo(int valor1, int valor2) { return valor1 % valor2; }
+''',
+        'buggy': '''#include <stdio.h>
+int main() {
+    int cm;
+    scanf("%d", &cm);
+    printf("%d convertido es %d metros con %d centímetros\\n", cm, cm / 10, cm % 10);
+    return 0;
+}
+''',
+        'non_compiling': '''#include <stdio.h>
+int main() {
+    int cm;
+    scanf("%d", &cm);
+    printf("%d metros\\n", cm / 100;
+    return 0;
+}
+''',
+        'infinite_loop': '''#include <stdio.h>
+int main() {
+    int cm, metros = 0;
+    scanf("%d", &cm);
+    while (cm >= 0) {
+        cm = cm - 100;
+        metros = metros + 1;
+        cm = cm + 100;
+    }
+    printf("%d metros\\n", metros);
+    return 0;
+}
+''',
+    },
+    'conversionSegsHMS.c': {
+        'correct': '''#include <stdio.h>
+int main() {
+    int segundos, horas, minutos;
+    /* Convertir segundos a HH:MM:SS */
+    fscanf(stdin, "%d", &segundos);
+    horas = segundos / 3600;
+    minutos = (segundos % 3600) / 60;
+    fprintf(stdout, "%d Horas %d Minutos %d Segundos\\n", horas, minutos, segundos % 60);
+    return 0;
+}
+''',
+        'buggy': '''#include <stdio.h>
+int main() {
+    int s;
+    scanf("%d", &s);
+    printf("%d Horas %d Minutos %d Segundos\\n", s / 3600, s / 60, s % 60);
+    return 0;
+}
+''',
+        'non_compiling': '''#include <stdio.h>
+int main() {
+    int s;
+    scanf("%d", &s)
+    printf("%d Horas\\n", s / 3600);
+    return 0
+''',
+        'infinite_loop': '''#include <stdio.h>
+int main() {
+    int s, h = 0;
+    scanf("%d", &s);
+    for (;;) {
+        h = h + s;
+    }
+    printf("%d Horas\\n", h);
+    return 0;
+}
+''',
+    },
+}
+
+# Programa del test -> clave del JSON del LLM
+LLM_KEYS = {
+    'operaciones.c': 'operaciones',
+    'resistencia.c': 'resistencia',
+    'conversionCmsMts.c': 'conversionCmsMts',
+    'conversionSegsHMS.c': 'conversionSegHMS',
+}
+
+
+def pick_variant(rng):
+    roll = rng.random()
+    cumulative = 0.0
+    for variant, weight in VARIANT_WEIGHTS.items():
+        cumulative += weight
+        if roll < cumulative:
+            return variant
+    return 'correct'
+
+
+def generate_cohort(base_dir, count, seed=0):
+    """Genera <base_dir>/<id>/TAREA01/*.c y scores/<id>.json falsos; devuelve los ids"""
+    rng = random.Random(seed)
+    scores_dir = os.path.join(base_dir, 'scores')
+    os.makedirs(scores_dir, exist_ok=True)
+    student_ids = []
+    for index in range(count):
+        student_id = f"bench{index:05d}"
+        student_dir = os.path.join(base_dir, student_id, 'TAREA01')
+        os.makedirs(student_dir, exist_ok=True)
+        llm_json = {}
+        for program, sources in PROGRAM_SOURCES.items():
+            variant = pick_variant(rng)
+            if variant != 'missing':
+                with open(os.path.join(student_dir, program), 'w', encoding='utf-8') as f:
+                    f.write(sources[variant])
+            llm_json[LLM_KEYS[program]] = {
+                'calificacion': LLM_SCORES[variant],
+                'comentarios': f"Entrega sintética ({variant}) - buen intento - agrega comentarios descriptivos",
+            }
+        llm_json['total'] = sum(entry['calificacion'] for entry in llm_json.values())
+        with open(os.path.join(scores_dir, f"{student_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(llm_json, f, ensure_ascii=False)
+        student_ids.append(student_id)
+    return student_ids
+
+
+def run_stage(cmd, cwd, env, stage, student):
+    """Ejecuta un comando envuelto en un span; devuelve el código de salida"""
+    with tracing.span(stage, student=student) as sp:
+        result = subprocess.run(cmd, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        sp.status = result.returncode
+    return result.returncode
+
+
+def run_student(student_id, work_dir, env, render):
+    """Etapas por estudiante (la etapa LLM se sustituye por el JSON sintético)"""
+    student_env = dict(env, TRACE_STUDENT=student_id)
+    statuses = {}
+    statuses['test'] = run_stage([os.path.join(REPO_DIR, 'test.sh'), f"{student_id}/TAREA01", '-o', f"scores/{student_id}.csv"],
+                                 work_dir, student_env, 'test', student_id)
+    report_cmd = [sys.executable, os.path.join(REPO_DIR, 'generate_report.py'),
+                  f"scores/{student_id}.json", f"scores/{student_id}.csv", '-o', 'scores/']
+    if not render:
+        report_cmd.append('--tex-only')
+    statuses['report'] = run_stage(report_cmd, work_dir, student_env, 'report', student_id)
+    return statuses
+
+
+def run_benchmark(count, jobs, seed, keep, test_timeout):
+    work_dir = tempfile.mkdtemp(prefix=f"grader_bench_{count}_")
+    trace_path = os.path.join(work_dir, 'trace.jsonl')
+    os.symlink(os.path.join(REPO_DIR, 'public'), os.path.join(work_dir, 'public'))
+
+    print(f"🧪 N={count}: generando grupo sintético en {work_dir}")
+    generate_started = time.perf_counter()
+    student_ids = generate_cohort(work_dir, count, seed)
+    generate_seconds = time.perf_counter() - generate_started
+
+    # El grupo sintético se escribe con el layout plano de scores/ (ver artifacts.py)
+    env = dict(os.environ, GRADER_TRACE=trace_path, TEST_TIMEOUT=str(test_timeout), ARTIFACT_LAYOUT='flat')
+    os.environ['GRADER_TRACE'] = trace_path
+    render = shutil.which('pdflatex') is not None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        results = list(pool.map(lambda student_id: run_student(student_id, work_dir, env, render), student_ids))
+    students_seconds = time.perf_counter() - started
+
+    aggregate_started = time.perf_counter()
+    run_stage([sys.executable, os.path.join(REPO_DIR, 'generate_scores_csv.py'), '-d', 'scores'], work_dir, env, 'aggregate', '_cohort')
+    run_stage([sys.executable, os.path.join(REPO_DIR, 'generate_cohort_stats.py'), '-d', 'scores'], work_dir, env, 'stats', '_cohort')
+    aggregate_seconds = time.perf_counter() - aggregate_started
+    os.environ.pop('GRADER_TRACE', None)
+
+    spans, _ = trace_summary.build_spans(trace_summary.load_events(trace_path))
+    summary = trace_summary.summarize(spans)
+    failures = {}
+    for statuses in results:
+        for stage, status in statuses.items():
+            if status:
+                failures[stage] = failures.get(stage, 0) + 1
+
+    total_seconds = students_seconds + aggregate_seconds
+    result = {
+        'students': count,
+        'jobs': jobs,
+        'render_pdfs': render,
+        'generate_seconds': round(generate_seconds, 3),
+        'students_seconds': round(students_seconds, 3),
+        'aggregate_seconds': round(aggregate_seconds, 3),
+        'total_seconds': round(total_seconds, 3),
+        'throughput_students_per_second': round(count / total_seconds, 3) if total_seconds else None,
+        'stages': summary['stages'],
+        'stage_failures': failures,
+        'critical_path': summary['cohort'].get('critical_path', []),
+        'peak_memory_mb': peak_memory_mb(),
+        'work_dir': work_dir if keep else None,
+    }
+    if not keep:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"   {result['throughput_students_per_second']} estudiantes/s, total {total_seconds:.1f} s")
+    return result
+
+
+def peak_memory_mb():
+    """Memoria residente pico (MB) de este proceso y del mayor de sus subprocesos ya terminados"""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024  # ru_maxrss: bytes en macOS, KB en Linux
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_isolated(size, args):
+    """Ejecuta run_benchmark para un tamaño en un proceso nuevo; regresa su resultado"""
+    fd, result_file = tempfile.mkstemp(prefix=f"grader_bench_{size}_", suffix='.json')
+    os.close(fd)
+    cmd = [sys.executable, os.path.abspath(__file__), '--sizes', str(size), '-j', str(args.jobs),
+           '--seed', str(args.seed), '--test-timeout', str(args.test_timeout), '-o', result_file, '--single']
+    if args.keep:
+        cmd.append('--keep')
+    try:
+        subprocess.run(cmd, check=True)
+        with open(result_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark end-to-end con un grupo sintético de estudiantes')
+    parser.add_argument('--sizes', default='10,100,1000', help='Tamaños del grupo separados por coma (por defecto: 10,100,1000)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes procesados en paralelo')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla para la mezcla de variantes')
+    parser.add_argument('--test-timeout', type=float, default=1.0, help='Timeout por ejecución de prueba en segundos (TEST_TIMEOUT)')
+    parser.add_argument('--keep', action='store_true', help='Conservar los directorios de trabajo')
+    parser.add_argument('-o', '--output', default='bench_results.json', help='Archivo JSON de resultados')
+    # Uso interno: un solo tamaño en este proceso, resultado crudo en --output
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    if args.single:
+        result = run_benchmark(sizes[0], args.jobs, args.seed, args.keep, args.test_timeout)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f)
+        return
+    runs = [run_isolated(size, args) for size in sizes]
+
+    results = {
+        'commit': git_commit(),
+        'date': datetime.now().isoformat(),
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+        'tools': {tool: shutil.which(tool) is not None for tool in ('gcc', 'pdflatex', 'gs', 'llm')},
+        'runs': runs,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"📄 Resultados: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
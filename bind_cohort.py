@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Encuadernador del grupo: un solo PDF con los reportes de todos los estudiantes
+
+Lee los final_report_<id>.pdf (según el índice de artifacts.py) uno a uno y los agrega a un PDF del
+grupo con un marcador por estudiante. Los recursos idénticos (el logo de
+public/ibero.png, fuentes embebidas iguales) se guardan una sola vez dentro de
+cada volumen: cada tanda de reportes se deduplica antes de leer la siguiente.
+
+pypdf mantiene en memoria todas las páginas de un PdfWriter hasta escribirlo,
+así que el grupo se escribe en volúmenes de --volume-size reportes
+(cohort_report_001.pdf, cohort_report_002.pdf, ...) y cada writer se libera al
+terminar su volumen: la memoria queda acotada por el tamaño del volumen, no
+por el número de estudiantes. Un grupo que cabe en un volumen produce un solo
+cohort_report.pdf como siempre.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from pypdf import PdfReader, PdfWriter
+
+import tracing
+import workspace
+import artifacts
+
+# Reportes por volumen: un PdfWriter guarda todas sus páginas en memoria hasta escribirse
+VOLUME_SIZE = 200
+
+
+def find_reports(scores_dir, students=None):
+    """[(student_id, ruta)] de los reportes finales, ordenados por estudiante"""
+    return artifacts.list_artifacts(scores_dir, 'report', students)
+
+
+def volume_path(output_file, number):
+    """cohort_report.pdf → cohort_report_001.pdf"""
+    root, ext = os.path.splitext(output_file)
+    return f"{root}_{number:03d}{ext or '.pdf'}"
+
+
+def write_volume(reports, output_file, batch_size, skipped):
+    """Une un volumen de reportes en output_file; regresa sus páginas"""
+    writer = PdfWriter()
+    writer.page_mode = '/UseOutlines'
+    for index, (student_id, path) in enumerate(reports, 1):
+        try:
+            with open(path, 'rb') as f:
+                reader = PdfReader(f)
+                writer.append(reader, outline_item=student_id.upper(), import_outline=False)
+        except Exception as e:
+            print(f"⚠️  Se omite {path}: {e}")
+            skipped.append(student_id)
+            continue
+        if index % batch_size == 0:
+            writer.compress_identical_objects()
+    writer.compress_identical_objects()
+    writer.add_metadata({'/Title': 'Reportes del grupo', '/Creator': 'bind_cohort.py'})
+
+    with workspace.scratch_dir('bind') as work_dir:
+        scratch_pdf = os.path.join(work_dir, os.path.basename(output_file))
+        with open(scratch_pdf, 'wb') as f:
+            writer.write(f)
+        workspace.publish(scratch_pdf, output_file)
+    return len(writer.pages)
+
+
+def bind_reports(reports, output_file, batch_size=25, volume_size=VOLUME_SIZE):
+    """Une los reportes en output_file (o en volúmenes de volume_size); regresa (páginas, omitidos, archivos)"""
+    if not volume_size or len(reports) <= volume_size:
+        volumes = [(output_file, reports)]
+    else:
+        volumes = [(volume_path(output_file, number), reports[start:start + volume_size])
+                   for number, start in enumerate(range(0, len(reports), volume_size), 1)]
+    pages, skipped = 0, []
+    for path, chunk in volumes:
+        pages += write_volume(chunk, path, batch_size, skipped)
+    return pages, skipped, [path for path, _ in volumes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Une los reportes finales en un PDF del grupo con marcadores')
+    parser.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los final_report_<id>.pdf)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio con los reportes (por defecto: scores)')
+    parser.add_argument('-o', '--output', help='PDF de salida (por defecto: <scores-dir>/cohort_report.pdf)')
+    parser.add_argument('--batch-size', type=int, default=25, help='Reportes por tanda antes de deduplicar recursos')
+    parser.add_argument('--volume-size', type=int, default=VOLUME_SIZE,
+                        help=f'Reportes por volumen; acota la memoria (por defecto: {VOLUME_SIZE}; 0 = un solo PDF)')
+    args = parser.parse_args()
+
+    output_file = args.output or os.path.join(args.scores_dir, 'cohort_report.pdf')
+    reports = find_reports(args.scores_dir, set(args.students))
+    if not reports:
+        print(f"❌ Error: no hay final_report_<id>.pdf en {args.scores_dir}")
+        sys.exit(1)
+
+    print(f"📚 Uniendo {len(reports)} reportes en {output_file}...")
+    input_bytes = sum(os.path.getsize(path) for _, path in reports)
+    started = time.perf_counter()
+    with tracing.span('bind', student='_cohort', bytes_in=input_bytes) as sp:
+        pages, skipped, outputs = bind_reports(reports, output_file, args.batch_size, args.volume_size)
+        sp.bytes_out = sum(tracing.file_size(path) for path in outputs)
+    seconds = time.perf_counter() - started
+
+    output_bytes = sum(os.path.getsize(path) for path in outputs)
+    print(f"✅ {len(reports) - len(skipped)} estudiantes, {pages} páginas en {seconds:.1f} s")
+    if len(outputs) > 1:
+        print(f"   {len(outputs)} volúmenes: {outputs[0]} … {outputs[-1]}")
+    print(f"   Tamaño: {output_bytes / 1024:.0f} KiB (suma de reportes: {input_bytes / 1024:.0f} KiB, "
+          f"{output_bytes / input_bytes * 100:.0f}%)")
+    if skipped:
+        print(f"⚠️  Omitidos: {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
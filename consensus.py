@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Calificación por consenso: K muestras del LLM en paralelo por estudiante
+
+Una sola muestra de gpt-4o-mini da calificaciones ruidosas. Con SCORE_SAMPLES=K
+score.sh llama a este script en lugar de hacer una sola solicitud:
+
+  • lanza primero --first muestras en paralelo; si en todos los ejercicios
+    difieren a lo más --tolerance puntos, se detiene (parada temprana)
+  • si no, lanza las muestras restantes hasta K, también en paralelo, así que
+    la latencia es la de una o dos solicitudes
+  • por ejercicio toma la mediana de las calificaciones (la alta si K es par,
+    en línea con la rúbrica generosa) y el comentario más representativo: el
+    de una muestra con esa calificación que más palabras comparte con los demás
+  • marca para revisión humana los ejercicios cuya dispersión (máx − mín)
+    supera --review-spread
+
+El JSON resultante tiene la misma forma que el de score.sh; el detalle de las
+muestras queda en scores/consensus_<id>.json.
+
+Uso:
+  python3 consensus.py sample <id> --system sys.txt --user user.txt -k 5 -o scores/<id>.json
+  python3 consensus.py review                 # ejercicios marcados de todo el grupo
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import workspace
+import artifacts
+import llm_usage
+import prompting
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def run_sample(system, user_prompt, schema, model, temperature):
+    """Una muestra; regresa (respuesta o None, uso o None, latencia en ms)"""
+    cmd = ['llm', '--schema', json.dumps(schema, ensure_ascii=False), '-m', model, '-u', '-s', system]
+    if temperature is not None:
+        cmd += ['-o', 'temperature', str(temperature)]
+    started = time.time()
+    result = subprocess.run(cmd, input=user_prompt, capture_output=True, text=True, errors='replace')
+    latency_ms = (time.time() - started) * 1000
+    try:
+        response = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        response = None
+    if not isinstance(response, dict) or not all(isinstance(response.get(e), dict) for e in llm_usage.EXERCISES):
+        response = None
+    return response, llm_usage.parse_usage_output(result.stderr), latency_ms
+
+
+def agree(samples, tolerance):
+    """True si en cada ejercicio las calificaciones difieren a lo más tolerance puntos"""
+    for exercise in llm_usage.EXERCISES:
+        scores = [sample[exercise].get('calificacion', 0) for sample in samples]
+        if max(scores) - min(scores) > tolerance:
+            return False
+    return True
+
+
+def representative_comment(comments, scores, median):
+    """Comentario de una muestra con la calificación más cercana a la mediana que más palabras comparte con el resto"""
+    words = [set(WORD_PATTERN.findall(comment.lower())) for comment in comments]
+    closest = min(abs(score - median) for score in scores)
+
+    def centrality(i):
+        others = [j for j in range(len(comments)) if j != i]
+        return sum(len(words[i] & words[j]) / (len(words[i] | words[j]) or 1) for j in others) / (len(others) or 1)
+
+    candidates = [i for i, score in enumerate(scores) if abs(score - median) == closest]
+    return comments[max(candidates, key=centrality)]
+
+
+def aggregate(samples, review_spread):
+    """(JSON con la forma de score.sh, detalle por ejercicio)"""
+    result = {}
+    details = {}
+    for exercise in llm_usage.EXERCISES:
+        scores = [int(sample[exercise].get('calificacion', 0)) for sample in samples]
+        comments = [str(sample[exercise].get('comentarios', '')) for sample in samples]
+        median = statistics.median_high(scores)
+        spread = max(scores) - min(scores)
+        result[exercise] = {'calificacion': median,
+                            'comentarios': representative_comment(comments, scores, median)}
+        details[exercise] = {'scores': scores, 'median': median, 'spread': spread, 'review': spread > review_spread}
+    result['total'] = sum(result[exercise]['calificacion'] for exercise in llm_usage.EXERCISES)
+    return result, details
+
+
+def sample_student(student_id, system, user_prompt, args):
+    """Muestras en una o dos tandas paralelas; regresa (JSON agregado, detalle) o (None, None)"""
+    samples = []
+    requests = []
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.samples) as pool:
+        pending = min(args.first, args.samples)
+        while pending > 0:
+            batch = list(pool.map(lambda _: run_sample(system, user_prompt, prompting.SCHEMA, args.model,
+                                                       args.temperature), range(pending)))
+            requests.extend(batch)
+            samples.extend(response for response, _, _ in batch if response is not None)
+            early_stop = len(samples) >= 2 and agree(samples, args.tolerance)
+            if early_stop or len(requests) >= args.samples:
+                break
+            pending = args.samples - len(requests)
+
+    prompt_bytes = len(system.encode()) + len(user_prompt.encode())
+    code_sizes = llm_usage.source_sizes(args.student_dir) if args.student_dir else {}
+    for response, usage, latency_ms in requests:
+        if usage is None:
+            usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'reported': False}
+        llm_usage.record_request(student_id, args.model, usage, latency_ms, 0, args.scores_dir,
+                                 prompt_bytes, code_sizes, response or {})
+
+    if not samples:
+        return None, None
+    result, exercises = aggregate(samples, args.review_spread)
+    details = {
+        'student_id': student_id,
+        'model': args.model,
+        'requested': args.samples,
+        'samples': len(samples),
+        'failed_samples': len(requests) - len(samples),
+        'early_stop': len(requests) < args.samples,
+        'wall_ms': round((time.time() - started) * 1000, 1),
+        'review': [exercise for exercise, entry in exercises.items() if entry['review']],
+        'exercises': exercises,
+    }
+    return result, details
+
+
+def command_sample(args):
+    with open(args.system, 'r', encoding='utf-8') as f:
+        system = f.read()
+    with open(args.user, 'r', encoding='utf-8') as f:
+        user_prompt = f.read()
+    result, details = sample_student(args.student_id, system, user_prompt, args)
+    if result is None:
+        print(f"❌ Ninguna de las {args.samples} muestras devolvió JSON válido")
+        return 1
+    workspace.write_text(args.output, json.dumps(result, indent=2, ensure_ascii=False))
+    workspace.write_text(os.path.join(args.scores_dir, f"consensus_{args.student_id}.json"),
+                         json.dumps(details, indent=2, ensure_ascii=False))
+    stop_note = ' (parada temprana)' if details['early_stop'] else ''
+    print(f"🗳️  Consenso de {details['samples']} muestras{stop_note} en {details['wall_ms'] / 1000:.1f} s")
+    for exercise, entry in details['exercises'].items():
+        mark = '⚠️ ' if entry['review'] else '  '
+        print(f"   {mark}{exercise}: {entry['scores']} → {entry['median']}")
+    if details['review']:
+        print(f"⚠️  Revisión humana sugerida: {', '.join(details['review'])}")
+    return 0
+
+
+def command_review(args):
+    """Ejercicios marcados de todo el grupo en pantalla y en scores/consensus_review.csv"""
+    rows = []
+    for _, path in artifacts.list_artifacts(args.scores_dir, 'consensus'):
+        with open(path, 'r', encoding='utf-8') as f:
+            details = json.load(f)
+        for exercise in details.get('review', []):
+            entry = details['exercises'][exercise]
+            rows.append([details['student_id'], exercise, entry['median'], entry['spread'],
+                         ' '.join(str(score) for score in entry['scores'])])
+    output_file = os.path.join(args.scores_dir, 'consensus_review.csv')
+    with workspace.scratch_dir('consensus') as work_dir:
+        scratch_csv = os.path.join(work_dir, 'consensus_review.csv')
+        with open(scratch_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Student_ID', 'Exercise', 'Median', 'Spread', 'Samples'])
+            writer.writerows(rows)
+        workspace.publish(scratch_csv, output_file)
+    for student_id, exercise, median, spread, scores in rows:
+        print(f"⚠️  {student_id} {exercise}: {median} (muestras {scores}, dispersión {spread})")
+    print(f"📄 {len(rows)} ejercicios para revisión: {output_file}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calificación por consenso de varias muestras del LLM')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    sample = subparsers.add_parser('sample', help='Calificar a un estudiante con K muestras')
+    sample.add_argument('student_id', help='ID del estudiante')
+    sample.add_argument('--system', required=True, help='Prompt de sistema (rúbrica, ver prompting.py)')
+    sample.add_argument('--user', required=True, help='Prompt del estudiante')
+    sample.add_argument('-o', '--output', required=True, help='JSON de calificaciones (scores/<id>.json)')
+    sample.add_argument('--student-dir', help='Directorio TAREA01 (para el desglose de tokens por ejercicio)')
+    sample.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    sample.add_argument('-k', '--samples', type=int, default=5, help='Máximo de muestras (por defecto: 5)')
+    sample.add_argument('--first', type=int, default=2, help='Muestras de la primera tanda (por defecto: 2)')
+    sample.add_argument('--tolerance', type=int, default=1,
+                        help='Diferencia máxima para detenerse tras la primera tanda (por defecto: 1)')
+    sample.add_argument('--review-spread', type=int, default=2,
+                        help='Dispersión a partir de la cual se marca para revisión (por defecto: más de 2)')
+    sample.add_argument('-m', '--model', default=os.environ.get('LLM_MODEL', 'gpt-4o-mini'), help='Modelo')
+    sample.add_argument('--temperature', type=float, default=0.7, help='Temperatura de las muestras (por defecto: 0.7)')
+
+    review = subparsers.add_parser('review', help='Ejercicios marcados para revisión en todo el grupo')
+    review.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+
+    args = parser.parse_args()
+    commands = {'sample': command_sample, 'review': command_review}
+    sys.exit(commands[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
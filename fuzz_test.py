@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Pruebas diferenciales aleatorias contra implementaciones de referencia
+
+test.sh revisa unos cuantos casos fijos por programa. Este modo genera miles
+de entradas por programa (aleatorias y de frontera), calcula las salidas
+esperadas de una sola vez con oráculos vectorizados de numpy y ejecuta el
+binario del estudiante con un pool de hilos que lanzan los procesos en lotes
+preconstruidos. De cada programa que falla se reporta la entrada mínima
+encontrada: la falla más pequeña se reduce hacia cero mientras siga fallando.
+
+Oráculos (semántica de C: la división entera trunca hacia cero):
+  operaciones.c        a+b, a-b, a*b, a/b, a%b con |a|, |b| <= 46340 y b != 0
+  conversionCmsMts.c   divmod(cm, 100)
+  conversionSegsHMS.c  s // 3600, (s % 3600) // 60, s % 60
+  resistencia.c        R = 1.72e-8·L / (π r²) con tolerancia relativa
+
+Salida: scores/fuzz_<id>.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import tracing
+import workspace
+import artifacts
+
+RESISTIVITY = 1.72e-8
+# Tolerancia de resistencia.c: relativa por el valor de π que use el estudiante
+# y absoluta por el redondeo de printf("%f")
+RESISTANCE_RTOL = 1e-3
+RESISTANCE_ATOL = 1e-6
+# |a|, |b| <= 46340 garantiza que a*b cabe en un int de 32 bits
+OPERAND_LIMIT = 46340
+INT_MAX = 2**31 - 1
+
+RUN_TIMEOUT = float(os.environ.get('FUZZ_TIMEOUT', '2'))
+MAX_OUTPUT = int(os.environ.get('TEST_MAX_OUTPUT', '65536'))
+BATCH_SIZE = 64
+SHRINK_STEPS = 60
+
+NUMBER = r'-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?'
+OPERATION_PATTERN = re.compile(
+    r'(?P<residuo>residuo(?:\s+de\s+la\s+divisi[oó]n)?|m[oó]dulo)'
+    r'|(?P<suma>suma)|(?P<resta>resta)|(?P<multiplicacion>multiplicaci[oó]n|producto)'
+    r'|(?P<division>divisi[oó]n|cociente)', re.IGNORECASE)
+OPERATIONS = ['suma', 'resta', 'multiplicacion', 'division', 'residuo']
+
+
+def c_divmod(a, b):
+    """Cociente y residuo con la semántica de C (truncamiento hacia cero)"""
+    quotient = np.sign(a) * np.sign(b) * (np.abs(a) // np.abs(b))
+    return quotient, a - b * quotient
+
+
+def numbers_in(text):
+    return [float(n) for n in re.findall(NUMBER, text)]
+
+
+def parse_operations(output):
+    """{operación: número} tomando el último número antes de la siguiente palabra clave"""
+    matches = list(OPERATION_PATTERN.finditer(output))
+    values = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(output)
+        found = numbers_in(output[match.end():end])
+        if found and match.lastgroup not in values:
+            values[match.lastgroup] = found[-1]
+    return values
+
+
+def parse_labeled(output, labels):
+    """Valores con etiqueta ("N Hora", "con N centímetro"); si faltan, posición como en test.sh
+
+    Cada etiqueta se busca después de la anterior, así el eco de la entrada
+    ("3661 segundos son 1 horas, ...") no se toma por el resultado; si no
+    aparece después, se usa su última aparición en la salida.
+    """
+    values = []
+    numbers = numbers_in(output)
+    start = 0
+    for position, pattern in labels:
+        match = re.compile(pattern, re.IGNORECASE).search(output, start)
+        found = [match.group(1)] if match else re.findall(pattern, output, re.IGNORECASE)
+        if match:
+            start = match.end()
+        if found:
+            values.append(float(found[-1]))
+        elif numbers:
+            values.append(numbers[position] if -len(numbers) <= position < len(numbers) else None)
+        else:
+            values.append(None)
+    return values
+
+
+# --- Especificación por programa -------------------------------------------
+# generate(rng, n) → entradas (n, k); oracle(entradas) → esperados (n, m);
+# stdin(fila) → texto; parse(salida) → lista de m valores; check(esperado, actual)
+
+def generate_operaciones(rng, n):
+    edges = np.array([0, 1, -1, 2, -2, 7, -7, 100, OPERAND_LIMIT, -OPERAND_LIMIT])
+    a_edge, b_edge = np.meshgrid(edges, edges[edges != 0])
+    boundary = np.column_stack([a_edge.ravel(), b_edge.ravel()])
+    a = rng.integers(-OPERAND_LIMIT, OPERAND_LIMIT + 1, size=n)
+    b = rng.integers(-OPERAND_LIMIT, OPERAND_LIMIT + 1, size=n)
+    b[b == 0] = 1
+    return np.vstack([boundary, np.column_stack([a, b])])[:max(n, len(boundary))]
+
+
+def oracle_operaciones(inputs):
+    a, b = inputs[:, 0], inputs[:, 1]
+    quotient, remainder = c_divmod(a, b)
+    return np.column_stack([a + b, a - b, a * b, quotient, remainder])
+
+
+def parse_operaciones(output):
+    values = parse_operations(output)
+    return [values.get(op) for op in OPERATIONS]
+
+
+def generate_cms(rng, n):
+    boundary = np.array([0, 1, 99, 100, 101, 199, 200, 999, 1000, 10**6, INT_MAX - 1, INT_MAX])
+    return np.concatenate([boundary, rng.integers(0, 10**7, size=n)])[:max(n, len(boundary))].reshape(-1, 1)
+
+
+def oracle_cms(inputs):
+    meters, centimeters = np.divmod(inputs[:, 0], 100)
+    return np.column_stack([meters, centimeters])
+
+
+def parse_cms(output):
+    return parse_labeled(output, [(0, r'(\d+)\s*metro'), (-1, r'(\d+)\s*cent[ií]metro')])
+
+
+def generate_hms(rng, n):
+    boundary = np.array([0, 1, 59, 60, 61, 3599, 3600, 3601, 3660, 3661, 86399, 86400, 359999, INT_MAX])
+    return np.concatenate([boundary, rng.integers(0, 10**6, size=n)])[:max(n, len(boundary))].reshape(-1, 1)
+
+
+def oracle_hms(inputs):
+    hours, rest = np.divmod(inputs[:, 0], 3600)
+    minutes, seconds = np.divmod(rest, 60)
+    return np.column_stack([hours, minutes, seconds])
+
+
+def parse_hms(output):
+    return parse_labeled(output, [(0, r'(\d+)\s*hora'), (1, r'(\d+)\s*minuto'), (-1, r'(\d+)\s*segundo')])
+
+
+def generate_resistencia(rng, n):
+    boundary = np.array([[1.0, 0.001], [2.0, 0.002], [0.5, 0.0005], [0.01, 0.01], [1000.0, 0.0001],
+                         [1.0, 0.01], [100.0, 0.005]])
+    length = np.round(rng.uniform(0.01, 1000.0, size=n), 3)
+    radius = np.round(rng.uniform(0.0001, 0.01, size=n), 5)
+    return np.vstack([boundary, np.column_stack([length, radius])])[:max(n, len(boundary))]
+
+
+def oracle_resistencia(inputs):
+    return (RESISTIVITY * inputs[:, 0] / (np.pi * inputs[:, 1] ** 2)).reshape(-1, 1)
+
+
+def parse_resistencia(output):
+    match = re.search(r'resist\w*[^\n]*?(' + NUMBER + r')\s*(?:ohm\w*|Ω)?\.?\s*$', output, re.IGNORECASE | re.MULTILINE)
+    if match:
+        return [float(match.group(1))]
+    numbers = numbers_in(output)
+    return [numbers[-1] if numbers else None]
+
+
+def check_exact(expected, actual):
+    return all(value is not None and value == want for want, value in zip(expected, actual))
+
+
+def check_resistance(expected, actual):
+    value = actual[0]
+    return value is not None and abs(value - expected[0]) <= max(RESISTANCE_RTOL * abs(expected[0]), RESISTANCE_ATOL)
+
+
+def format_integers(row):
+    return '\n'.join(str(int(v)) for v in row) + '\n'
+
+
+def format_floats(row):
+    return '\n'.join(repr(float(v)) for v in row) + '\n'
+
+
+FUZZ_SPECS = {
+    'operaciones.c': {
+        'generate': generate_operaciones, 'oracle': oracle_operaciones, 'stdin': format_integers,
+        'parse': parse_operaciones, 'check': check_exact, 'fields': ['a', 'b'],
+        'valid': lambda row: row[1] != 0 and all(abs(v) <= OPERAND_LIMIT for v in row),
+    },
+    'conversionCmsMts.c': {
+        'generate': generate_cms, 'oracle': oracle_cms, 'stdin': format_integers,
+        'parse': parse_cms, 'check': check_exact, 'fields': ['cm'],
+        'valid': lambda row: 0 <= row[0] <= INT_MAX,
+    },
+    'conversionSegsHMS.c': {
+        'generate': generate_hms, 'oracle': oracle_hms, 'stdin': format_integers,
+        'parse': parse_hms, 'check': check_exact, 'fields': ['segundos'],
+        'valid': lambda row: 0 <= row[0] <= INT_MAX,
+    },
+    'resistencia.c': {
+        'generate': generate_resistencia, 'oracle': oracle_resistencia, 'stdin': format_floats,
+        'parse': parse_resistencia, 'check': check_resistance, 'fields': ['longitud', 'radio'],
+        'valid': lambda row: row[0] > 0 and row[1] > 0,
+    },
+}
+
+# Salidas reales y lo que cada parser debe extraer de ellas (python3 fuzz_test.py --check-parsers);
+# las que repiten la entrada antes del resultado no deben tomar ese número
+PARSE_EXAMPLES = [
+    (parse_hms, '3661 segundos son 1 horas, 1 minutos y 1 segundos', [1, 1, 1]),
+    (parse_hms, 'Ingrese los segundos: 3661\n1 Hora 1 Minuto 1 Segundo', [1, 1, 1]),
+    (parse_hms, '01:01:01', [1, 1, 1]),
+    (parse_cms, '555 centimetros son 5 metros y 55 centimetros', [5, 55]),
+    (parse_cms, 'Son 5 metros con 55 centímetros', [5, 55]),
+    (parse_operaciones, 'Suma: 7\nResta: 3\nMultiplicación: 10\nDivisión: 2\nResiduo: 1', [7, 3, 10, 2, 1]),
+    (parse_resistencia, 'La resistencia es: 0.005475 ohms', [0.005475]),
+]
+
+
+def check_parsers():
+    """Fallas de los parsers contra PARSE_EXAMPLES: [(parser, salida, esperado, obtenido)]"""
+    failures = []
+    for parse, output, expected in PARSE_EXAMPLES:
+        actual = parse(output)
+        if actual != expected:
+            failures.append((parse.__name__, output, expected, actual))
+    return failures
+
+
+# --- Ejecución ---------------------------------------------------------------
+
+def run_program(executable, stdin_text):
+    """(código de salida, salida) de una ejecución; None como código si excedió RUN_TIMEOUT"""
+    proc = subprocess.Popen([executable], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT)
+    timer = threading.Timer(RUN_TIMEOUT, proc.kill)
+    timer.start()
+    try:
+        try:
+            proc.stdin.write(stdin_text.encode())
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        output = proc.stdout.read(MAX_OUTPUT)
+        proc.stdout.close()
+        if proc.poll() is None:
+            proc.kill()
+        returncode = proc.wait()
+    finally:
+        timed_out = not timer.is_alive() and proc.returncode == -9
+        timer.cancel()
+    return (None if timed_out else returncode), output.decode('utf-8', errors='replace')
+
+
+def run_batch(executable, stdin_batch):
+    return [run_program(executable, text) for text in stdin_batch]
+
+
+def run_all(executable, stdin_texts, pool):
+    """Ejecuta todas las entradas en lotes de BATCH_SIZE repartidos en el pool"""
+    batches = [stdin_texts[i:i + BATCH_SIZE] for i in range(0, len(stdin_texts), BATCH_SIZE)]
+    results = []
+    for batch_results in pool.map(lambda batch: run_batch(executable, batch), batches):
+        results.extend(batch_results)
+    return results
+
+
+def verdict(spec, expected, returncode, output):
+    """None si pasa; si no, el motivo de la falla"""
+    if returncode is None:
+        return 'timeout'
+    if returncode != 0:
+        return f'exit {returncode}'
+    actual = spec['parse'](output)
+    if not spec['check'](expected, actual):
+        return 'wrong output'
+    return None
+
+
+def input_size(row):
+    return float(np.sum(np.abs(row)))
+
+
+def shrink_candidates(row, integer):
+    """Entradas "más pequeñas" que row: cada campo se acerca a cero a pasos que se reducen a la mitad"""
+    for i, value in enumerate(row):
+        if integer:
+            options = []
+            delta = int(value)
+            while delta != 0:
+                options.append(value - delta)
+                delta = int(delta / 2)
+        else:
+            options = [round(value), round(value, 1), round(value, 3), value / 2, value * 3 / 4]
+        if value < 0:
+            options.append(-value)
+        for option in options:
+            candidate = row.copy()
+            candidate[i] = option
+            if not np.array_equal(candidate, row):
+                yield candidate
+
+
+def shrink(spec, executable, row):
+    """Reduce una entrada que falla mientras siga fallando (búsqueda voraz)"""
+    integer = np.issubdtype(row.dtype, np.integer)
+    for _ in range(SHRINK_STEPS):
+        for candidate in shrink_candidates(row, integer):
+            if not spec['valid'](candidate) or input_size(candidate) >= input_size(row):
+                continue
+            expected = spec['oracle'](candidate.reshape(1, -1))[0]
+            returncode, output = run_program(executable, spec['stdin'](candidate))
+            if verdict(spec, expected, returncode, output):
+                row = candidate
+                break
+        else:
+            break
+    return row
+
+
+def describe(spec, row):
+    return ', '.join(f"{name}={value.item()}" for name, value in zip(spec['fields'], row))
+
+
+def fuzz_program(program, executable, cases, rng, pool):
+    """Resultado del fuzzing de un programa compilado"""
+    spec = FUZZ_SPECS[program]
+    inputs = spec['generate'](rng, cases)
+    expected = spec['oracle'](inputs)
+    stdin_texts = [spec['stdin'](row) for row in inputs]
+
+    results = run_all(executable, stdin_texts, pool)
+    failures = []
+    for index, (returncode, output) in enumerate(results):
+        reason = verdict(spec, expected[index], returncode, output)
+        if reason:
+            failures.append((index, reason))
+
+    result = {'cases': len(inputs), 'failures': len(failures),
+              'pass_rate': round(1 - len(failures) / len(inputs), 4) if len(inputs) else 0.0,
+              'failure_reasons': {}}
+    for _, reason in failures:
+        result['failure_reasons'][reason] = result['failure_reasons'].get(reason, 0) + 1
+
+    if failures:
+        smallest_index = min(failures, key=lambda f: input_size(inputs[f[0]]))[0]
+        minimal = shrink(spec, executable, inputs[smallest_index])
+        want = spec['oracle'](minimal.reshape(1, -1))[0]
+        returncode, output = run_program(executable, spec['stdin'](minimal))
+        result['minimal_failure'] = {
+            'input': describe(spec, minimal),
+            'stdin': spec['stdin'](minimal),
+            'expected': [v.item() for v in want],
+            'actual': spec['parse'](output) if returncode == 0 else None,
+            'reason': verdict(spec, want, returncode, output) or 'flaky',
+            'output': output[:500],
+        }
+        result['examples'] = [{'input': describe(spec, inputs[i]), 'reason': reason}
+                              for i, reason in sorted(failures, key=lambda f: input_size(inputs[f[0]]))[:5]]
+    return result
+
+
+def compile_program(source, work_dir):
+    """Ruta del ejecutable, o (None, errores de gcc)"""
+    executable = os.path.join(work_dir, Path(source).stem)
+    with tracing.span('gcc', bytes_in=tracing.file_size(source)) as sp:
+        result = subprocess.run(['gcc', '-O0', '-o', executable, source, '-lm'],
+                                capture_output=True, text=True, errors='replace')
+        sp.status = result.returncode
+    if result.returncode != 0:
+        return None, result.stderr[-1000:]
+    return executable, None
+
+
+def fuzz_student(student_dir, student_id, scores_dir='scores', cases=1000, seed=0, jobs=None):
+    """Prueba todos los programas de un estudiante y escribe scores/fuzz_<id>.json"""
+    jobs = jobs or os.cpu_count() or 4
+    report = {
+        'student_id': student_id,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'cases_per_program': cases,
+        'seed': seed,
+        'programs': {},
+    }
+    started = time.time()
+    with workspace.scratch_dir('fuzz') as work_dir, ThreadPoolExecutor(max_workers=jobs) as pool:
+        for program in FUZZ_SPECS:
+            source = os.path.join(student_dir, program)
+            if not os.path.exists(source):
+                report['programs'][program] = {'status': 'NO_FILE'}
+                print(f"⚠️  {program}: no encontrado")
+                continue
+            executable, errors = compile_program(source, work_dir)
+            if executable is None:
+                report['programs'][program] = {'status': 'COMPILE_ERROR', 'errors': errors}
+                print(f"❌ {program}: error de compilación")
+                continue
+
+            rng = np.random.default_rng([seed, sum(program.encode())])
+            with tracing.span('fuzz', student=student_id) as sp:
+                result = fuzz_program(program, executable, cases, rng, pool)
+                sp.status = 1 if result['failures'] else 0
+            result['status'] = 'FAIL' if result['failures'] else 'PASS'
+            report['programs'][program] = result
+
+            if result['failures']:
+                minimal = result['minimal_failure']
+                print(f"❌ {program}: {result['failures']}/{result['cases']} fallan; "
+                      f"mínima: {minimal['input']} ({minimal['reason']}, esperado {minimal['expected']}, "
+                      f"obtenido {minimal['actual']})")
+            else:
+                print(f"✅ {program}: {result['cases']} casos correctos")
+
+    report['seconds'] = round(time.time() - started, 2)
+    output_file = artifacts.artifact_path(scores_dir, student_id, 'fuzz')
+    workspace.write_text(output_file, json.dumps(report, indent=2, ensure_ascii=False))
+    artifacts.index_student(scores_dir, student_id)
+    print(f"📄 Resultados de fuzzing ({report['seconds']} s): {output_file}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pruebas diferenciales aleatorias contra oráculos de referencia')
+    parser.add_argument('student_dir', nargs='?', help='Directorio del estudiante (ej: msc25ahl/TAREA01)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-n', '--cases', type=int, default=1000, help='Entradas aleatorias por programa (por defecto: 1000)')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Semilla del generador (por defecto: 0)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Ejecuciones en paralelo')
+    parser.add_argument('--check-parsers', action='store_true',
+                        help='Solo verificar los parsers de salida contra los ejemplos conocidos')
+    args = parser.parse_args()
+
+    if args.check_parsers:
+        failures = check_parsers()
+        for name, output, expected, actual in failures:
+            print(f"❌ {name}({output!r}): esperado {expected}, obtenido {actual}")
+        print(f"{'❌' if failures else '✅'} {len(PARSE_EXAMPLES) - len(failures)}/{len(PARSE_EXAMPLES)} ejemplos de salida")
+        sys.exit(1 if failures else 0)
+    if not args.student_dir:
+        parser.error('falta student_dir')
+    if not os.path.isdir(args.student_dir):
+        print(f"❌ Error: no existe el directorio {args.student_dir}")
+        sys.exit(1)
+
+    student_id = os.path.basename(os.path.dirname(os.path.abspath(args.student_dir)))
+    os.environ.setdefault('TRACE_STUDENT', student_id)
+    report = fuzz_student(args.student_dir, student_id, args.scores_dir, args.cases, args.seed, args.jobs)
+    failed = any(p.get('status') != 'PASS' for p in report['programs'].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
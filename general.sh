@@ -1,85 +1,143 @@
 #!/bin/bash
 
 # Script general para ejecutar todo el proceso de evaluación
-# Uso: ./general.sh <student_directory>
+# Uso: ./general.sh <student_directory> [--force <score|test|report|all>]...
 # Ejemplo: ./general.sh msc25arg
+#
+# Las etapas cuyas entradas no cambiaron desde la última ejecución exitosa se
+# omiten (ver manifest.py); --force vuelve a ejecutar la etapa indicada.
 
 # Verificar que se proporcionó el directorio del estudiante
 if [ $# -eq 0 ]; then
     echo "❌ Error: Debe proporcionar el directorio del estudiante"
-    echo "Uso: ./general.sh <student_directory>"
+    echo "Uso: ./general.sh <student_directory> [--force <score|test|report|all>]"
     echo "Ejemplo: ./general.sh msc25arg"
     exit 1
 fi
 
 STUDENT_ID="$1"
 STUDENT_DIR="${STUDENT_ID}/TAREA01"
+shift
 
-echo "🚀 Iniciando proceso completo de evaluación para: $STUDENT_ID"
-echo "📁 Directorio: $STUDENT_DIR"
-echo "================================================"
+FORCE_STAGES=" "
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --force)
+            if [ -z "$2" ]; then
+                echo "❌ Error: --force requiere una etapa (score, test, report o all)"
+                exit 1
+            fi
+            FORCE_STAGES="${FORCE_STAGES}$2 "
+            shift 2
+            ;;
+        *)
+            echo "❌ Error: argumento desconocido: $1"
+            exit 1
+            ;;
+    esac
+done
 
-# Paso 1: Ejecutar score.sh para generar calificaciones
-echo "📊 Paso 1/4: Generando calificaciones con score.sh..."
-if ./score.sh "$STUDENT_DIR"; then
-    echo "✅ Calificaciones generadas exitosamente"
-else
-    echo "❌ Error en score.sh"
-    exit 1
-fi
+# Spans de tiempo por etapa (activos si GRADER_TRACE está definido)
+source "$(dirname "$0")/tracing.sh"
+export TRACE_STUDENT="$STUDENT_ID"
 
-echo ""
+# Directorio de artefactos del estudiante: scores/ o scores/<aa>/<id>/ (ver artifacts.py)
+SCORES_DIR=$(python3 artifacts.py dir "$STUDENT_ID")
 
-# Paso 2: Ejecutar test.sh para generar pruebas de ejecución
-echo "🧪 Paso 2/4: Ejecutando pruebas con test.sh..."
-if ./test.sh "$STUDENT_DIR" -o "scores/${STUDENT_ID}.csv"; then
-    echo "✅ Pruebas de ejecución completadas"
-else
-    echo "❌ Error en test.sh"
-    exit 1
-fi
+# Regresa 0 si la etapa está al día según el manifiesto y no se forzó
+stage_is_fresh() {
+    local stage="$1"
+    if [[ "$FORCE_STAGES" == *" $stage "* || "$FORCE_STAGES" == *" all "* ]]; then
+        echo "🔁 $stage: ejecución forzada"
+        return 1
+    fi
+    python3 manifest.py check "$STUDENT_ID" "$stage" --student-dir "$STUDENT_DIR"
+}
 
-echo ""
+# Registra un span de duración mínima para que las métricas cuenten la etapa omitida
+trace_cached() {
+    trace_begin "$1"
+    trace_end "$1" 0 0 0 "cached"
+}
+
+echo "🚀 Iniciando proceso completo de evaluación para: $STUDENT_ID"
+echo "📁 Directorio: $STUDENT_DIR"
+echo "================================================"
 
-# Paso 3: Generar PDF de pruebas de ejecución
-echo "📄 Paso 3/4: Generando PDF de pruebas de ejecución..."
-if python3 generate_test_pdf.py "scores/${STUDENT_ID}.csv" -o scores/; then
-    echo "✅ PDF de pruebas generado exitosamente"
+# Paso 1: Ejecutar score.sh para generar calificaciones (el PDF se genera en el paso 3)
+echo "📊 Paso 1/3: Generando calificaciones con score.sh..."
+if stage_is_fresh "score"; then
+    trace_cached "score"
 else
-    echo "❌ Error generando PDF de pruebas"
-    exit 1
+    trace_begin "score"
+    SCORE_SKIP_PDF=1 ./score.sh "$STUDENT_DIR"
+    STEP_STATUS=$?
+    trace_end "score" $STEP_STATUS 0 $(trace_size "$SCORES_DIR/${STUDENT_ID}.json")
+    if [ $STEP_STATUS -eq 0 ]; then
+        python3 manifest.py record "$STUDENT_ID" score --student-dir "$STUDENT_DIR"
+        echo "✅ Calificaciones generadas exitosamente"
+    else
+        echo "❌ Error en score.sh"
+        exit 1
+    fi
 fi
 
 echo ""
 
-# Paso 4: Generar PDF de calificaciones
-echo "📋 Paso 4/4: Generando PDF de calificaciones..."
-if python3 generate_pdf.py "scores/${STUDENT_ID}.json" -o scores/; then
-    echo "✅ PDF de calificaciones generado exitosamente"
+# Paso 2: Ejecutar test.sh para generar pruebas de ejecución
+echo "🧪 Paso 2/3: Ejecutando pruebas con test.sh..."
+if stage_is_fresh "test"; then
+    trace_cached "test"
 else
-    echo "❌ Error generando PDF de calificaciones"
-    exit 1
+    trace_begin "test"
+    ./test.sh "$STUDENT_DIR" -o "$SCORES_DIR/${STUDENT_ID}.csv"
+    STEP_STATUS=$?
+    trace_end "test" $STEP_STATUS 0 $(trace_size "$SCORES_DIR/${STUDENT_ID}.csv")
+    if [ $STEP_STATUS -eq 0 ]; then
+        python3 manifest.py record "$STUDENT_ID" test --student-dir "$STUDENT_DIR"
+        echo "✅ Pruebas de ejecución completadas"
+    else
+        echo "❌ Error en test.sh"
+        exit 1
+    fi
 fi
 
 echo ""
 
-# Paso 5: Combinar los PDFs
-echo "🔗 Paso 5/5: Combinando PDFs..."
-if ./merge_pdfs.sh "scores/calificaciones_${STUDENT_ID}.pdf" "scores/testing_${STUDENT_ID}.pdf" "scores/final_report_${STUDENT_ID}.pdf"; then
-    echo "✅ PDFs combinados exitosamente"
+# Paso 3: Reporte final unificado (calificaciones + pruebas, una sola compilación)
+# REPORT_PARTIALS=1 genera también calificaciones_<id>.pdf y testing_<id>.pdf
+echo "📄 Paso 3/3: Generando reporte final..."
+if stage_is_fresh "report"; then
+    trace_cached "report"
 else
-    echo "❌ Error combinando PDFs"
-    exit 1
+    REPORT_ARGS=()
+    if [ "${REPORT_PARTIALS:-0}" = "1" ]; then
+        REPORT_ARGS+=(--partials)
+    fi
+    trace_begin "report"
+    python3 generate_report.py "$SCORES_DIR/${STUDENT_ID}.json" "$SCORES_DIR/${STUDENT_ID}.csv" -o "$SCORES_DIR/" "${REPORT_ARGS[@]}"
+    STEP_STATUS=$?
+    trace_end "report" $STEP_STATUS $(( $(trace_size "$SCORES_DIR/${STUDENT_ID}.json") + $(trace_size "$SCORES_DIR/${STUDENT_ID}.csv") )) $(trace_size "$SCORES_DIR/final_report_${STUDENT_ID}.pdf")
+    if [ $STEP_STATUS -eq 0 ]; then
+        python3 manifest.py record "$STUDENT_ID" report --student-dir "$STUDENT_DIR"
+        echo "✅ Reporte final generado exitosamente"
+    else
+        echo "❌ Error generando el reporte final"
+        exit 1
+    fi
 fi
 
 echo ""
 echo "🎉 ¡Proceso completo finalizado exitosamente!"
 echo "================================================"
 echo "📄 Archivos generados:"
-echo "   • scores/${STUDENT_ID}.json - Calificaciones"
-echo "   • scores/${STUDENT_ID}.csv - Resultados de pruebas"
-echo "   • scores/calificaciones_${STUDENT_ID}.pdf - PDF de calificaciones"
-echo "   • scores/testing_${STUDENT_ID}.pdf - PDF de pruebas de ejecución"
-echo "   • scores/final_report_${STUDENT_ID}.pdf - PDF COMBINADO FINAL"
+echo "   • $SCORES_DIR/${STUDENT_ID}.json - Calificaciones"
+echo "   • $SCORES_DIR/${STUDENT_ID}.csv - Resultados de pruebas"
+echo "   • $SCORES_DIR/evaluation_results_${STUDENT_ID}.json - Resumen de pruebas"
+if [ "${REPORT_PARTIALS:-0}" = "1" ]; then
+    echo "   • $SCORES_DIR/calificaciones_${STUDENT_ID}.pdf - PDF de calificaciones"
+    echo "   • $SCORES_DIR/testing_${STUDENT_ID}.pdf - PDF de pruebas de ejecución"
+fi
+echo "   • $SCORES_DIR/final_report_${STUDENT_ID}.pdf - PDF FINAL (calificaciones + pruebas)"
 echo ""
-echo "🎯 Archivo principal: scores/final_report_${STUDENT_ID}.pdf"
+echo "🎯 Archivo principal: $SCORES_DIR/final_report_${STUDENT_ID}.pdf"
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Cohort statistics for the whole group: score distributions, per-test-case
+pass rates, compile-error rates and LLM vs execution correlation.
+
+Reads the consolidated CSVs written by generate_scores_csv.py plus the
+per-student test CSVs once, and computes everything with vectorized pandas
+operations so it scales to tens of thousands of students.
+"""
+
+import os
+import sys
+import csv
+import json
+import argparse
+from datetime import datetime
+
+import pandas as pd
+
+import artifacts
+import profiling
+
+# LLM program keys -> execution program keys (test.sh names)
+PROGRAMS = {
+    'operaciones': 'operaciones.c',
+    'resistencia': 'resistencia.c',
+    'conversionCmsMts': 'conversionCmsMts.c',
+    'conversionSegHMS': 'conversionSegsHMS.c',
+}
+
+PERCENTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+TEST_CSV_HEADER = ('Student_ID,Program_Name,Test_Type,Input_Values,Expected_Result,'
+                   'Actual_Result,Test_Status,Compilation_Status,Error_Details,Test_Score,Notes')
+
+
+def load_test_rows(scores_dir, student_ids):
+    """Load every per-student test CSV into a single DataFrame; returns (frame, skipped rows).
+
+    Rows are parsed with the csv module, as generate_test_pdf.load_csv_data
+    does: test.sh writes raw program output into Actual_Result, with quotes
+    and newlines that a strict pandas parse would drop. Rows that still do
+    not have one field per column are counted and reported, never dropped
+    silently.
+    """
+    columns = TEST_CSV_HEADER.split(',')
+    paths = dict(artifacts.list_artifacts(scores_dir, 'tests'))
+    rows = []
+    skipped = {}
+    for student_id in student_ids:
+        csv_path = paths.get(student_id)
+        if csv_path is None:
+            continue
+        try:
+            with open(csv_path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)  # header
+                for row in reader:
+                    if len(row) == len(columns):
+                        rows.append(row)
+                    elif row:
+                        skipped[student_id] = skipped.get(student_id, 0) + 1
+        except FileNotFoundError:
+            continue
+    for student_id, count in sorted(skipped.items()):
+        print(f"Warning: skipped {count} malformed test rows in {paths[student_id]}", file=sys.stderr)
+    return pd.DataFrame(rows, columns=columns, dtype=str), skipped
+
+
+def describe(frame):
+    """Distribution summary (count, mean, std, min, percentiles, max) per column."""
+    if frame.empty:
+        return {}
+    return frame.describe(percentiles=PERCENTILES).round(3).to_dict()
+
+
+def compute_statistics(student_df, evaluation_df, tests_df):
+    """Compute the cohort statistics in one pass over the loaded frames."""
+    llm_columns = {f'{program}_score': program for program in PROGRAMS}
+    llm = (student_df.set_index('student_id')[list(llm_columns)].rename(columns=llm_columns)
+           .apply(pd.to_numeric, errors='coerce') if not student_df.empty else pd.DataFrame())
+
+    exec_columns = {f'{exec_name}_percentage': program for program, exec_name in PROGRAMS.items()}
+    execution = (evaluation_df.set_index('student_id')[list(exec_columns)].rename(columns=exec_columns)
+                 .apply(pd.to_numeric, errors='coerce') if not evaluation_df.empty else pd.DataFrame())
+
+    # Compile-error rate: students with a compile error over students that submitted the file
+    compile_rates = {}
+    if not evaluation_df.empty:
+        exists = evaluation_df[[f'{p}_exists' for p in PROGRAMS.values()]].astype(str).eq('True')
+        errors = evaluation_df[[f'{p}_compilation_errors' for p in PROGRAMS.values()]].apply(pd.to_numeric, errors='coerce').gt(0)
+        exists.columns = errors.columns = list(PROGRAMS)
+        submitted = exists.sum()
+        failed = (errors & exists).sum()
+        compile_rates = (failed / submitted.where(submitted > 0)).round(4).to_dict()
+        submissions = submitted.to_dict()
+    else:
+        submissions = {}
+
+    # Correlation between LLM calificacion and execution percentage, per program
+    correlation = {}
+    if not llm.empty and not execution.empty:
+        aligned_llm, aligned_exec = llm.align(execution, join='inner', axis=0)
+        correlation = aligned_llm.corrwith(aligned_exec).round(4).to_dict()
+        totals = pd.concat([aligned_llm.sum(axis=1), aligned_exec.mean(axis=1)], axis=1)
+        correlation['total'] = round(float(totals.corr().iloc[0, 1]), 4) if len(totals) > 1 else None
+
+    # Per-test-case pass rates (only rows that actually executed)
+    test_cases = {}
+    if not tests_df.empty:
+        executed = tests_df[tests_df['Compilation_Status'] == 'COMPILED'].copy()
+        executed['passed'] = executed['Test_Status'].eq('PASS')
+        grouped = (executed.groupby(['Program_Name', 'Notes', 'Input_Values'], sort=False)['passed']
+                   .agg(['mean', 'size']).reset_index()
+                   .rename(columns={'mean': 'pass_rate', 'size': 'runs'})
+                   .sort_values(['Program_Name', 'pass_rate']))
+        grouped['pass_rate'] = grouped['pass_rate'].round(4)
+        for exec_name, cases in grouped.groupby('Program_Name', sort=False):
+            test_cases[exec_name] = cases.drop(columns='Program_Name').rename(
+                columns={'Notes': 'description', 'Input_Values': 'input'}).to_dict(orient='records')
+
+    llm_stats = describe(llm)
+    exec_stats = describe(execution)
+
+    programs = {}
+    for program, exec_name in PROGRAMS.items():
+        programs[program] = {
+            'llm_score': llm_stats.get(program, {}),
+            'execution_percentage': exec_stats.get(program, {}),
+            'submissions': int(submissions.get(program, 0)),
+            'compile_error_rate': compile_rates.get(program),
+            'llm_vs_execution_correlation': correlation.get(program),
+            'test_cases': test_cases.get(exec_name, []),
+        }
+
+    overall = {}
+    if not evaluation_df.empty:
+        overall['overall_percentage'] = describe(
+            evaluation_df[['overall_percentage']].apply(pd.to_numeric, errors='coerce')).get('overall_percentage', {})
+        overall['grades'] = evaluation_df['grade'].value_counts().to_dict()
+    if not llm.empty:
+        overall['llm_total'] = describe(llm.sum(axis=1).to_frame('total')).get('total', {})
+    overall['llm_vs_execution_correlation'] = correlation.get('total')
+
+    students = pd.Index(llm.index).union(pd.Index(execution.index))
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'students': int(len(students)),
+        'overall': overall,
+        'programs': programs,
+    }
+
+
+def _json_safe(value):
+    """Replace NaN values (not valid JSON) with None."""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def summary_rows(stats):
+    """Flatten the per-program statistics into one CSV row per program."""
+    rows = []
+    for program, data in stats['programs'].items():
+        llm = data['llm_score']
+        execution = data['execution_percentage']
+        worst = data['test_cases'][0] if data['test_cases'] else {}
+        rows.append({
+            'program': program,
+            'submissions': data['submissions'],
+            'llm_mean': llm.get('mean'),
+            'llm_p10': llm.get('10%'),
+            'llm_median': llm.get('50%'),
+            'llm_p90': llm.get('90%'),
+            'execution_mean': execution.get('mean'),
+            'execution_p10': execution.get('10%'),
+            'execution_median': execution.get('50%'),
+            'execution_p90': execution.get('90%'),
+            'compile_error_rate': data['compile_error_rate'],
+            'llm_vs_execution_correlation': data['llm_vs_execution_correlation'],
+            'worst_test_case': worst.get('description'),
+            'worst_test_case_input': worst.get('input'),
+            'worst_test_case_pass_rate': worst.get('pass_rate'),
+        })
+    return rows
+
+
+def create_latex_document(stats, output_dir='.'):
+    """Crea una página LaTeX con el resumen estadístico del grupo"""
+    from generate_pdf import clean_unicode_for_latex
+
+    image_path = "public/ibero.png" if output_dir in ('.', '') else "../public/ibero.png"
+
+    def fmt(value, pattern='{:.2f}'):
+        return '-' if value is None else pattern.format(value)
+
+    program_rows = []
+    case_rows = []
+    for program, data in stats['programs'].items():
+        llm = data['llm_score']
+        execution = data['execution_percentage']
+        rate = data['compile_error_rate']
+        program_rows.append(
+            f"{program}.c & {data['submissions']} & {fmt(llm.get('mean'))} & {fmt(llm.get('50%'))} & "
+            f"{fmt(execution.get('mean'), '{:.1f}')}\\% & {fmt(None if rate is None else rate * 100, '{:.1f}')}\\% & "
+            f"{fmt(data['llm_vs_execution_correlation'])} \\\\")
+        for case in data['test_cases'][:3]:
+            case_rows.append(
+                f"{program}.c & {clean_unicode_for_latex(str(case['description']))} & "
+                f"{clean_unicode_for_latex(str(case['input']))} & {case['pass_rate'] * 100:.1f}\\% \\\\")
+
+    return f"""\\documentclass[11pt]{{article}}
+\\usepackage[utf8]{{inputenc}}
+\\usepackage[T1]{{fontenc}}
+\\usepackage[spanish]{{babel}}
+\\usepackage{{lmodern}}
+\\usepackage[letterpaper,top=3cm,bottom=3cm,left=2cm,right=2cm]{{geometry}}
+\\usepackage{{xcolor}}
+\\usepackage{{graphicx}}
+\\usepackage{{fancyhdr}}
+\\usepackage{{booktabs}}
+\\setlength{{\\parindent}}{{0pt}}
+\\definecolor{{headerblue}}{{RGB}}{{52, 73, 94}}
+\\pagestyle{{fancy}}
+\\fancyhf{{}}
+\\fancyhead[L]{{\\includegraphics[height=1cm]{{{image_path}}}}}
+\\fancyhead[R]{{\\textbf{{Estadísticas del Grupo}}}}
+\\fancyfoot[C]{{\\thepage}}
+\\renewcommand{{\\headrulewidth}}{{0pt}}
+\\setlength{{\\headheight}}{{35pt}}
+
+\\begin{{document}}
+
+\\begin{{center}}
+\\Large\\textbf{{\\color{{headerblue}}Estadísticas del Grupo}}\\\\[0.5cm]
+\\normalsize {stats['students']} estudiantes -- {datetime.now().strftime('%d de %B de %Y')}
+\\end{{center}}
+
+\\section*{{Resumen por programa}}
+\\begin{{center}}
+\\small
+\\begin{{tabular}}{{l r r r r r r}}
+\\toprule
+\\textbf{{Programa}} & \\textbf{{Entregas}} & \\textbf{{LLM media}} & \\textbf{{LLM mediana}} & \\textbf{{Ejecución}} & \\textbf{{Err. compilación}} & \\textbf{{Correlación}} \\\\
+\\midrule
+{chr(10).join(program_rows)}
+\\bottomrule
+\\end{{tabular}}
+\\end{{center}}
+
+\\section*{{Casos de prueba con más fallas}}
+\\begin{{center}}
+\\small
+\\begin{{tabular}}{{l l l r}}
+\\toprule
+\\textbf{{Programa}} & \\textbf{{Caso}} & \\textbf{{Entrada}} & \\textbf{{Aprobados}} \\\\
+\\midrule
+{chr(10).join(case_rows)}
+\\bottomrule
+\\end{{tabular}}
+\\end{{center}}
+
+\\end{{document}}
+"""
+
+
+def write_cohort_stats(scores_dir='scores', pdf=False):
+    """Compute the cohort statistics and write the JSON/CSV (and optional PDF); None if there is no input"""
+    student_csv = os.path.join(scores_dir, 'student_scores.csv')
+    evaluation_csv = os.path.join(scores_dir, 'evaluation_results.csv')
+    if not os.path.exists(student_csv) and not os.path.exists(evaluation_csv):
+        print(f"Error: no consolidated CSVs in {scores_dir}; run generate_scores_csv.py first")
+        return None
+
+    with profiling.phase('cohort.load'):
+        student_df = pd.read_csv(student_csv) if os.path.exists(student_csv) else pd.DataFrame()
+        evaluation_df = pd.read_csv(evaluation_csv) if os.path.exists(evaluation_csv) else pd.DataFrame()
+        for frame in (student_df, evaluation_df):
+            if not frame.empty:
+                frame['student_id'] = frame['student_id'].astype(str)
+
+        student_ids = sorted(set(evaluation_df.get('student_id', [])) | set(student_df.get('student_id', [])))
+        tests_df, skipped_rows = load_test_rows(scores_dir, student_ids)
+
+    with profiling.phase('cohort.aggregate'):
+        stats = _json_safe(compute_statistics(student_df, evaluation_df, tests_df))
+        stats['skipped_test_rows'] = {'total': sum(skipped_rows.values()), 'by_student': skipped_rows}
+
+    json_path = os.path.join(scores_dir, 'cohort_stats.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
+    print(f"Cohort statistics saved to: {json_path}")
+
+    csv_path = os.path.join(scores_dir, 'cohort_stats.csv')
+    pd.DataFrame(summary_rows(stats)).to_csv(csv_path, index=False, encoding='utf-8')
+    print(f"Cohort summary CSV saved to: {csv_path}")
+
+    if pdf:
+        from generate_pdf import generate_pdf_from_latex
+        pdf_path = os.path.join(scores_dir, 'cohort_stats.pdf')
+        if not generate_pdf_from_latex(create_latex_document(stats, scores_dir), pdf_path):
+            print("💥 Error al generar PDF del grupo")
+
+    print(f"\nStudents: {stats['students']}")
+    print(f"Test rows analysed: {len(tests_df)}")
+    if skipped_rows:
+        print(f"Malformed test rows skipped: {sum(skipped_rows.values())} ({len(skipped_rows)} students)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cohort statistics from the consolidated score files')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directory with the consolidated CSVs (default: scores)')
+    parser.add_argument('--pdf', action='store_true', help='Also render a cohort summary PDF page')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start('generate_cohort_stats', args)
+
+    if write_cohort_stats(args.scores_dir, args.pdf) is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
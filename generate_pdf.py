@@ -11,6 +11,12 @@ import argparse
 from datetime import datetime
 from pathlib import Path
 
+import tracing
+import profiling
+import tex_pool
+import workspace
+from style_check import CHECKS, load_style
+
 def load_score_data(json_file):
     """Carga los datos de calificación desde un archivo JSON"""
     try:
@@ -242,16 +248,14 @@ def format_comments_with_bullets(comments):
         # Si no hay items, devolver como párrafo normal con saltos de línea
         return '\\\\\n'.join(formatted_lines)
 
-def create_latex_document(score_data, student_id, output_dir='.'):
-    """Crea un documento LaTeX estético"""
-    
-    # Determinar la ruta correcta de la imagen basada en el directorio de salida
-    if output_dir == '.' or output_dir == '':
-        image_path = "public/ibero.png"
-    else:
-        image_path = "../public/ibero.png"
-    
-    latex = f"""\\documentclass[11pt]{{article}}
+def logo_path(output_dir='.'):
+    """Ruta del logo relativa al directorio donde se compila el .tex"""
+    # scores/ o scores/<aa>/<id>/ (ver artifacts.py): tantos ../ como niveles
+    return os.path.relpath("public/ibero.png", output_dir or '.')
+
+def create_latex_preamble(image_path, header_title='Reporte de Calificaciones', extra_packages=''):
+    """Preámbulo LaTeX compartido (todo lo anterior a \\begin{document})"""
+    return f"""\\documentclass[11pt]{{article}}
 \\usepackage[utf8]{{inputenc}}
 \\usepackage[T1]{{fontenc}}
 \\usepackage[spanish]{{babel}}
@@ -283,6 +287,7 @@ def create_latex_document(score_data, student_id, output_dir='.'):
 \\usepackage{{booktabs}}
 \\usepackage{{array}}
 \\usepackage{{setspace}}
+{extra_packages}
 
 % Sin indentación en párrafos
 \\setlength{{\\parindent}}{{0pt}}
@@ -329,12 +334,14 @@ def create_latex_document(score_data, student_id, output_dir='.'):
 \\definecolor{{headerblue}}{{RGB}}{{52, 73, 94}}
 \\definecolor{{lightgray}}{{RGB}}{{245, 245, 245}}
 
+% Todo lo anterior se carga de un formato precompilado (tex_pool.py)
+%endofdump
 
 % Headers y footers
 \\pagestyle{{fancy}}
 \\fancyhf{{}}
 \\fancyhead[L]{{\\includegraphics[height=1cm]{{{image_path}}}}}
-\\fancyhead[R]{{\\textbf{{Reporte de Calificaciones}}}}
+\\fancyhead[R]{{\\textbf{{{header_title}}}}}
 \\fancyfoot[C]{{\\thepage}}
 \\renewcommand{{\\headrulewidth}}{{0pt}}
 \\renewcommand{{\\footrulewidth}}{{0pt}}
@@ -342,10 +349,31 @@ def create_latex_document(score_data, student_id, output_dir='.'):
 
 % Footer positioning - geometry package handles this
 % \\setlength{{\\footskip}}{{1cm}}
+"""
 
-\\begin{{document}}
-
-% Título principal
+def format_style_findings(style_entry):
+    """Lista LaTeX con los hallazgos de style_check.py para un ejercicio"""
+    items = []
+    for name, result in style_entry.get('checks', {}).items():
+        if result.get('ok') is None or name not in CHECKS:
+            continue
+        label, comment = CHECKS[name]
+        if result['ok']:
+            items.append(f"\\item \\textcolor{{commentgreen}}{{\\textbf{{Cumple:}}}} {clean_unicode_for_latex(label)}")
+        else:
+            items.append(f"\\item \\textcolor{{scoreorange}}{{\\textbf{{Sugerencia:}}}} {clean_unicode_for_latex(comment)} "
+                         f"({clean_unicode_for_latex(result.get('detail', ''))})")
+    if not items:
+        return ''
+    return ("\\textbf{Revisión de estilo (automática):}\\\\[0.2cm]\n"
+            "\\begin{itemize}[leftmargin=1.5em]\n\\small\n" + "\n".join(items) + "\n\\end{itemize}\n")
+
+def create_latex_body(score_data, student_id, style=None):
+    """Cuerpo del reporte de calificaciones (sin preámbulo ni \\end{document})
+
+    style son los hallazgos de style_check.py (scores/style_<id>.json), si existen.
+    """
+    latex = f"""% Título principal
 \\begin{{center}}
 \\Large\\textbf{{\\color{{headerblue}}Reporte de Calificaciones}}\\\\[0.5cm]
 \\large\\textbf{{{student_id.upper()}}}\\\\[0.3cm]
@@ -405,6 +433,8 @@ def create_latex_document(score_data, student_id, output_dir='.'):
                 print(f"⚠️  Error procesando comentarios para {exercise}: {e}")
                 formatted_comments = "Sin comentarios"
             
+            style_findings = format_style_findings((style or {}).get(exercise, {}))
+            
             latex += f"""
 \\section*{{{symbol} {exercise_name}.c}}
 
@@ -416,7 +446,8 @@ def create_latex_document(score_data, student_id, output_dir='.'):
 \\small
 {formatted_comments}
 \\end{{minipage}}
-\\end{{minipage}}
+
+{style_findings}\\end{{minipage}}
 
 \\vspace{{0.5cm}}
 \\hrule
@@ -450,58 +481,57 @@ Promedio & {average:.2f}/10 \\\\\\\\
 
 \\vfill
 \\vspace{{3cm}}
-
-\\end{{document}}
 """
     
     return latex
 
+def create_latex_document(score_data, student_id, output_dir='.', style=None):
+    """Crea un documento LaTeX estético"""
+    preamble = create_latex_preamble(logo_path(output_dir))
+    body = create_latex_body(score_data, student_id, style)
+    return f"{preamble}\n\\begin{{document}}\n\n{body}\n\\end{{document}}\n"
+
 def generate_pdf_from_latex(latex_content, output_file):
-    """Genera PDF desde LaTeX con timeout"""
+    """Genera PDF desde LaTeX con timeout
+
+    Los intermedios (.tex, .aux, .log) se escriben en un directorio temporal
+    (ver workspace.py); solo el PDF se publica en output_file, de forma atómica.
+    El preámbulo hasta %endofdump se carga precompilado (ver tex_pool.py).
+    """
+    output_dir = os.path.dirname(output_file) or '.'
+    base_name = Path(output_file).stem
     try:
-        # Crear archivo .tex temporal en el mismo directorio que el PDF
-        tex_file = output_file.replace('.pdf', '.tex')
-        with open(tex_file, 'w', encoding='utf-8', errors='ignore') as f:
-            f.write(latex_content)
-        
-        # Compilar con pdflatex (soporte completo para diacríticos con lmodern)
-        print("Compilando LaTeX con pdflatex...")
-        # Usar el directorio de salida directamente
-        output_dir = os.path.dirname(output_file)
-        tex_filename = os.path.basename(tex_file)
-        
-        # Cambiar al directorio de salida para que LaTeX genere archivos ahí
-        original_cwd = os.getcwd()
-        os.chdir(output_dir)
-        
-        # Ejecutar pdflatex en el directorio de salida
-        cmd = ['pdflatex', '-interaction=nonstopmode', tex_filename]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30, encoding='utf-8', errors='replace')
-        
-        # Volver al directorio original
-        os.chdir(original_cwd)
-        
-        # Verificar si el PDF fue generado exitosamente
-        # El PDF se genera en el directorio de salida especificado
-        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-            print(f"✅ PDF generado exitosamente: {output_file}")
-            # Limpiar archivos auxiliares (mantener .tex para debugging)
-            for ext in ['.aux', '.log']:
-                aux_file = output_file.replace('.pdf', ext)
-                if os.path.exists(aux_file):
-                    os.remove(aux_file)
-            return True
-        else:
-            print("❌ Error al compilar LaTeX:")
-            print(f"   Archivo esperado: {output_file}")
-            print(f"   Archivo existe: {os.path.exists(output_file)}")
-            if os.path.exists(output_file):
-                print(f"   Tamaño del archivo: {os.path.getsize(output_file)} bytes")
-            if result.stderr:
-                print(f"   Error stderr: {result.stderr[-500:]}")
-            if result.stdout:
-                print(f"   Salida stdout: {result.stdout[-500:]}")
-            return False
+        with workspace.scratch_dir('latex') as work_dir:
+            scratch_pdf = os.path.join(work_dir, f"{base_name}.pdf")
+            
+            # Compilar con pdflatex (ver tex_pool.py); las rutas relativas del
+            # documento (logo) se resuelven desde el directorio de salida
+            print("Compilando LaTeX con pdflatex...")
+            with tracing.span('pdflatex', bytes_in=len(latex_content.encode('utf-8'))) as sp:
+                result = tex_pool.compile_latex(latex_content, work_dir, base_name, output_dir, timeout=30)
+                sp.status = result.returncode
+                sp.bytes_out = tracing.file_size(scratch_pdf)
+            
+            # Conservar .tex y .log para depurar (GRADER_KEEP_TEX=1)
+            if workspace.keep_debug_files():
+                for ext in ['.tex', '.log']:
+                    debug_file = os.path.join(work_dir, base_name + ext)
+                    if os.path.exists(debug_file):
+                        workspace.publish(debug_file, os.path.join(output_dir, base_name + ext))
+            
+            # Verificar si el PDF fue generado exitosamente y publicarlo
+            if os.path.exists(scratch_pdf) and os.path.getsize(scratch_pdf) > 0:
+                workspace.publish(scratch_pdf, output_file)
+                print(f"✅ PDF generado exitosamente: {output_file}")
+                return True
+            else:
+                print("❌ Error al compilar LaTeX:")
+                print(f"   Archivo esperado: {output_file}")
+                if result.stderr:
+                    print(f"   Error stderr: {result.stderr[-500:]}")
+                if result.stdout:
+                    print(f"   Salida stdout: {result.stdout[-500:]}")
+                return False
             
     except subprocess.TimeoutExpired:
         print("⏰ Timeout: LaTeX tardó demasiado en compilar")
@@ -514,13 +544,17 @@ def main():
     parser = argparse.ArgumentParser(description='Generador de PDFs estéticos con logo y fuentes monospace')
     parser.add_argument('json_file', help='Archivo JSON con las calificaciones')
     parser.add_argument('-o', '--output-dir', default='.', help='Directorio de salida para el PDF (por defecto: directorio actual)')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    profiling.start('generate_pdf', args)
     
     json_file = args.json_file
     output_dir = args.output_dir
     student_id = Path(json_file).stem
     
+    os.environ.setdefault('TRACE_STUDENT', student_id)
+    
     # Cargar datos
     score_data = load_score_data(json_file)
     if not score_data:
@@ -531,8 +565,10 @@ def main():
     # Crear directorio de salida si no existe
     os.makedirs(output_dir, exist_ok=True)
     
-    # Crear documento LaTeX
-    latex_content = create_latex_document(score_data, student_id, output_dir)
+    # Crear documento LaTeX (con los hallazgos de estilo si style_check.py ya corrió)
+    with profiling.phase('pdf.render'):
+        style = load_style(os.path.dirname(json_file) or '.', student_id)
+        latex_content = create_latex_document(score_data, student_id, output_dir, style)
     
     # Generar PDF en el directorio especificado
     output_file = os.path.join(output_dir, f"calificaciones_{student_id}.pdf")
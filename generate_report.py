@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Generador del reporte final unificado
+
+Construye un solo documento LaTeX con las calificaciones del LLM y los
+resultados de las pruebas de ejecución, y lo compila una sola vez
+directamente a final_report_<id>.pdf (en lugar de dos pdflatex y un merge
+con Ghostscript). Los PDFs parciales solo se generan con --partials.
+"""
+
+import os
+import sys
+import argparse
+from pathlib import Path
+
+import generate_pdf
+import generate_test_pdf
+import profiling
+import workspace
+
+
+def create_report_document(score_data, csv_data, program_scores, student_id, output_dir='.', overflow=None, style=None):
+    """Documento con la sección de calificaciones seguida de la de pruebas"""
+    preamble = generate_pdf.create_latex_preamble(generate_pdf.logo_path(output_dir),
+                                                  extra_packages=generate_test_pdf.TABLE_PACKAGES)
+    grades_body = generate_pdf.create_latex_body(score_data, student_id, style)
+    tests_body = generate_test_pdf.create_latex_body(csv_data, program_scores, student_id, overflow)
+    return f"""{preamble}
+\\begin{{document}}
+
+{grades_body}
+\\newpage
+\\fancyhead[R]{{\\textbf{{Reporte de Pruebas de Ejecución}}}}
+
+{tests_body}
+\\end{{document}}
+"""
+
+
+def build_report(json_file, csv_file, output_dir='.', partials=False, tex_only=False):
+    """Genera evaluation_results_<id>.json y final_report_<id>.pdf; regresa True si tuvo éxito"""
+    student_id = Path(json_file).stem
+
+    # Cargar datos
+    score_data = generate_pdf.load_score_data(json_file)
+    if not score_data:
+        return False
+    csv_data = generate_test_pdf.load_csv_data(csv_file)
+    if not csv_data:
+        return False
+
+    print(f"🎓 Generando reporte final para: {student_id}")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    with profiling.phase('report.render'):
+        # Puntuaciones de pruebas y resultados en JSON (los usa generate_scores_csv.py)
+        program_scores = generate_test_pdf.calculate_program_scores(csv_data)
+        total_score, total_max_score, program_count = generate_test_pdf.summarize_program_scores(program_scores)
+        generate_test_pdf.save_evaluation_results(student_id, program_scores, total_score, total_max_score, program_count, output_dir)
+
+        # Las celdas recortadas en el PDF quedan completas en test_outputs_<id>.txt
+        overflow = []
+        style = generate_pdf.load_style(os.path.dirname(json_file) or '.', student_id)
+        latex_content = create_report_document(score_data, csv_data, program_scores, student_id, output_dir, overflow, style)
+        generate_test_pdf.save_outputs_file(overflow, student_id, output_dir)
+
+    output_file = os.path.join(output_dir, f"final_report_{student_id}.pdf")
+
+    if tex_only:
+        tex_file = output_file.replace('.pdf', '.tex')
+        workspace.write_text(tex_file, latex_content)
+        print(f"✅ LaTeX escrito: {tex_file}")
+        return True
+
+    with profiling.phase('report.compile'):
+        compiled = generate_pdf.generate_pdf_from_latex(latex_content, output_file)
+    if not compiled:
+        print("💥 Error al generar el reporte final")
+        return False
+
+    if partials:
+        print("📄 Generando PDFs parciales...")
+        generate_pdf.generate_pdf_from_latex(
+            generate_pdf.create_latex_document(score_data, student_id, output_dir, style),
+            os.path.join(output_dir, f"calificaciones_{student_id}.pdf"))
+        generate_test_pdf.generate_pdf_from_latex(
+            generate_test_pdf.create_latex_document(csv_data, program_scores, student_id, output_dir),
+            os.path.join(output_dir, f"testing_{student_id}.pdf"))
+
+    print(f"🎉 ¡Reporte final generado: {output_file}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera el reporte final (calificaciones + pruebas) con una sola compilación')
+    parser.add_argument('json_file', help='Archivo JSON con las calificaciones del LLM (scores/<id>.json)')
+    parser.add_argument('csv_file', help='Archivo CSV con los resultados de testing (scores/<id>.csv)')
+    parser.add_argument('-o', '--output-dir', default='.', help='Directorio de salida (por defecto: directorio actual)')
+    parser.add_argument('--partials', action='store_true', help='Generar también calificaciones_<id>.pdf y testing_<id>.pdf')
+    parser.add_argument('--tex-only', action='store_true', help='Solo escribir el .tex y evaluation_results_<id>.json, sin compilar')
+    profiling.add_arguments(parser)
+
+    args = parser.parse_args()
+    profiling.start('generate_report', args)
+
+    os.environ.setdefault('TRACE_STUDENT', Path(args.json_file).stem)
+
+    if not build_report(args.json_file, args.csv_file, args.output_dir, args.partials, args.tex_only):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,14 @@ with student scores per program.
 import json
 import csv
 import os
-import glob
+import argparse
 from pathlib import Path
 import pandas as pd
 
+import artifacts
+import profiling
+
+
 def load_json_file(file_path):
     """Load and parse a JSON file, return None if invalid."""
     try:
@@ -139,16 +143,14 @@ def process_evaluation_json(data, student_id):
     
     return result
 
-def main():
-    """Main function to process all JSON files and generate CSV."""
-    scores_dir = "/Users/dantebazaldua/Work/Edgar/progra_1/EJ01/scores"
-    
+def consolidate_scores(scores_dir='scores'):
+    """Process all per-student JSON files in scores_dir and write the CSV files."""
     if not os.path.exists(scores_dir):
         print(f"Error: Scores directory {scores_dir} not found")
         return
     
-    # Find all JSON files
-    json_files = glob.glob(os.path.join(scores_dir, "*.json"))
+    # Find all per-student JSON files (LLM scores and test summaries) in the artifact index
+    json_files = [path for kind in ('scores', 'evaluation') for _, path in artifacts.list_artifacts(scores_dir, kind)]
     
     if not json_files:
         print("No JSON files found in scores directory")
@@ -160,76 +162,78 @@ def main():
     student_scores_data = []
     evaluation_results_data = []
     
-    for json_file in sorted(json_files):
-        print(f"Processing: {os.path.basename(json_file)}")
+    with profiling.phase('scores_csv.load'):
+        for json_file in sorted(json_files, key=os.path.basename):
+            print(f"Processing: {os.path.basename(json_file)}")
         
-        data = load_json_file(json_file)
-        if data is None:
-            continue
+            data = load_json_file(json_file)
+            if data is None:
+                continue
         
-        student_id = extract_student_id_from_filename(json_file)
+            student_id = extract_student_id_from_filename(json_file)
         
-        # Determine file type and process accordingly
-        if 'evaluation_results' in os.path.basename(json_file):
-            processed_data = process_evaluation_json(data, student_id)
-            if processed_data:
-                evaluation_results_data.append(processed_data)
-        else:
-            processed_data = process_student_json(data, student_id)
-            if processed_data:
-                student_scores_data.append(processed_data)
+            # Determine file type and process accordingly
+            if 'evaluation_results' in os.path.basename(json_file):
+                processed_data = process_evaluation_json(data, student_id)
+                if processed_data:
+                    evaluation_results_data.append(processed_data)
+            else:
+                processed_data = process_student_json(data, student_id)
+                if processed_data:
+                    student_scores_data.append(processed_data)
     
     if not student_scores_data and not evaluation_results_data:
         print("No valid data found to process")
         return
     
-    # Convert to DataFrames
-    student_df = pd.DataFrame(student_scores_data) if student_scores_data else pd.DataFrame()
-    evaluation_df = pd.DataFrame(evaluation_results_data) if evaluation_results_data else pd.DataFrame()
-    
-    # Merge the data to create one row per student
-    merged_data = []
-    unique_students = set()
-    
-    # Get all unique student IDs
-    if not student_df.empty:
-        unique_students.update(student_df['student_id'].unique())
-    if not evaluation_df.empty:
-        unique_students.update(evaluation_df['student_id'].unique())
-    
-    for student_id in sorted(unique_students):
-        # Get records for this student
-        student_record = student_df[student_df['student_id'] == student_id] if not student_df.empty else pd.DataFrame()
-        evaluation_record = evaluation_df[evaluation_df['student_id'] == student_id] if not evaluation_df.empty else pd.DataFrame()
+    with profiling.phase('scores_csv.merge'):
+        # Convert to DataFrames
+        student_df = pd.DataFrame(student_scores_data) if student_scores_data else pd.DataFrame()
+        evaluation_df = pd.DataFrame(evaluation_results_data) if evaluation_results_data else pd.DataFrame()
+    
+        # Merge the data to create one row per student
+        merged_data = []
+        unique_students = set()
+    
+        # Get all unique student IDs
+        if not student_df.empty:
+            unique_students.update(student_df['student_id'].unique())
+        if not evaluation_df.empty:
+            unique_students.update(evaluation_df['student_id'].unique())
+    
+        for student_id in sorted(unique_students):
+            # Get records for this student
+            student_record = student_df[student_df['student_id'] == student_id] if not student_df.empty else pd.DataFrame()
+            evaluation_record = evaluation_df[evaluation_df['student_id'] == student_id] if not evaluation_df.empty else pd.DataFrame()
         
-        # Start with basic student info
-        merged_record = {'student_id': student_id}
+            # Start with basic student info
+            merged_record = {'student_id': student_id}
         
-        # Add evaluation results data (preferred for scores and statistics)
-        if not evaluation_record.empty:
-            eval_data = evaluation_record.iloc[0].to_dict()
-            eval_data = normalize_program_scores(eval_data)
-            for key, value in eval_data.items():
-                if key != 'student_id' and pd.notna(value):
-                    merged_record[key] = value
-        
-        # Add student scores data (for comments and additional info)
-        if not student_record.empty:
-            student_data = student_record.iloc[0].to_dict()
-            student_data = normalize_program_scores(student_data)
-            for key, value in student_data.items():
-                if key != 'student_id' and pd.notna(value):
-                    # Only add if not already present from evaluation data
-                    if key not in merged_record:
+            # Add evaluation results data (preferred for scores and statistics)
+            if not evaluation_record.empty:
+                eval_data = evaluation_record.iloc[0].to_dict()
+                eval_data = normalize_program_scores(eval_data)
+                for key, value in eval_data.items():
+                    if key != 'student_id' and pd.notna(value):
                         merged_record[key] = value
         
-        merged_data.append(merged_record)
+            # Add student scores data (for comments and additional info)
+            if not student_record.empty:
+                student_data = student_record.iloc[0].to_dict()
+                student_data = normalize_program_scores(student_data)
+                for key, value in student_data.items():
+                    if key != 'student_id' and pd.notna(value):
+                        # Only add if not already present from evaluation data
+                        if key not in merged_record:
+                            merged_record[key] = value
+        
+            merged_data.append(merged_record)
     
-    # Convert merged data to DataFrame
-    merged_df = pd.DataFrame(merged_data)
+        # Convert merged data to DataFrame
+        merged_df = pd.DataFrame(merged_data)
     
     # Generate CSV files
-    output_dir = "/Users/dantebazaldua/Work/Edgar/progra_1/EJ01/scores"
+    output_dir = scores_dir
     
     # 1. Merged CSV with all data (one row per student)
     merged_csv = os.path.join(output_dir, "all_scores_merged.csv")
@@ -270,5 +274,15 @@ def main():
     print(f"Evaluation results records: {len(evaluation_results_data)}")
     print(f"Merged records: {len(merged_data)}")
 
+def main():
+    """Main function to process all JSON files and generate CSV."""
+    parser = argparse.ArgumentParser(description='Consolidate per-student JSON scores into CSV files')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directory with the per-student JSON files (default: scores)')
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    profiling.start('generate_scores_csv', args)
+    
+    consolidate_scores(args.scores_dir)
+
 if __name__ == "__main__":
     main()
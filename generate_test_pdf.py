@@ -13,6 +13,18 @@ from datetime import datetime
 from pathlib import Path
 from collections import defaultdict
 
+import tracing
+import profiling
+import tex_pool
+import workspace
+from generate_pdf import logo_path
+
+# Paquetes de tablas que el reporte de pruebas agrega al preámbulo base
+TABLE_PACKAGES = """\\usepackage{colortbl}
+\\usepackage{longtable}
+\\usepackage{adjustbox}
+\\usepackage{makecell}"""
+
 def load_csv_data(csv_file):
     """Carga los datos de testing desde un archivo CSV"""
     try:
@@ -94,32 +106,125 @@ def calculate_program_scores(csv_data):
     
     return program_scores
 
-def format_test_results_table(csv_data, program_name):
-    """Formatea los resultados de testing en una tabla profesional para un programa específico"""
+# Límites de cada celda de la tabla de pruebas. Una salida enorme (un ciclo
+# infinito imprimiendo) no debe volverse cientos de páginas ni hacer que
+# pdflatex exceda su timeout; el texto completo va a test_outputs_<id>.txt
+MAX_CELL_CHARS = 400
+MAX_CELL_LINES = 8
+MAX_ERROR_CHARS = 1500
+MAX_ERROR_LINES = 25
+# Fragmentos sin espacios más largos que esto se parten para que quepan en la columna
+MAX_TOKEN_CHARS = 30
+
+LATEX_SPECIAL_CHARS = {
+    '\\': '\\textbackslash{}',
+    '{': '\\{',
+    '}': '\\}',
+    '%': '\\%',
+    '$': '\\$',
+    '#': '\\#',
+    '&': '\\&',
+    '_': '\\_',
+    '^': '\\textasciicircum{}',
+    '~': '\\textasciitilde{}',
+    '<': '\\textless{}',
+    '>': '\\textgreater{}',
+}
+
+def outputs_filename(student_id):
+    """Nombre del archivo con las salidas completas de las pruebas"""
+    return f"test_outputs_{student_id}.txt"
+
+def escape_latex_text(text):
+    """Escapa texto arbitrario de un programa para una celda LaTeX
+
+    Descarta caracteres de control y parte los fragmentos largos sin espacios
+    para que el salto de línea de la columna p{} funcione.
+    """
+    pieces = []
+    run = 0
+    for char in text:
+        if char in ' \t':
+            pieces.append(' ')
+            run = 0
+            continue
+        if not char.isprintable():
+            continue
+        if run >= MAX_TOKEN_CHARS:
+            pieces.append('\\allowbreak{}')
+            run = 0
+        pieces.append(LATEX_SPECIAL_CHARS.get(char, char))
+        run += 1
+    return ''.join(pieces)
+
+def truncate_text(text, max_chars=MAX_CELL_CHARS, max_lines=MAX_CELL_LINES):
+    """(texto recortado, caracteres omitidos) respetando ambos límites"""
+    lines = text.splitlines()
+    shown = '\n'.join(lines[:max_lines])
+    if len(shown) > max_chars:
+        shown = shown[:max_chars]
+    return shown, len(text.replace('\r', '')) - len(shown)
+
+def format_cell(text, reference, student_id, overflow, separator=' | ',
+                max_chars=MAX_CELL_CHARS, max_lines=MAX_CELL_LINES):
+    """Celda LaTeX acotada; si se recorta, registra el texto completo en overflow"""
+    text = text.replace('\r', '')
+    shown, omitted = truncate_text(text, max_chars, max_lines)
+    cell = separator.join(escape_latex_text(line) for line in shown.split('\n'))
+    if omitted > 0:
+        if overflow is not None:
+            overflow.append((reference, text))
+        cell += (f" \\textit{{\\textcolor{{scoreorange}}{{[\\ldots{{}} truncado: {omitted} caracteres más, "
+                 f"ver {escape_latex_text(outputs_filename(student_id))} ({escape_latex_text(reference)})]}}}}")
+    return cell
+
+def unescape_error_details(details):
+    """Revierte el escape de comas y comillas que test.sh aplica a Error_Details"""
+    return details.replace('\\,', ',').replace('\\"', '"')
+
+def format_test_results_table(csv_data, program_name, student_id='', overflow=None):
+    """Formatea los resultados de testing en una tabla profesional para un programa específico
+
+    La tabla es un longtable que se parte entre páginas y repite el encabezado.
+    Cada celda se limita a MAX_CELL_CHARS / MAX_CELL_LINES; lo recortado se
+    agrega a overflow como (referencia, texto completo).
+    """
     program_tests = [row for row in csv_data if row['Program_Name'] == program_name]
     
     if not program_tests:
         return "No hay pruebas disponibles para este programa."
     
-    # Crear tabla LaTeX profesional con mejor formato para texto largo
+    program_label = program_name.replace('.c', '')
+    header = ("\\textbf{Prueba} & \\textbf{Entrada} & \\textbf{Esperado} & "
+              "\\textbf{Resultado} & \\textbf{Estado} \\\\")
+    
+    # Columnas de ancho fijo: el ancho no depende del contenido, así que una sola
+    # pasada de pdflatex basta aunque la tabla ocupe varias páginas
     table_rows = []
-    table_rows.append("\\begin{center}")
-    table_rows.append("\\resizebox{\\textwidth}{!}{%")
-    table_rows.append("\\begin{tabular}{|c|p{2.5cm}|p{5cm}|p{5cm}|c|}")
+    table_rows.append("{\\small")
+    table_rows.append("\\begin{longtable}{|>{\\centering\\arraybackslash}p{1.1cm}|p{2.6cm}|p{4.2cm}|p{5.6cm}|>{\\centering\\arraybackslash}p{1.3cm}|}")
     table_rows.append("\\hline")
     table_rows.append("\\rowcolor{lightgray}")
-    table_rows.append("\\textbf{Prueba} & \\textbf{Entrada} & \\textbf{Esperado} & \\textbf{Resultado} & \\textbf{Estado} \\\\")
+    table_rows.append(header)
+    table_rows.append("\\hline")
+    table_rows.append("\\endfirsthead")
     table_rows.append("\\hline")
+    table_rows.append("\\rowcolor{lightgray}")
+    table_rows.append(header)
+    table_rows.append("\\hline")
+    table_rows.append("\\endhead")
     
+    compile_errors = []
     for i, test in enumerate(program_tests, 1):
-        # Limpiar y formatear texto para LaTeX
-        input_clean = test['Input_Values'].replace('\\', '\\textbackslash ').replace('{', '\\{').replace('}', '\\}')
-        expected_clean = test['Expected_Result'].replace('\\', '\\textbackslash ').replace('{', '\\{').replace('}', '\\}')
-        # Para el resultado actual, usar espacios para separar líneas y mantener en la celda
-        actual_clean = test['Actual_Result'].replace(chr(10), ' | ').replace(chr(13), '').replace('\\', '\\textbackslash ').replace('{', '\\{').replace('}', '\\}')
+        reference = f"{program_label} #{i}"
+        # Limpiar, acotar y formatear texto para LaTeX
+        input_clean = format_cell(test['Input_Values'], f"{reference} entrada", student_id, overflow)
+        expected_clean = format_cell(test['Expected_Result'], f"{reference} esperado", student_id, overflow)
+        # Para el resultado actual, usar separadores para mantener las líneas en la celda
+        actual_clean = format_cell(test['Actual_Result'], f"{reference} resultado", student_id, overflow)
         
-        # No truncar texto - mostrar salida completa
-        # Los textos largos se ajustarán automáticamente con resizebox
+        if test.get('Compilation_Status') == 'COMPILE_ERROR' and test.get('Error_Details'):
+            compile_errors.append(unescape_error_details(test['Error_Details']))
             
         # Estado con colores
         if test['Test_Status'] == 'PASS':
@@ -134,22 +239,51 @@ def format_test_results_table(csv_data, program_name):
         table_rows.append(f"{i} & {input_clean} & {expected_clean} & {actual_clean} & {status} \\\\")
         table_rows.append("\\hline")
     
-    table_rows.append("\\end{tabular}")
-    table_rows.append("}%")
-    table_rows.append("\\end{center}")
+    table_rows.append("\\end{longtable}")
+    table_rows.append("}")
+    
+    # Errores de compilación: todas las pruebas comparten el mismo mensaje de gcc
+    if compile_errors:
+        error_text = format_cell(compile_errors[0], f"{program_label} compilación", student_id, overflow, separator=' ',
+                                 max_chars=MAX_ERROR_CHARS, max_lines=MAX_ERROR_LINES)
+        table_rows.append("")
+        table_rows.append("\\textbf{\\textcolor{red}{Errores de compilación:}}\\\\[0.2cm]")
+        table_rows.append("{\\footnotesize\\ttfamily")
+        table_rows.append(error_text)
+        table_rows.append("\\par}")
     
     return "\n".join(table_rows)
 
-def create_latex_document(csv_data, program_scores, student_id, output_dir='.'):
+def format_outputs_file(overflow, student_id):
+    """Texto del archivo con las salidas completas que se recortaron en el PDF"""
+    lines = [f"Salidas completas de las pruebas: {student_id}",
+             f"Generado: {datetime.now().isoformat(timespec='seconds')}",
+             ""]
+    for reference, text in overflow:
+        lines.append(f"===== {reference} ({len(text)} caracteres) =====")
+        lines.append(text)
+        lines.append("")
+    return "\n".join(lines)
+
+def save_outputs_file(overflow, student_id, output_dir='.'):
+    """Escribe test_outputs_<id>.txt si hubo celdas recortadas; regresa la ruta o None"""
+    outputs_file = os.path.join(output_dir, outputs_filename(student_id))
+    if not overflow:
+        # Un archivo de una corrida anterior ya no corresponde a este reporte
+        if os.path.exists(outputs_file):
+            os.remove(outputs_file)
+        return None
+    workspace.write_text(outputs_file, format_outputs_file(overflow, student_id))
+    print(f"📝 Salidas completas ({len(overflow)} celdas recortadas): {outputs_file}")
+    return outputs_file
+
+def create_latex_document(csv_data, program_scores, student_id, output_dir='.', overflow=None):
     """Crea un documento LaTeX estético para resultados de testing"""
     
     # Determinar la ruta correcta de la imagen basada en el directorio de salida
-    if output_dir == '.' or output_dir == '':
-        image_path = "public/ibero.png"
-    else:
-        image_path = "../public/ibero.png"
+    image_path = logo_path(output_dir)
     
-    latex = f"""\\documentclass[11pt]{{article}}
+    return f"""\\documentclass[11pt]{{article}}
 \\usepackage[utf8]{{inputenc}}
 \\usepackage[T1]{{fontenc}}
 \\usepackage[spanish]{{babel}}
@@ -180,10 +314,7 @@ def create_latex_document(csv_data, program_scores, student_id, output_dir='.'):
 \\usepackage{{listings}}
 \\usepackage{{booktabs}}
 \\usepackage{{array}}
-\\usepackage{{colortbl}}
-\\usepackage{{longtable}}
-\\usepackage{{adjustbox}}
-\\usepackage{{makecell}}
+{TABLE_PACKAGES}
 
 % Sin indentación en párrafos
 \\setlength{{\\parindent}}{{0pt}}
@@ -209,6 +340,9 @@ def create_latex_document(csv_data, program_scores, student_id, output_dir='.'):
 \\definecolor{{headerblue}}{{RGB}}{{52, 73, 94}}
 \\definecolor{{lightgray}}{{RGB}}{{245, 245, 245}}
 
+% Todo lo anterior se carga de un formato precompilado (tex_pool.py)
+%endofdump
+
 % Headers y footers
 \\pagestyle{{fancy}}
 \\fancyhf{{}}
@@ -224,7 +358,16 @@ def create_latex_document(csv_data, program_scores, student_id, output_dir='.'):
 
 \\begin{{document}}
 
-% Título principal
+{create_latex_body(csv_data, program_scores, student_id, overflow)}
+\\end{{document}}
+"""
+
+def create_latex_body(csv_data, program_scores, student_id, overflow=None):
+    """Cuerpo del reporte de pruebas (sin preámbulo ni \\end{document})
+
+    Las celdas recortadas se agregan a overflow (ver save_outputs_file).
+    """
+    latex = f"""% Título principal
 \\begin{{center}}
 \\Large\\textbf{{\\color{{headerblue}}Reporte de Pruebas de Ejecución}}\\\\[0.5cm]
 \\large\\textbf{{{student_id.upper()}}}\\\\[0.3cm]
@@ -267,7 +410,7 @@ def create_latex_document(csv_data, program_scores, student_id, output_dir='.'):
                 score_latex = f"\\textcolor{{red}}{{\\textbf{{{scores['total_score']}/{scores['max_score']} ({percentage:.1f}\\%)}}}}"
             
             # Formatear resultados de testing en tabla
-            test_results_table = format_test_results_table(csv_data, program)
+            test_results_table = format_test_results_table(csv_data, program, student_id, overflow)
             
             # Crear tabla de resumen del programa
             summary_table = f"""
@@ -381,12 +524,18 @@ Calificación & {grade_color} \\\\\\\\
 \\begin{{center}}
 \\textbf{{Prof. Edgar Ortiz}}\\\\[0.2cm]
 \\end{{center}}
-
-\\end{{document}}
 """
     
     return latex
 
+def summarize_program_scores(program_scores):
+    """Totales de puntos, puntos máximos y programas evaluados"""
+    programs = {program: scores for program, scores in program_scores.items() if program != '_metadata'}
+    total_score = sum(scores['total_score'] for scores in programs.values())
+    total_max_score = sum(scores['max_score'] for scores in programs.values())
+    program_count = sum(1 for scores in programs.values() if scores['exists'])
+    return total_score, total_max_score, program_count
+
 def save_evaluation_results(student_id, program_scores, total_score, total_max_score, program_count, output_dir='.'):
     """Guarda los resultados de evaluación en formato JSON"""
     import json
@@ -448,8 +597,7 @@ def save_evaluation_results(student_id, program_scores, total_score, total_max_s
     # Guardar archivo JSON
     json_file = os.path.join(output_dir, f"evaluation_results_{student_id}.json")
     try:
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(evaluation_results, f, indent=2, ensure_ascii=False)
+        workspace.write_text(json_file, json.dumps(evaluation_results, indent=2, ensure_ascii=False))
         print(f"✅ Resultados de evaluación guardados: {json_file}")
         return json_file
     except Exception as e:
@@ -457,49 +605,46 @@ def save_evaluation_results(student_id, program_scores, total_score, total_max_s
         return None
 
 def generate_pdf_from_latex(latex_content, output_file):
-    """Genera PDF desde LaTeX con timeout"""
+    """Genera PDF desde LaTeX con timeout
+
+    Los intermedios (.tex, .aux, .log) se escriben en un directorio temporal
+    (ver workspace.py); solo el PDF se publica en output_file, de forma atómica.
+    El preámbulo hasta %endofdump se carga precompilado (ver tex_pool.py).
+    """
+    output_dir = os.path.dirname(output_file) or '.'
+    base_name = Path(output_file).stem
     try:
-        # Crear archivo .tex temporal en el mismo directorio que el PDF
-        tex_file = output_file.replace('.pdf', '.tex')
-        with open(tex_file, 'w', encoding='utf-8', errors='ignore') as f:
-            f.write(latex_content)
-        
-        # Compilar con pdflatex
-        print("Compilando LaTeX con pdflatex...")
-        output_dir = os.path.dirname(output_file)
-        tex_filename = os.path.basename(tex_file)
-        
-        # Cambiar al directorio de salida para que LaTeX genere archivos ahí
-        original_cwd = os.getcwd()
-        os.chdir(output_dir)
-        
-        # Ejecutar pdflatex en el directorio de salida
-        cmd = ['pdflatex', '-interaction=nonstopmode', tex_filename]
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30, encoding='utf-8', errors='replace')
-        
-        # Volver al directorio original
-        os.chdir(original_cwd)
-        
-        # Verificar si el PDF fue generado exitosamente
-        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-            print(f"✅ PDF de testing generado exitosamente: {output_file}")
-            # Limpiar archivos auxiliares
-            for ext in ['.aux', '.log']:
-                aux_file = output_file.replace('.pdf', ext)
-                if os.path.exists(aux_file):
-                    os.remove(aux_file)
-            return True
-        else:
-            print(f"❌ Error al compilar LaTeX:")
-            print(f"   Archivo esperado: {output_file}")
-            print(f"   Archivo existe: {os.path.exists(output_file)}")
-            if os.path.exists(output_file):
-                print(f"   Tamaño del archivo: {os.path.getsize(output_file)} bytes")
-            if result.stderr:
-                print(f"   Error stderr: {result.stderr[-500:]}")
-            if result.stdout:
-                print(f"   Salida stdout: {result.stdout[-500:]}")
-            return False
+        with workspace.scratch_dir('latex') as work_dir:
+            scratch_pdf = os.path.join(work_dir, f"{base_name}.pdf")
+            
+            # Compilar con pdflatex (ver tex_pool.py); las rutas relativas del
+            # documento (logo) se resuelven desde el directorio de salida
+            print("Compilando LaTeX con pdflatex...")
+            with tracing.span('pdflatex', bytes_in=len(latex_content.encode('utf-8'))) as sp:
+                result = tex_pool.compile_latex(latex_content, work_dir, base_name, output_dir, timeout=30)
+                sp.status = result.returncode
+                sp.bytes_out = tracing.file_size(scratch_pdf)
+            
+            # Conservar .tex y .log para depurar (GRADER_KEEP_TEX=1)
+            if workspace.keep_debug_files():
+                for ext in ['.tex', '.log']:
+                    debug_file = os.path.join(work_dir, base_name + ext)
+                    if os.path.exists(debug_file):
+                        workspace.publish(debug_file, os.path.join(output_dir, base_name + ext))
+            
+            # Verificar si el PDF fue generado exitosamente y publicarlo
+            if os.path.exists(scratch_pdf) and os.path.getsize(scratch_pdf) > 0:
+                workspace.publish(scratch_pdf, output_file)
+                print(f"✅ PDF de testing generado exitosamente: {output_file}")
+                return True
+            else:
+                print("❌ Error al compilar LaTeX:")
+                print(f"   Archivo esperado: {output_file}")
+                if result.stderr:
+                    print(f"   Error stderr: {result.stderr[-500:]}")
+                if result.stdout:
+                    print(f"   Salida stdout: {result.stdout[-500:]}")
+                return False
             
     except subprocess.TimeoutExpired:
         print("⏰ Timeout: LaTeX tardó demasiado en compilar")
@@ -512,13 +657,17 @@ def main():
     parser = argparse.ArgumentParser(description='Generador de PDFs estéticos para resultados de testing de C')
     parser.add_argument('csv_file', help='Archivo CSV con los resultados de testing')
     parser.add_argument('-o', '--output-dir', default='.', help='Directorio de salida para el PDF (por defecto: directorio actual)')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
+    profiling.start('generate_test_pdf', args)
     
     csv_file = args.csv_file
     output_dir = args.output_dir
     student_id = Path(csv_file).stem
     
+    os.environ.setdefault('TRACE_STUDENT', student_id)
+    
     # Cargar datos
     csv_data = load_csv_data(csv_file)
     if not csv_data:
@@ -529,16 +678,17 @@ def main():
     # Crear directorio de salida si no existe
     os.makedirs(output_dir, exist_ok=True)
     
-    # Calcular puntuaciones por programa
-    program_scores = calculate_program_scores(csv_data)
-    
-    # Crear documento LaTeX
-    latex_content = create_latex_document(csv_data, program_scores, student_id, output_dir)
+    with profiling.phase('test_pdf.render'):
+        # Calcular puntuaciones por programa
+        program_scores = calculate_program_scores(csv_data)
+        
+        # Crear documento LaTeX; las salidas recortadas van a test_outputs_<id>.txt
+        overflow = []
+        latex_content = create_latex_document(csv_data, program_scores, student_id, output_dir, overflow)
+    outputs_file = save_outputs_file(overflow, student_id, output_dir)
     
     # Calcular totales para guardar en JSON
-    total_score = sum(scores['total_score'] for program, scores in program_scores.items() if program != '_metadata')
-    total_max_score = sum(scores['max_score'] for program, scores in program_scores.items() if program != '_metadata')
-    program_count = sum(1 for program, scores in program_scores.items() if program != '_metadata' and scores['exists'])
+    total_score, total_max_score, program_count = summarize_program_scores(program_scores)
     
     # Guardar resultados de evaluación en JSON
     json_file = save_evaluation_results(student_id, program_scores, total_score, total_max_score, program_count, output_dir)
@@ -555,6 +705,8 @@ def main():
         print(f"   • Resumen general con porcentajes")
         if json_file:
             print(f"   • Resultados JSON: {json_file}")
+        if outputs_file:
+            print(f"   • Salidas completas: {outputs_file}")
     else:
         print("💥 Error al generar PDF de testing")
 
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Servicio local de calificación: subir una entrega, consultar resultados y PDF
+
+Para re-calificaciones puntuales y autoevaluación de alumnos sin lanzar
+general.sh. Un solo proceso mantiene cargados los módulos del pipeline y
+atiende por HTTP (127.0.0.1 por omisión):
+
+  POST /students/<id>/submission   zip o tar(.gz) con los .c/.h de TAREA01 (vía ingest.py, copiados a <id>/TAREA01); se encola
+  POST /students/<id>/grade        re-califica la entrega actual (?force=score,test)
+  GET  /jobs/<job>                 estado de un trabajo
+  GET  /students/<id>              JSON con calificaciones, pruebas por programa y etapas
+  GET  /students/<id>/report.pdf   reporte final; se genera la primera vez que se pide
+  GET  /status                     cola, trabajos en curso y tiempos
+
+Los trabajos (score → test) corren en -j hilos; la cola tiene un límite
+(--max-queue) y, si está llena, se responde 503 con Retry-After estimado en
+lugar de acumular trabajo durante la hora pico antes de la fecha límite. Una
+entrega que ya estaba en cola no se vuelve a encolar. El manifiesto incremental
+hace de cache: una entrega sin cambios no vuelve a llamar al LLM ni a gcc, y el
+PDF solo se vuelve a compilar si cambiaron sus entradas.
+
+Uso:
+  python3 grade_server.py -j 4                     # http://127.0.0.1:8765
+  curl --data-binary @entrega.zip http://127.0.0.1:8765/students/msc25ahl/submission
+  curl http://127.0.0.1:8765/students/msc25ahl
+  curl -o reporte.pdf http://127.0.0.1:8765/students/msc25ahl/report.pdf
+"""
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import queue
+import argparse
+import itertools
+import threading
+from datetime import datetime
+from collections import defaultdict
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import grader
+import tex_pool
+
+STUDENT_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+# Directorios del repositorio que no son estudiantes (además de --scores-dir y --logs-dir)
+RESERVED_IDS = {'scores', 'public', '_logs', '_profile', '.submissions', '__pycache__'}
+JOB_STAGES = ['score', 'test']
+
+
+
+class Job:
+    """Un trabajo de calificación (score → test) de un estudiante"""
+
+    def __init__(self, job_id, student_id, force):
+        self.id = job_id
+        self.student_id = student_id
+        self.force = force
+        self.state = 'queued'
+        self.failed_stage = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'job': self.id,
+            'student_id': self.student_id,
+            'state': self.state,
+            'failed_stage': self.failed_stage,
+            'force': self.force,
+            'submitted_at': datetime.fromtimestamp(self.submitted_at).isoformat(),
+            'queue_seconds': round((self.started_at or time.time()) - self.submitted_at, 2),
+            'run_seconds': round((self.finished_at or time.time()) - self.started_at, 2) if self.started_at else None,
+        }
+
+
+class GradingService:
+    """Cola acotada, hilos de trabajo y cache de resultados por estudiante"""
+
+    def __init__(self, args):
+        self.args = args
+        self.queue = queue.Queue(maxsize=args.max_queue)
+        self.jobs = {}
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.student_locks = defaultdict(threading.Lock)
+        self.counter = itertools.count(1)
+        self.results = {}
+        self.durations = []
+        self.logger = grader.ThreadLog(sys.stdout)
+
+    def start(self):
+        os.makedirs(self.args.logs_dir, exist_ok=True)
+        os.makedirs(self.args.scores_dir, exist_ok=True)
+        if self.args.partials:
+            os.environ['REPORT_PARTIALS'] = '1'
+        sys.stdout = self.logger
+        for _ in range(self.args.jobs):
+            threading.Thread(target=self.work, daemon=True).start()
+
+    def student_dir(self, student_id):
+        return os.path.join(student_id, 'TAREA01')
+
+    def valid_student(self, student_id):
+        """Un ID nuevo, o uno con <id>/TAREA01; nunca un directorio o archivo del repositorio (scores, public, grader.py)"""
+        if not STUDENT_ID.match(student_id):
+            return False
+        reserved = RESERVED_IDS | {os.path.basename(os.path.normpath(path))
+                                   for path in (self.args.scores_dir, self.args.logs_dir)}
+        if student_id in reserved:
+            return False
+        return not os.path.exists(student_id) or os.path.isdir(self.student_dir(student_id))
+
+    def retry_after(self):
+        """Segundos estimados hasta que se libere un lugar en la cola"""
+        with self.lock:
+            recent = self.durations[-50:]
+        average = sum(recent) / len(recent) if recent else 30.0
+        return max(1, round(average * (self.queue.qsize() + 1) / self.args.jobs))
+
+    def submit(self, student_id, force=()):
+        """Encola un trabajo; regresa (job, nuevo) o (None, False) si la cola está llena"""
+        with self.lock:
+            current = self.jobs.get(self.latest.get(student_id))
+            if current and current.state == 'queued':
+                current.force = sorted(set(current.force) | set(force))
+                return current, False
+            job = Job(f"{next(self.counter):06d}", student_id, sorted(force))
+            try:
+                self.queue.put_nowait(job)
+            except queue.Full:
+                return None, False
+            self.jobs[job.id] = job
+            self.latest[student_id] = job.id
+            return job, True
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            grader._module('tracing').set_student(job.student_id)
+            log_path = os.path.join(self.args.logs_dir, f"{job.student_id}.log")
+            with self.student_locks[job.student_id], open(log_path, 'a', encoding='utf-8') as log_file:
+                job.state = 'running'
+                job.started_at = time.time()
+                self.logger.attach(log_file)
+                try:
+                    print(f"🌐 Trabajo {job.id} ({datetime.now().isoformat(timespec='seconds')})")
+                    for stage in JOB_STAGES:
+                        if grader.run_stage(stage, job.student_id, self.args.scores_dir, log_file, job.force) != 0:
+                            job.failed_stage = stage
+                            break
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                    job.failed_stage = job.failed_stage or 'exception'
+                finally:
+                    self.logger.detach()
+                job.finished_at = time.time()
+                job.state = 'failed' if job.failed_stage else 'done'
+            with self.lock:
+                self.durations.append(job.finished_at - job.started_at)
+                del self.durations[:-200]
+            mark = '❌' if job.failed_stage else '✅'
+            self.logger.stream.write(f"{mark} {job.student_id} trabajo {job.id}: {job.state} "
+                                     f"({job.finished_at - job.started_at:.1f} s)\n")
+            self.queue.task_done()
+
+    def store_submission(self, student_id, payload):
+        """Ingiere un zip o tar con ingest.py; regresa 'new', 'changed' o 'unchanged'
+
+        Se hace bajo el lock del estudiante: si hay un trabajo suyo en curso,
+        la subida espera a que termine para que el manifiesto no registre
+        archivos distintos a los calificados.
+        """
+        ingest = grader._module('ingest')
+        with self.student_locks[student_id]:
+            session = ingest.Ingest(ingest.options('.', student_id))
+            try:
+                states = session.add_archive(io.BytesIO(payload), f"upload:{student_id}")
+            finally:
+                session.close()
+        if student_id not in states:
+            raise ValueError('el archivo no contiene .c ni .h')
+        return states[student_id]
+
+    def stages(self, student_id):
+        manifest = grader._module('manifest')
+        return {stage: manifest.stale_reason(stage, student_id, self.student_dir(student_id), self.args.scores_dir) or 'ok'
+                for stage in grader.STAGES}
+
+    def result(self, student_id):
+        """Calificaciones y pruebas por programa; se recalculan solo si cambiaron los archivos"""
+        artifacts = grader._module('artifacts')
+        json_file = artifacts.artifact_path(self.args.scores_dir, student_id, 'scores')
+        csv_file = artifacts.artifact_path(self.args.scores_dir, student_id, 'tests')
+        key = tuple((os.stat(path).st_size, os.stat(path).st_mtime_ns) if os.path.exists(path) else None
+                    for path in (json_file, csv_file))
+        with self.lock:
+            cached = self.results.get(student_id)
+        if cached and cached[0] == key:
+            payload = cached[1]
+        else:
+            payload = {'scores': None, 'tests': None}
+            if key[0]:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    payload['scores'] = json.load(f)
+            if key[1]:
+                generate_test_pdf = grader._module('generate_test_pdf')
+                program_scores = generate_test_pdf.calculate_program_scores(generate_test_pdf.load_csv_data(csv_file) or [])
+                total, total_max, count = generate_test_pdf.summarize_program_scores(program_scores)
+                payload['tests'] = {'total_score': total, 'max_score': total_max, 'programs_found': count,
+                                    'programs': {program: dict(scores) for program, scores in program_scores.items()
+                                                 if program != '_metadata'}}
+            with self.lock:
+                self.results[student_id] = (key, payload)
+        job = self.jobs.get(self.latest.get(student_id))
+        return {'student_id': student_id, 'job': job.to_dict() if job else None,
+                'stages': self.stages(student_id), **payload}
+
+    def report(self, student_id):
+        """Ruta del reporte final, compilándolo si falta o si cambiaron sus entradas; (ruta, error)"""
+        stages = self.stages(student_id)
+        pending = [stage for stage in JOB_STAGES if stages[stage] != 'ok']
+        if pending:
+            return None, f"etapas pendientes: {', '.join(pending)}"
+        with self.student_locks[student_id]:
+            if grader._module('manifest').stale_reason('report', student_id, self.student_dir(student_id),
+                                                       self.args.scores_dir) is not None:
+                grader._module('tracing').set_student(student_id)
+                log_path = os.path.join(self.args.logs_dir, f"{student_id}.log")
+                with open(log_path, 'a', encoding='utf-8') as log_file:
+                    self.logger.attach(log_file)
+                    try:
+                        status = grader.run_stage('report', student_id, self.args.scores_dir, log_file,
+                                                  partials=self.args.partials)
+                    finally:
+                        self.logger.detach()
+                if status != 0:
+                    return None, f"no se pudo generar el reporte (ver {log_path})"
+        return grader._module('artifacts').artifact_path(self.args.scores_dir, student_id, 'report'), None
+
+    def status(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+            recent = self.durations[-50:]
+        states = defaultdict(int)
+        for job in jobs:
+            states[job.state] += 1
+        return {'workers': self.args.jobs, 'queued': self.queue.qsize(), 'max_queue': self.args.max_queue,
+                'jobs': dict(states), 'average_seconds': round(sum(recent) / len(recent), 2) if recent else None}
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None
+    server_version = 'GradeServer/1.0'
+
+    def log_message(self, format, *args):
+        if self.service.args.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, code, payload, headers=None):
+        body = json.dumps(payload, indent=2, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        """(partes de la ruta, parámetros); valida el ID de estudiante si lo hay"""
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        if len(parts) >= 2 and parts[0] == 'students' and not self.service.valid_student(parts[1]):
+            return None, None
+        return parts, parse_qs(url.query)
+
+    def enqueue(self, student_id, force):
+        job, created = self.service.submit(student_id, force)
+        if job is None:
+            retry = self.service.retry_after()
+            self.send_json(503, {'error': 'cola llena', 'retry_after': retry}, {'Retry-After': str(retry)})
+            return
+        self.send_json(202, {**job.to_dict(), 'new': created, 'status_url': f"/jobs/{job.id}",
+                             'result_url': f"/students/{student_id}"}, {'Location': f"/jobs/{job.id}"})
+
+    def do_POST(self):
+        parts, query = self.route()
+        if parts is None:
+            return self.send_json(400, {'error': 'ID de estudiante inválido'})
+        if len(parts) != 3 or parts[0] != 'students' or parts[2] not in ('submission', 'grade'):
+            return self.send_json(404, {'error': 'ruta desconocida'})
+        student_id = parts[1]
+        force = [stage for value in query.get('force', []) for stage in value.split(',') if stage]
+        if any(stage not in JOB_STAGES + ['all'] for stage in force):
+            return self.send_json(400, {'error': f"force admite: {', '.join(JOB_STAGES + ['all'])}"})
+
+        if parts[2] == 'submission':
+            length = int(self.headers.get('Content-Length') or 0)
+            if length <= 0:
+                return self.send_json(411, {'error': 'falta el cuerpo con el zip o tar de la entrega'})
+            if length > self.service.args.max_upload:
+                return self.send_json(413, {'error': f"entrega mayor a {self.service.args.max_upload} bytes"})
+            try:
+                state = self.service.store_submission(student_id, self.rfile.read(length))
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            print(f"📥 {student_id}: entrega {state}")
+        elif not os.path.isdir(self.service.student_dir(student_id)):
+            return self.send_json(404, {'error': f"no existe {self.service.student_dir(student_id)}"})
+        self.enqueue(student_id, force)
+
+    def do_GET(self):
+        parts, _ = self.route()
+        if parts is None:
+            return self.send_json(400, {'error': 'ID de estudiante inválido'})
+        if parts in ([], ['status']):
+            return self.send_json(200, self.service.status())
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = self.service.jobs.get(parts[1])
+            return self.send_json(200, job.to_dict()) if job else self.send_json(404, {'error': 'trabajo desconocido'})
+        if len(parts) == 2 and parts[0] == 'students':
+            if not os.path.isdir(self.service.student_dir(parts[1])):
+                return self.send_json(404, {'error': f"no existe {self.service.student_dir(parts[1])}"})
+            return self.send_json(200, self.service.result(parts[1]))
+        if len(parts) == 3 and parts[0] == 'students' and parts[2] == 'report.pdf':
+            if not os.path.isdir(self.service.student_dir(parts[1])):
+                return self.send_json(404, {'error': f"no existe {self.service.student_dir(parts[1])}"})
+            path, error = self.service.report(parts[1])
+            if error:
+                return self.send_json(409, {'error': error})
+            with open(path, 'rb') as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_json(404, {'error': 'ruta desconocida'})
+
+
+def serve(args):
+    service = GradingService(args)
+    service.start()
+    tex_pool.start(args.tex_workers)
+    Handler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"🌐 Servicio de calificación en http://{args.host}:{server.server_port} "
+          f"({args.jobs} trabajos en paralelo, cola de {args.max_queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servicio detenido")
+    finally:
+        server.server_close()
+    return 0
+
+
+def add_arguments(parser):
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Trabajos de calificación en paralelo (por defecto: 4)')
+    parser.add_argument('--host', default='127.0.0.1', help='Dirección (por defecto: 127.0.0.1)')
+    parser.add_argument('-p', '--port', type=int, default=8765, help='Puerto (por defecto: 8765)')
+    parser.add_argument('--max-queue', type=int, default=100,
+                        help='Trabajos en espera antes de responder 503 (por defecto: 100)')
+    parser.add_argument('--max-upload', type=int, default=2_000_000,
+                        help='Tamaño máximo de una entrega en bytes (por defecto: 2000000)')
+    parser.add_argument('--partials', action='store_true', help='Generar también los PDFs parciales')
+    parser.add_argument('--logs-dir', default='_logs', help='Logs por estudiante (por defecto: _logs)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Registrar cada solicitud HTTP')
+    tex_pool.add_arguments(parser)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servicio local de calificación por HTTP')
+    add_arguments(parser)
+    sys.exit(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Punto de entrada único del pipeline de evaluación
+
+Un solo proceso de Python ejecuta las etapas de muchos estudiantes: el reporte
+LaTeX, el manifiesto incremental, la consolidación de CSVs, las estadísticas
+del grupo y el resumen de uso del LLM se llaman como funciones, sin lanzar un
+intérprete nuevo por estudiante. Solo score.sh (llm) y test.sh (gcc) siguen
+siendo subprocesos. Los módulos pesados (pandas, generadores LaTeX) se
+importan la primera vez que un subcomando los necesita.
+
+Subcomandos:
+  run        score → test → report por estudiante, con omisión incremental
+  report     solo el reporte final para estudiantes ya evaluados
+  aggregate  generate_scores_csv + generate_cohort_stats (pandas se importa una vez)
+  usage      resumen de tokens y costo del LLM
+  bind       un PDF del grupo con marcador por estudiante
+  similarity entregas casi idénticas por ejercicio (MinHash + LSH)
+  fuzz       pruebas diferenciales aleatorias contra oráculos de referencia
+  libtest    funciones de operaciones.c llamadas con ctypes desde una biblioteca compartida
+  watch      vigila */TAREA01/ y re-califica solo a quien reenvía
+  serve      servicio HTTP local: subir entregas, consultar resultados y PDF
+  status     etapas al día / pendientes según el manifiesto
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import importlib
+import contextlib
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STAGES = ['score', 'test', 'report']
+
+
+def _module(name):
+    """Importa un módulo del repositorio la primera vez que se usa"""
+    return importlib.import_module(name)
+
+
+class ThreadLog:
+    """stdout que envía lo que imprime cada hilo de estudiante a su propio log"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def attach(self, log_file):
+        self.local.file = log_file
+
+    def detach(self):
+        self.local.file = None
+
+    def write(self, text):
+        target = getattr(self.local, 'file', None) or self.stream
+        return target.write(text)
+
+    def flush(self):
+        target = getattr(self.local, 'file', None) or self.stream
+        target.flush()
+
+
+def discover_students(base_dir='.'):
+    """Directorios de estudiantes: todo <id>/ que contenga TAREA01/"""
+    return sorted(os.path.basename(os.path.dirname(path.rstrip('/')))
+                  for path in glob.glob(os.path.join(base_dir, '*', 'TAREA01', '')))
+
+
+def _run_script(cmd, student_id, log_file, extra_env=None):
+    env = dict(os.environ, TRACE_STUDENT=student_id, **(extra_env or {}))
+    log_file.flush()
+    return subprocess.run(cmd, env=env, stdout=log_file, stderr=subprocess.STDOUT).returncode
+
+
+def run_stage(stage, student_id, scores_dir, log_file, force=(), partials=False):
+    """Ejecuta una etapa (o la omite si el manifiesto dice que está al día); regresa el código de salida"""
+    manifest = _module('manifest')
+    tracing = _module('tracing')
+    student_dir = os.path.join(student_id, 'TAREA01')
+
+    if stage not in force and 'all' not in force:
+        reason = manifest.stale_reason(stage, student_id, student_dir, scores_dir)
+        if reason is None:
+            with tracing.span(stage, student=student_id) as sp:
+                sp.reason = 'cached'
+            print(f"⏭️  {stage}: entradas sin cambios, se omite")
+            return 0
+        print(f"🔄 {stage}: {reason}")
+
+    # Si solo cambiaron algunos programas, test.sh re-califica el resto desde el corpus
+    test_env = None
+    if stage == 'test' and stage not in force and 'all' not in force:
+        programs = manifest.changed_programs(student_id, student_dir, scores_dir)
+        if programs:
+            test_env = {'TEST_PROGRAMS': ' '.join(programs)}
+            print(f"🎯 test: solo {', '.join(programs)}; el resto se toma del corpus")
+
+    artifacts = _module('artifacts')
+    out_dir = artifacts.student_dir(scores_dir, student_id)
+    json_file = artifacts.artifact_path(scores_dir, student_id, 'scores')
+    csv_file = artifacts.artifact_path(scores_dir, student_id, 'tests')
+    with tracing.span(stage, student=student_id) as sp:
+        if stage == 'score':
+            sp.status = _run_script([os.path.join(REPO_DIR, 'score.sh'), student_dir], student_id, log_file,
+                                    {'SCORE_SKIP_PDF': '1'})
+            sp.bytes_out = tracing.file_size(json_file)
+        elif stage == 'test':
+            sp.status = _run_script([os.path.join(REPO_DIR, 'test.sh'), student_dir, '-o', csv_file], student_id, log_file,
+                                    test_env)
+            sp.bytes_out = tracing.file_size(csv_file)
+        else:
+            sp.bytes_in = tracing.file_size(json_file) + tracing.file_size(csv_file)
+            ok = _module('generate_report').build_report(json_file, csv_file, out_dir, partials)
+            sp.status = 0 if ok else 1
+            sp.bytes_out = tracing.file_size(artifacts.artifact_path(scores_dir, student_id, 'report'))
+        status = sp.status
+
+    if status == 0:
+        manifest.record_stage(stage, student_id, student_dir, scores_dir)
+    return status
+
+
+def run_student(student_id, stages, args, logger):
+    """Etapas de un estudiante en el hilo actual; la salida va a <logs-dir>/<id>.log"""
+    _module('tracing').set_student(student_id)
+    log_path = os.path.join(args.logs_dir, f"{student_id}.log")
+    started = time.time()
+    failed_stage = None
+    # profiling (cProfile, pstats, tracemalloc) solo se importa si hay un perfil activo
+    profile = _module('profiling').thread_profile() if os.environ.get('GRADER_PROFILE') else contextlib.nullcontext()
+    with open(log_path, 'w', encoding='utf-8') as log_file, profile:
+        logger.attach(log_file)
+        try:
+            for stage in stages:
+                if run_stage(stage, student_id, args.scores_dir, log_file, args.force, args.partials) != 0:
+                    failed_stage = stage
+                    break
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            failed_stage = failed_stage or 'exception'
+        finally:
+            logger.detach()
+    return student_id, failed_stage, time.time() - started
+
+
+def run_students(students, stages, args):
+    """Ejecuta las etapas para todos los estudiantes con -j hilos"""
+    os.makedirs(args.logs_dir, exist_ok=True)
+    os.makedirs(args.scores_dir, exist_ok=True)
+    if args.partials:
+        os.environ['REPORT_PARTIALS'] = '1'
+
+    # Los reportes de todos los hilos comparten los pdflatex precalentados
+    _module('tex_pool').start(getattr(args, 'tex_workers', None))
+
+    logger = ThreadLog(sys.stdout)
+    sys.stdout = logger
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(run_student, student, stages, args, logger) for student in students]
+            for done, future in enumerate(futures, 1):
+                student_id, failed_stage, seconds = future.result()
+                if failed_stage:
+                    failed.append(student_id)
+                    print(f"❌ [{done}/{len(students)}] {student_id}: falló {failed_stage} ({seconds:.1f} s, ver {args.logs_dir}/{student_id}.log)")
+                else:
+                    print(f"✅ [{done}/{len(students)}] {student_id} ({seconds:.1f} s)")
+    finally:
+        sys.stdout = logger.stream
+    return failed
+
+
+def command_run(args):
+    students = args.students or discover_students()
+    if not students:
+        print("❌ Error: no se encontraron directorios <id>/TAREA01")
+        return 1
+    if args.pack > 1 and args.samples > 1:
+        # score_pack.py hace una sola solicitud por paquete: no hay consenso de K muestras
+        print("❌ Error: --pack y --samples > 1 no se pueden combinar (el consenso es por estudiante)")
+        return 1
+    started = time.time()
+    if args.samples > 1:
+        os.environ['SCORE_SAMPLES'] = str(args.samples)
+    if args.pack > 1:
+        pack_scores(students, args)
+    failed = run_students(students, STAGES, args)
+    if not args.no_aggregate:
+        command_aggregate(args)
+    print(f"🎉 {len(students)} estudiantes en {time.time() - started:.1f} s: "
+          f"{len(students) - len(failed)} ok, {len(failed)} con error")
+    return 1 if failed else 0
+
+
+def pack_scores(students, args):
+    """Califica con score_pack.py (varios estudiantes por solicitud) a quienes tienen score pendiente
+
+    Los que ya quedaron calificados se omiten después en run_students; la
+    etapa score deja de estar forzada porque el paquete ya la ejecutó.
+    """
+    manifest = _module('manifest')
+    forced = 'score' in args.force or 'all' in args.force
+    pending = [s for s in students
+               if forced or manifest.stale_reason('score', s, os.path.join(s, 'TAREA01'), args.scores_dir) is not None]
+    if pending:
+        score_pack = _module('score_pack')
+        score_pack.score_students(pending, score_pack.options(args.scores_dir, args.pack, args.jobs))
+    if 'all' in args.force:
+        args.force = [stage for stage in STAGES if stage != 'score']
+    args.force = [stage for stage in args.force if stage != 'score']
+
+
+def command_report(args):
+    students = args.students or discover_students()
+    if not students:
+        print("❌ Error: no se encontraron estudiantes")
+        return 1
+    failed = run_students(students, ['report'], args)
+    return 1 if failed else 0
+
+
+def command_aggregate(args):
+    _module('generate_scores_csv').consolidate_scores(args.scores_dir)
+    stats = _module('generate_cohort_stats').write_cohort_stats(args.scores_dir, getattr(args, 'pdf', False))
+    return 0 if stats is not None else 1
+
+
+def command_usage(args):
+    _module('llm_usage').write_summary(args.scores_dir, args.top)
+    return 0
+
+
+def command_bind(args):
+    bind_cohort = _module('bind_cohort')
+    reports = bind_cohort.find_reports(args.scores_dir, set(args.students))
+    if not reports:
+        print(f"❌ Error: no hay final_report_<id>.pdf en {args.scores_dir}")
+        return 1
+    output_file = args.output or os.path.join(args.scores_dir, 'cohort_report.pdf')
+    pages, skipped, outputs = bind_cohort.bind_reports(reports, output_file, volume_size=args.volume_size)
+    print(f"📚 {len(reports) - len(skipped)} reportes, {pages} páginas: {', '.join(outputs)}")
+    return 1 if skipped else 0
+
+
+def command_similarity(args):
+    _module('similarity').write_similarity_report('.', args.scores_dir, args.threshold, set(args.students))
+    return 0
+
+
+def command_fuzz(args):
+    fuzz_test = _module('fuzz_test')
+    students = args.students or discover_students()
+    failed = 0
+    for student_id in students:
+        _module('tracing').set_student(student_id)
+        print(f"🎲 {student_id}")
+        report = fuzz_test.fuzz_student(os.path.join(student_id, 'TAREA01'), student_id, args.scores_dir,
+                                        args.cases, args.seed, args.jobs)
+        failed += any(p.get('status') != 'PASS' for p in report['programs'].values())
+    print(f"🎉 {len(students)} estudiantes: {len(students) - failed} sin fallas, {failed} con fallas")
+    return 1 if failed else 0
+
+
+def command_libtest(args):
+    lib_test = _module('lib_test')
+    students = args.students or discover_students()
+    failed = 0
+    for student_id in students:
+        _module('tracing').set_student(student_id)
+        print(f"🧩 {student_id}")
+        report = lib_test.run_library_tests(os.path.join(student_id, 'TAREA01'), student_id, args.scores_dir,
+                                       args.cases, args.seed)
+        failed += any(program.get('status') == 'COMPILE_ERROR'
+                      or any(r['status'] != 'PASS' for r in program.get('functions', {}).values())
+                      for program in report['programs'].values())
+    print(f"🎉 {len(students)} estudiantes: {len(students) - failed} sin fallas, {failed} con fallas")
+    return 1 if failed else 0
+
+
+def command_watch(args):
+    return _module('watch').watch(args)
+
+
+def command_serve(args):
+    return _module('grade_server').serve(args)
+
+
+def command_status(args):
+    manifest = _module('manifest')
+    students = args.students or discover_students()
+    stale = 0
+    for student_id in students:
+        student_dir = os.path.join(student_id, 'TAREA01')
+        marks = []
+        for stage in STAGES:
+            reason = manifest.stale_reason(stage, student_id, student_dir, args.scores_dir)
+            marks.append(f"{stage}=ok" if reason is None else f"{stage}=pendiente ({reason})")
+            stale += reason is not None
+        print(f"{student_id}: {', '.join(marks)}")
+    return 1 if stale else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline de evaluación en un solo proceso')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub, students=True):
+        if students:
+            sub.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los <id>/TAREA01)')
+        sub.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+
+    run = subparsers.add_parser('run', help='score → test → report por estudiante')
+    add_common(run)
+    run.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    run.add_argument('--force', action='append', default=[], choices=STAGES + ['all'],
+                     help='Volver a ejecutar la etapa aunque sus entradas no hayan cambiado (repetible)')
+    run.add_argument('--partials', action='store_true', help='Generar también los PDFs parciales')
+    run.add_argument('--logs-dir', default='_logs', help='Logs por estudiante (por defecto: _logs)')
+    run.add_argument('--no-aggregate', action='store_true', help='No consolidar CSVs ni estadísticas al final')
+    run.add_argument('--pack', type=int, default=1, metavar='N',
+                     help='Calificar con el LLM a N estudiantes por solicitud (score_pack.py; por defecto: 1)')
+    run.add_argument('--samples', type=int, default=int(os.environ.get('SCORE_SAMPLES', '1')), metavar='K',
+                     help='Consenso de K muestras del LLM por estudiante (consensus.py; por defecto: SCORE_SAMPLES o 1)')
+
+    report = subparsers.add_parser('report', help='Solo el reporte final')
+    add_common(report)
+    report.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    report.add_argument('--force', action='append', default=[], choices=['report', 'all'], help='Regenerar aunque esté al día')
+    report.add_argument('--partials', action='store_true', help='Generar también los PDFs parciales')
+    report.add_argument('--logs-dir', default='_logs', help='Logs por estudiante (por defecto: _logs)')
+
+    aggregate = subparsers.add_parser('aggregate', help='CSVs consolidados y estadísticas del grupo')
+    add_common(aggregate, students=False)
+    aggregate.add_argument('--pdf', action='store_true', help='Generar también cohort_stats.pdf')
+
+    usage = subparsers.add_parser('usage', help='Resumen de tokens y costo del LLM')
+    add_common(usage, students=False)
+    usage.add_argument('--top', type=int, default=10, help='Número de entregas más caras a mostrar')
+
+    bind = subparsers.add_parser('bind', help='Un PDF del grupo con marcador por estudiante')
+    add_common(bind)
+    bind.add_argument('-o', '--output', help='PDF de salida (por defecto: <scores-dir>/cohort_report.pdf)')
+    bind.add_argument('--volume-size', type=int, default=200,
+                      help='Reportes por volumen cohort_report_NNN.pdf; acota la memoria (por defecto: 200; 0 = un solo PDF)')
+
+    similarity = subparsers.add_parser('similarity', help='Entregas casi idénticas por ejercicio')
+    add_common(similarity)
+    similarity.add_argument('-t', '--threshold', type=float, default=0.8,
+                            help='Similitud de Jaccard mínima para reportar un par (por defecto: 0.8)')
+
+    fuzz = subparsers.add_parser('fuzz', help='Pruebas aleatorias contra oráculos de referencia')
+    add_common(fuzz)
+    fuzz.add_argument('-n', '--cases', type=int, default=1000, help='Entradas aleatorias por programa (por defecto: 1000)')
+    fuzz.add_argument('-s', '--seed', type=int, default=0, help='Semilla del generador (por defecto: 0)')
+    fuzz.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Ejecuciones en paralelo')
+
+    libtest = subparsers.add_parser('libtest', help='Funciones del estudiante llamadas desde una biblioteca compartida')
+    add_common(libtest)
+    libtest.add_argument('-n', '--cases', type=int, default=1_000_000, help='Entradas por función (por defecto: 1000000)')
+    libtest.add_argument('-s', '--seed', type=int, default=0, help='Semilla del generador (por defecto: 0)')
+
+    subparsers.add_parser('watch', help='Re-califica automáticamente las entregas que cambian')
+    subparsers.add_parser('serve', help='Servicio HTTP local de calificación')
+
+    status = subparsers.add_parser('status', help='Etapas al día o pendientes por estudiante')
+    add_common(status)
+
+    for sub in subparsers.choices.values():
+        # Los mismos que profiling.add_arguments, sin importar profiling si no se pide --profile
+        sub.add_argument('--profile', nargs='?', const='_profile', default=os.environ.get('GRADER_PROFILE'),
+                         metavar='DIR', help='Perfilar con cProfile y tracemalloc (profiling.py); escribe .pstats y '
+                                             '.json en DIR (por defecto: _profile)')
+        sub.add_argument('--profile-top', type=int, default=25, metavar='N',
+                         help='Funciones y asignaciones en el resumen (por defecto: 25)')
+
+    # Los argumentos que declaran tex_pool, watch y grade_server solo se importan
+    # para el subcomando elegido (el primer argumento que es un subcomando)
+    module_arguments = {'run': 'tex_pool', 'report': 'tex_pool', 'watch': 'watch', 'serve': 'grade_server'}
+    command = next((arg for arg in sys.argv[1:] if arg in subparsers.choices), None)
+    if command in module_arguments:
+        _module(module_arguments[command]).add_arguments(subparsers.choices[command])
+
+    args = parser.parse_args()
+    if args.profile:
+        _module('profiling').start(f"grader-{args.command}", args)
+    commands = {
+        'run': command_run,
+        'report': command_report,
+        'aggregate': command_aggregate,
+        'usage': command_usage,
+        'bind': command_bind,
+        'similarity': command_similarity,
+        'fuzz': command_fuzz,
+        'libtest': command_libtest,
+        'watch': command_watch,
+        'serve': command_serve,
+        'status': command_status,
+    }
+    sys.exit(commands[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,504 @@
+#!/usr/bin/env python3
+"""
+Ingesta de entregas desde archivos comprimidos a un almacén direccionado por contenido
+
+Las entregas llegan como exportaciones zip del LMS (o tar) que antes se
+desempacaban a mano en <id>/TAREA01/. Este script las lee en flujo, sin
+extraerlas a un directorio intermedio:
+
+  • cada .c/.h se lee una sola vez: el sha256 se calcula mientras se escribe en
+    .submissions/blobs/<aa>/<sha256>; si el blob ya existe (mismo archivo en
+    otra entrega o en una entrega anterior) no se escribe nada
+  • los nombres se normalizan a los que usa test.sh: conversionSegHMS.c,
+    "Operaciones.C" u "operaciones (1).c" quedan como conversionSegsHMS.c y
+    operaciones.c; si hay dos candidatos gana el nombre exacto y después el
+    más reciente
+  • <id>/TAREA01/ se arma con copias de los blobs y se reemplaza con rename;
+    --hardlink usa hard links (sin copiar, pero una escritura en TAREA01
+    modificaría el blob que comparten todas las entregas que lo usan)
+  • .submissions/index.sqlite registra por estudiante sus archivos, su blob,
+    el archivo y miembro de origen y una huella de la entrega; las etapas
+    siguientes leen <id>/TAREA01/ como siempre, ya con los nombres de test.sh
+
+Una reentrega idéntica no cuesta nada: en un zip, el CRC32 y el tamaño del
+directorio central bastan para saber que nada cambió sin descomprimir, y
+<id>/TAREA01/ no se toca (el manifiesto y watch.py no ven cambios).
+
+Uso:
+  python3 ingest.py add export_moodle.zip                 # ID = primer componente hasta '_'
+  python3 ingest.py add entregas.tar.gz --id-pattern '(msc\\d+\\w+)'
+  python3 ingest.py add msc25ahl.zip --student msc25ahl   # un archivo por estudiante
+  python3 ingest.py scan                                  # registra <id>/TAREA01/ desempacados a mano
+  python3 ingest.py ls [id]
+  python3 ingest.py gc                                    # borra blobs que ya nadie usa
+"""
+
+import io
+import os
+import re
+import stat
+import time
+import shutil
+import sqlite3
+import tarfile
+import zipfile
+import hashlib
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import TEST_PROGRAMS
+from llm_usage import EXERCISE_FILES
+
+STORE_DIR = '.submissions'
+SOURCE_SUFFIXES = ('.c', '.h')
+DUPLICATE_SUFFIX = re.compile(r'\s*(\(\d+\)|-\d+|_\d+|copy|copia)$', re.IGNORECASE)
+MAX_SOURCE_BYTES = 1_000_000
+STUDENT_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id  TEXT PRIMARY KEY,
+    digest      TEXT NOT NULL,
+    fingerprint TEXT,
+    source      TEXT,
+    files       INTEGER NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    student_id TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    member     TEXT,
+    PRIMARY KEY (student_id, name)
+);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+"""
+
+
+def _name_key(name):
+    stem, suffix = os.path.splitext(name)
+    return re.sub(r'[^a-z0-9]', '', DUPLICATE_SUFFIX.sub('', stem).lower()) + suffix.lower()
+
+
+# Clave normalizada → nombre que espera test.sh
+CANONICAL_NAMES = {_name_key(name): name for name in TEST_PROGRAMS}
+for _names in EXERCISE_FILES.values():
+    _canonical = next(name for name in _names if name in TEST_PROGRAMS)
+    CANONICAL_NAMES.update({_name_key(name): _canonical for name in _names})
+
+
+def canonical_name(name):
+    """Nombre en TAREA01 para un archivo de la entrega, o None si no es .c/.h"""
+    if not name.lower().endswith(SOURCE_SUFFIXES) or name.startswith('.'):
+        return None
+    known = CANONICAL_NAMES.get(_name_key(name))
+    if known:
+        return known
+    stem, suffix = os.path.splitext(name)
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', DUPLICATE_SUFFIX.sub('', stem)) + suffix.lower()
+
+
+def index_path(base_dir='.'):
+    return os.path.join(base_dir, STORE_DIR, 'index.sqlite')
+
+
+def blob_path(base_dir, digest):
+    return os.path.join(base_dir, STORE_DIR, 'blobs', digest[:2], digest)
+
+
+def connect(base_dir='.'):
+    os.makedirs(os.path.join(base_dir, STORE_DIR), exist_ok=True)
+    connection = sqlite3.connect(index_path(base_dir), timeout=60, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA busy_timeout = 60000')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def store_blob(base_dir, stream, limit=MAX_SOURCE_BYTES):
+    """Copia un flujo al almacén calculando su sha256 en la misma pasada; regresa (sha256, tamaño, nuevo)"""
+    temp_dir = os.path.join(base_dir, STORE_DIR, 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, f"{os.getpid()}.{threading.get_ident()}")
+    digest = hashlib.sha256()
+    size = 0
+    with open(temp_path, 'wb') as f:
+        for chunk in iter(lambda: stream.read(1 << 16), b''):
+            size += len(chunk)
+            if size > limit:
+                f.close()
+                os.remove(temp_path)
+                raise ValueError(f"archivo mayor a {limit} bytes")
+            digest.update(chunk)
+            f.write(chunk)
+    sha = digest.hexdigest()
+    final_path = blob_path(base_dir, sha)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+        return sha, size, False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.chmod(temp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    os.replace(temp_path, final_path)
+    return sha, size, True
+
+
+class Candidate:
+    """Un .c/.h de la entrega de un estudiante dentro del archivo"""
+
+    def __init__(self, student_id, member, name, mtime, open_stream=None, crc=None, size=None, stored=None):
+        self.student_id = student_id
+        self.member = member
+        self.name = name
+        self.canonical = canonical_name(name)
+        self.exact = self.canonical == name
+        self.mtime = mtime
+        self.open_stream = open_stream
+        self.crc = crc
+        self.size = size
+        self.stored = stored
+
+
+def _member_path(member):
+    return re.sub(r'^(\./)+', '', member.replace('\\', '/'))
+
+
+def top_folder(member):
+    """Carpeta de primer nivel de un miembro ('' si está en la raíz del archivo)"""
+    parts = _member_path(member).split('/', 1)
+    return parts[0] if len(parts) > 1 else ''
+
+
+def student_of(member, args):
+    """ID del estudiante a partir de la ruta dentro del archivo, o None"""
+    if '__MACOSX' in member:
+        return None
+    student_id = args.student
+    if not student_id:
+        match = args.id_pattern.search(_member_path(member))
+        # "Juan Perez_123_assignsubmission_file_" → Juan_Perez
+        student_id = re.sub(r'\s+', '_', match.group(1).strip()) if match else None
+    return student_id if student_id and STUDENT_ID.match(student_id) else None
+
+
+def zip_candidates(archive, prefix, args, outer_student=None):
+    """Candidatos de un zip; los zip anidados (la entrega del alumno dentro del export) se abren en memoria"""
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        member = prefix + info.filename
+        student_id = outer_student or student_of(member, args)
+        name = os.path.basename(info.filename.replace('\\', '/'))
+        if name.lower().endswith('.zip') and info.file_size <= args.max_nested:
+            # Queda abierto: sus miembros se leen después, al procesar al estudiante
+            nested = zipfile.ZipFile(io.BytesIO(archive.read(info)))
+            yield from zip_candidates(nested, member + '!', args, student_id)
+            continue
+        if student_id and canonical_name(name) and info.file_size <= MAX_SOURCE_BYTES:
+            yield Candidate(student_id, member, name, datetime(*info.date_time).timestamp(),
+                            lambda info=info, archive=archive: archive.open(info), info.CRC, info.file_size)
+
+
+def choose(candidates):
+    """{nombre canónico: candidato}: gana el nombre exacto, luego el más reciente"""
+    chosen = {}
+    for candidate in candidates:
+        current = chosen.get(candidate.canonical)
+        if current is None or (candidate.exact, candidate.mtime) > (current.exact, current.mtime):
+            chosen[candidate.canonical] = candidate
+    return chosen
+
+
+def fingerprint(chosen):
+    """Huella barata (CRC32 y tamaño del zip) para detectar reentregas idénticas sin descomprimir"""
+    if any(candidate.crc is None for candidate in chosen.values()):
+        return None
+    lines = sorted(f"{name}:{c.crc:08x}:{c.size}" for name, c in chosen.items())
+    return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+
+def submission_digest(files):
+    return hashlib.sha256('\n'.join(f"{name}:{sha}" for name, (sha, _, _) in sorted(files.items())).encode()).hexdigest()
+
+
+def materialize(base_dir, student_id, files, hardlink=False):
+    """Arma <id>/TAREA01/ con copias (o hard links) de los blobs y lo reemplaza con rename
+
+    Los blobs son compartidos por todas las entregas con el mismo archivo: con
+    hard links, algo que escriba dentro de TAREA01 sin reemplazar el archivo
+    los corrompería para todas, por eso se copian salvo que se pida lo contrario.
+    """
+    target = os.path.join(base_dir, student_id, 'TAREA01')
+    staging = os.path.join(base_dir, student_id, f".TAREA01.ingest.{os.getpid()}.{threading.get_ident()}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, (sha, _, _) in files.items():
+        source = blob_path(base_dir, sha)
+        dest = os.path.join(staging, name)
+        if not hardlink:
+            shutil.copyfile(source, dest)
+            continue
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copyfile(source, dest)
+    previous = None
+    if os.path.isdir(target):
+        previous = staging + '.old'
+        os.rename(target, previous)
+    os.rename(staging, target)
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def rename_variants(student_dir, chosen):
+    """Solo renombra las variantes dentro de un TAREA01 existente; el resto de sus archivos se conserva"""
+    for name, candidate in chosen.items():
+        source = os.path.join(student_dir, candidate.name)
+        dest = os.path.join(student_dir, name)
+        if candidate.name != name and not os.path.exists(dest):
+            os.rename(source, dest)
+
+
+class Ingest:
+    """Estado compartido de una ingesta: índice, contadores y opciones"""
+
+    def __init__(self, args):
+        self.args = args
+        self.base_dir = args.base_dir
+        self.connection = connect(self.base_dir)
+        self.lock = threading.Lock()
+        self.in_place = False
+        self.counts = {'new': 0, 'changed': 0, 'unchanged': 0, 'conflicts': 0, 'files': 0, 'blobs_new': 0, 'bytes_read': 0}
+
+    def close(self):
+        self.connection.close()
+
+    def count(self, **values):
+        with self.lock:
+            for key, value in values.items():
+                self.counts[key] += value
+
+    def previous(self, student_id):
+        with self.lock:
+            return self.connection.execute('SELECT digest, fingerprint FROM students WHERE student_id = ?',
+                                           (student_id,)).fetchone()
+
+    def student(self, student_id, chosen, source):
+        """Guarda una entrega: blobs, TAREA01 e índice; regresa 'new', 'changed' o 'unchanged'"""
+        previous = self.previous(student_id)
+        materialized = os.path.isdir(os.path.join(self.base_dir, student_id, 'TAREA01'))
+        quick = fingerprint(chosen)
+        if previous and materialized and quick and previous[1] == quick:
+            self.count(unchanged=1)
+            return 'unchanged'
+
+        files = {}
+        for name, candidate in chosen.items():
+            if candidate.stored:
+                files[name] = candidate.stored
+                continue
+            with candidate.open_stream() as stream:
+                files[name] = store_blob(self.base_dir, stream)
+            self.count(blobs_new=int(files[name][2]), bytes_read=files[name][1])
+        digest = submission_digest(files)
+        self.count(files=len(files))
+        if previous and materialized and previous[0] == digest:
+            state = 'unchanged'
+        elif self.in_place:
+            rename_variants(os.path.join(self.base_dir, student_id, 'TAREA01'), chosen)
+            state = 'changed' if previous else 'new'
+        else:
+            materialize(self.base_dir, student_id, files, self.args.hardlink)
+            state = 'changed' if previous else 'new'
+
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute('INSERT OR REPLACE INTO students VALUES (?, ?, ?, ?, ?, ?)',
+                                    (student_id, digest, quick, source, len(files), datetime.now().isoformat()))
+            self.connection.execute('DELETE FROM files WHERE student_id = ?', (student_id,))
+            self.connection.executemany('INSERT INTO files VALUES (?, ?, ?, ?, ?)',
+                                        [(student_id, name, sha, size, chosen[name].member)
+                                         for name, (sha, size, _) in files.items()])
+            self.connection.execute('COMMIT')
+        self.count(**{state: 1})
+        return state
+
+    def group(self, candidates, source):
+        """Agrupa por estudiante y procesa a cada uno (en paralelo para zip); regresa {id: estado}
+
+        Si un mismo ID sale de varias carpetas de primer nivel (dos alumnos con
+        el mismo nombre de pila y un --id-pattern demasiado corto) no se mezclan
+        sus archivos: ese ID se omite con estado 'conflict'.
+        """
+        by_student = {}
+        for candidate in candidates:
+            by_student.setdefault(candidate.student_id, []).append(candidate)
+        conflicts = {}
+        if not getattr(self.args, 'student', None):
+            for student_id, group in by_student.items():
+                folders = {top_folder(candidate.member) for candidate in group}
+                if len(folders) > 1:
+                    conflicts[student_id] = sorted(folders)
+        for student_id, folders in sorted(conflicts.items()):
+            print(f"❌ {student_id}: el ID sale de {len(folders)} carpetas ({', '.join(folders)}); "
+                  f"no se mezclan, ajusta --id-pattern")
+            del by_student[student_id]
+        self.count(conflicts=len(conflicts))
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as pool:
+            states = dict(pool.map(lambda item: (item[0], self.student(item[0], choose(item[1]), source)),
+                                   sorted(by_student.items())))
+        states.update({student_id: 'conflict' for student_id in conflicts})
+        return states
+
+    def add_archive(self, source, label):
+        """Ingiere un zip o tar (ruta o archivo abierto); regresa {id: estado}"""
+        if zipfile.is_zipfile(source):
+            return self.add_zip(source, label)
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        try:
+            return self.add_tar(source, label)
+        except tarfile.ReadError:
+            raise ValueError(f"{label}: no es un zip ni un tar")
+
+    def add_zip(self, source, label):
+        with zipfile.ZipFile(source) as archive:
+            return self.group(list(zip_candidates(archive, '', self.args)), label)
+
+    def add_tar(self, source, label):
+        """tar en flujo ('r|*'): cada miembro se lee una vez, al pasar, directo al almacén"""
+        by_student = {}
+        opened = tarfile.open(fileobj=source, mode='r|*') if hasattr(source, 'read') else tarfile.open(source, mode='r|*')
+        with opened as archive:
+            for member in archive:
+                name = os.path.basename(member.name)
+                student_id = student_of(member.name, self.args)
+                if not member.isfile() or not student_id or not canonical_name(name) or member.size > MAX_SOURCE_BYTES:
+                    continue
+                stored = store_blob(self.base_dir, archive.extractfile(member))
+                self.count(blobs_new=int(stored[2]), bytes_read=stored[1])
+                by_student.setdefault(student_id, []).append(
+                    Candidate(student_id, member.name, name, member.mtime, stored=stored))
+        return self.group([c for candidates in by_student.values() for c in candidates], label)
+
+    def scan(self):
+        """Registra los <id>/TAREA01/ existentes (desempacados a mano) y normaliza sus nombres ahí mismo"""
+        self.in_place = True
+        candidates = []
+        for entry in sorted(os.scandir(self.base_dir), key=lambda e: e.name):
+            student_dir = os.path.join(entry.path, 'TAREA01')
+            if entry.name.startswith('.') or not os.path.isdir(student_dir):
+                continue
+            for source in os.scandir(student_dir):
+                if source.is_file() and canonical_name(source.name):
+                    candidates.append(Candidate(entry.name, os.path.join(entry.name, 'TAREA01', source.name),
+                                                source.name, source.stat().st_mtime,
+                                                lambda path=source.path: open(path, 'rb')))
+        return self.group(candidates, 'scan')
+
+
+def garbage_collect(base_dir):
+    """Borra los blobs que ningún estudiante del índice usa; regresa (blobs, bytes) liberados"""
+    connection = connect(base_dir)
+    try:
+        used = {row[0] for row in connection.execute('SELECT DISTINCT sha256 FROM files')}
+    finally:
+        connection.close()
+    removed = freed = 0
+    blobs_dir = os.path.join(base_dir, STORE_DIR, 'blobs')
+    for shard in os.scandir(blobs_dir) if os.path.isdir(blobs_dir) else []:
+        for blob in os.scandir(shard.path):
+            if blob.name not in used:
+                freed += blob.stat().st_size
+                os.remove(blob.path)
+                removed += 1
+    return removed, freed
+
+
+def add_arguments(parser):
+    parser.add_argument('--id-pattern', type=re.compile, default=re.compile(r'^([^_/]+)'),
+                        help="Regex con un grupo para el ID en la ruta del miembro; los espacios pasan a '_' "
+                             "(por defecto: '^([^_/]+)')")
+    parser.add_argument('--student', help='Todo el archivo es la entrega de este estudiante')
+    parser.add_argument('--hardlink', action='store_true',
+                        help='Hard links a los blobs en lugar de copias (más rápido; TAREA01 no debe modificarse en su lugar)')
+    parser.add_argument('--max-nested', type=int, default=20_000_000,
+                        help='Tamaño máximo de un zip anidado en bytes (por defecto: 20000000)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    parser.add_argument('-b', '--base-dir', default='.', help='Directorio con los <id>/TAREA01 (por defecto: .)')
+
+
+def options(base_dir='.', student=None):
+    """Opciones por defecto para usar Ingest desde otro módulo"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_arguments(parser)
+    args = parser.parse_args([])
+    args.base_dir, args.student = base_dir, student
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingesta de entregas a un almacén direccionado por contenido')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub):
+        sub.add_argument('-b', '--base-dir', default='.', help='Directorio con los <id>/TAREA01 (por defecto: .)')
+
+    add = subparsers.add_parser('add', help='Ingerir exportaciones zip o tar')
+    add.add_argument('archives', nargs='+', help='Archivos .zip, .tar, .tar.gz')
+    add_arguments(add)
+
+    scan = subparsers.add_parser('scan', help='Registrar los <id>/TAREA01 que ya existen')
+    scan.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    add_common(scan)
+
+    listing = subparsers.add_parser('ls', help='Estudiantes o archivos de un estudiante en el índice')
+    listing.add_argument('student_id', nargs='?', help='ID del estudiante')
+    add_common(listing)
+
+    gc = subparsers.add_parser('gc', help='Borrar blobs sin referencias')
+    add_common(gc)
+
+    args = parser.parse_args()
+    if args.command == 'ls':
+        connection = connect(args.base_dir)
+        if args.student_id:
+            for name, sha, size, member in connection.execute(
+                    'SELECT name, sha256, size, member FROM files WHERE student_id = ? ORDER BY name', (args.student_id,)):
+                print(f"{name}\t{size}\t{sha[:12]}\t{member}")
+        else:
+            for student_id, files, source, ingested_at in connection.execute(
+                    'SELECT student_id, files, source, ingested_at FROM students ORDER BY student_id'):
+                print(f"{student_id}\t{files} archivos\t{source}\t{ingested_at}")
+        connection.close()
+        return
+    if args.command == 'gc':
+        removed, freed = garbage_collect(args.base_dir)
+        print(f"🧹 {removed} blobs borrados ({freed / 1024:.1f} KB)")
+        return
+
+    ingest = Ingest(args)
+    started = time.time()
+    if args.command == 'scan':
+        ingest.scan()
+    else:
+        for path in args.archives:
+            try:
+                states = ingest.add_archive(path, os.path.basename(path))
+            except ValueError as e:
+                print(f"❌ {e}")
+                continue
+            print(f"📦 {path}: {len(states)} estudiantes")
+    ingest.close()
+    seconds = time.time() - started
+    counts = ingest.counts
+    conflicts = f", {counts['conflicts']} con ID ambiguo" if counts['conflicts'] else ''
+    print(f"✅ {counts['new']} nuevos, {counts['changed']} con cambios, {counts['unchanged']} sin cambios{conflicts}; "
+          f"{counts['files']} archivos, {counts['blobs_new']} blobs nuevos, "
+          f"{counts['bytes_read'] / 1024:.1f} KB en {seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Cola de trabajo compartida para repartir la evaluación entre varios hosts
+
+Cada tarea es (estudiante, etapa) y vive en una base SQLite dentro del árbol
+compartido scores/ (por defecto scores/.queue.sqlite). Cualquier número de
+procesos `worker`, en la misma máquina o en otras que monten el mismo
+directorio, toman tareas con un lease:
+
+- reclamar una tarea la marca como `leased` hasta lease_expires e incrementa
+  su token; un hilo de heartbeat extiende el lease mientras la etapa corre
+- si el worker muere, el lease vence y otro worker la vuelve a tomar
+- una falla se reintenta con espera creciente hasta --max-attempts; después la
+  tarea y las que dependen de ella (report depende de score y test) quedan
+  `failed`
+- el cierre de una tarea solo cuenta si el token sigue siendo el del worker;
+  los artefactos se publican con rename atómico y el manifiesto se registra
+  con lock, así que una ejecución duplicada tras un lease vencido reemplaza
+  archivos completos por otros equivalentes
+
+enqueue: agrega (o reinicia) las tareas de los estudiantes
+worker:  toma y ejecuta tareas hasta que la cola se vacía
+status:  conteo por estado y tareas fallidas
+"""
+
+import os
+import sys
+import time
+import random
+import socket
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import grader
+
+STAGES = grader.STAGES
+DEPENDENCIES = {'report': ('score', 'test')}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    student_id    TEXT NOT NULL,
+    stage         TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    force         INTEGER NOT NULL DEFAULT 0,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    token         INTEGER NOT NULL DEFAULT 0,
+    worker        TEXT,
+    available_at  REAL NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    heartbeat_at  REAL,
+    finished_at   REAL,
+    seconds       REAL,
+    error         TEXT,
+    PRIMARY KEY (student_id, stage)
+)
+"""
+
+# Tareas listas: pendientes (o con lease vencido) cuyas dependencias ya terminaron
+CLAIMABLE = """
+SELECT student_id, stage, attempts, force, status FROM tasks t
+ WHERE ((status = 'pending' AND available_at <= :now) OR (status = 'leased' AND lease_expires < :now))
+   AND (stage != 'report' OR NOT EXISTS (
+        SELECT 1 FROM tasks d WHERE d.student_id = t.student_id
+           AND d.stage IN ('score', 'test') AND d.status != 'done'))
+ ORDER BY CASE stage WHEN 'report' THEN 0 WHEN 'score' THEN 1 ELSE 2 END, student_id
+ LIMIT 1
+"""
+
+
+def default_db(scores_dir):
+    return os.path.join(scores_dir, '.queue.sqlite')
+
+
+def connect(db_path):
+    """Conexión en modo autocommit; las transacciones se abren con BEGIN IMMEDIATE"""
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=60, isolation_level=None)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA busy_timeout = 60000')
+    connection.execute(SCHEMA)
+    return connection
+
+
+def enqueue(connection, students, force=()):
+    """Deja pendientes las etapas de cada estudiante; las que están en curso no se tocan"""
+    connection.execute('BEGIN IMMEDIATE')
+    for student_id in students:
+        for stage in STAGES:
+            forced = int(stage in force or 'all' in force)
+            connection.execute(
+                """INSERT INTO tasks (student_id, stage, force) VALUES (?, ?, ?)
+                   ON CONFLICT (student_id, stage) DO UPDATE
+                   SET status = 'pending', force = excluded.force, attempts = 0, available_at = 0, error = NULL
+                   WHERE status != 'leased'""",
+                (student_id, stage, forced))
+    connection.execute('COMMIT')
+
+
+def claim(connection, worker_id, lease, max_attempts):
+    """Toma la siguiente tarea lista; regresa (student_id, stage, token, force) o None"""
+    while True:
+        now = time.time()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(CLAIMABLE, {'now': now}).fetchone()
+            if row is None:
+                connection.execute('COMMIT')
+                return None
+            if row['status'] == 'leased' and row['attempts'] >= max_attempts:
+                _fail(connection, row['student_id'], row['stage'], 'lease vencido en el último intento', now)
+                connection.execute('COMMIT')
+                continue
+            connection.execute(
+                """UPDATE tasks SET status = 'leased', worker = ?, token = token + 1, attempts = attempts + 1,
+                   lease_expires = ?, heartbeat_at = ? WHERE student_id = ? AND stage = ?""",
+                (worker_id, now + lease, now, row['student_id'], row['stage']))
+            token = connection.execute('SELECT token FROM tasks WHERE student_id = ? AND stage = ?',
+                                       (row['student_id'], row['stage'])).fetchone()['token']
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return row['student_id'], row['stage'], token, bool(row['force'])
+
+
+def _fail(connection, student_id, stage, error, now):
+    """Marca la tarea como fallida, junto con las etapas que dependen de ella"""
+    connection.execute("UPDATE tasks SET status = 'failed', worker = NULL, error = ?, finished_at = ? "
+                       "WHERE student_id = ? AND stage = ?", (error, now, student_id, stage))
+    for dependent, requires in DEPENDENCIES.items():
+        if stage in requires:
+            connection.execute("UPDATE tasks SET status = 'failed', error = ?, finished_at = ? "
+                               "WHERE student_id = ? AND stage = ? AND status = 'pending'",
+                               (f"depende de {stage}", now, student_id, dependent))
+
+
+def complete(connection, student_id, stage, token, status, seconds, max_attempts, retry_delay):
+    """Cierra la tarea si el lease sigue siendo nuestro; False si otro worker la tomó"""
+    now = time.time()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        row = connection.execute('SELECT token, attempts FROM tasks WHERE student_id = ? AND stage = ?',
+                                 (student_id, stage)).fetchone()
+        if row is None or row['token'] != token:
+            connection.execute('COMMIT')
+            return False
+        if status == 0:
+            connection.execute("UPDATE tasks SET status = 'done', worker = NULL, error = NULL, force = 0, "
+                               "finished_at = ?, seconds = ? WHERE student_id = ? AND stage = ?",
+                               (now, seconds, student_id, stage))
+        elif row['attempts'] >= max_attempts:
+            _fail(connection, student_id, stage, f"código de salida {status}", now)
+        else:
+            delay = retry_delay * 2 ** (row['attempts'] - 1) * random.uniform(0.8, 1.2)
+            connection.execute("UPDATE tasks SET status = 'pending', worker = NULL, available_at = ?, error = ? "
+                               "WHERE student_id = ? AND stage = ?",
+                               (now + delay, f"código de salida {status}", student_id, stage))
+        connection.execute('COMMIT')
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    return True
+
+
+def remaining(connection):
+    """Tareas que todavía pueden ejecutarse (pendientes o en curso)"""
+    return connection.execute("SELECT COUNT(*) FROM tasks WHERE status IN ('pending', 'leased')").fetchone()[0]
+
+
+class Heartbeat(threading.Thread):
+    """Extiende cada lease/3 segundos el lease de las tareas que este proceso tiene en curso"""
+
+    def __init__(self, db_path, lease):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.lease = lease
+        self.held = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def hold(self, student_id, stage, token):
+        with self.lock:
+            self.held[(student_id, stage)] = token
+
+    def release(self, student_id, stage):
+        with self.lock:
+            self.held.pop((student_id, stage), None)
+
+    def run(self):
+        connection = connect(self.db_path)
+        while not self.stopped.wait(self.lease / 3):
+            with self.lock:
+                held = list(self.held.items())
+            now = time.time()
+            for (student_id, stage), token in held:
+                connection.execute("UPDATE tasks SET lease_expires = ?, heartbeat_at = ? "
+                                   "WHERE student_id = ? AND stage = ? AND token = ? AND status = 'leased'",
+                                   (now + self.lease, now, student_id, stage, token))
+        connection.close()
+
+
+def work(worker_id, args, heartbeat, logger):
+    """Un hilo del worker: toma, ejecuta y cierra tareas hasta que no quede nada"""
+    connection = connect(args.db)
+    tracing = grader._module('tracing')
+    done = 0
+    try:
+        while True:
+            task = claim(connection, worker_id, args.lease, args.max_attempts)
+            if task is None:
+                if remaining(connection) == 0 and not args.forever:
+                    return done
+                time.sleep(args.idle)
+                continue
+            student_id, stage, token, forced = task
+            heartbeat.hold(student_id, stage, token)
+            tracing.set_student(student_id)
+            started = time.time()
+            status = 1
+            with open(os.path.join(args.logs_dir, f"{student_id}.{stage}.log"), 'a', encoding='utf-8') as log_file:
+                logger.attach(log_file)
+                try:
+                    status = grader.run_stage(stage, student_id, args.scores_dir, log_file,
+                                              [stage] if forced else [], args.partials)
+                except Exception as e:
+                    print(f"❌ Error: {e}")
+                finally:
+                    logger.detach()
+            heartbeat.release(student_id, stage)
+            seconds = time.time() - started
+            if not complete(connection, student_id, stage, token, status, seconds,
+                            args.max_attempts, args.retry_delay):
+                print(f"⚠️  {worker_id}: {student_id}/{stage} ya la cerró otro worker (lease vencido)")
+                continue
+            done += 1
+            mark = '✅' if status == 0 else '❌'
+            print(f"{mark} {worker_id}: {student_id}/{stage} ({seconds:.1f} s)")
+    finally:
+        connection.close()
+
+
+def command_enqueue(args):
+    students = args.students or grader.discover_students()
+    if not students:
+        print("❌ Error: no se encontraron directorios <id>/TAREA01")
+        return 1
+    connection = connect(args.db)
+    enqueue(connection, students, args.force)
+    print(f"📥 {len(students) * len(STAGES)} tareas de {len(students)} estudiantes en {args.db}")
+    return 0
+
+
+def command_worker(args):
+    os.makedirs(args.logs_dir, exist_ok=True)
+    os.makedirs(args.scores_dir, exist_ok=True)
+    if args.partials:
+        os.environ['REPORT_PARTIALS'] = '1'
+    worker_id = args.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    heartbeat = Heartbeat(args.db, args.lease)
+    heartbeat.start()
+    logger = grader.ThreadLog(sys.stdout)
+    sys.stdout = logger
+    started = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            futures = [pool.submit(work, f"{worker_id}/{n}", args, heartbeat, logger) for n in range(args.jobs)]
+            done = sum(future.result() for future in futures)
+    finally:
+        sys.stdout = logger.stream
+        heartbeat.stopped.set()
+    print(f"🏁 {worker_id}: {done} tareas en {time.time() - started:.1f} s")
+    if args.aggregate:
+        grader.command_aggregate(args)
+    return 0
+
+
+def command_status(args):
+    connection = connect(args.db)
+    counts = {row['status']: row['n'] for row in
+              connection.execute('SELECT status, COUNT(*) AS n FROM tasks GROUP BY status')}
+    print(' · '.join(f"{status}: {counts.get(status, 0)}" for status in ('pending', 'leased', 'done', 'failed')))
+    now = time.time()
+    for row in connection.execute("SELECT * FROM tasks WHERE status = 'leased' ORDER BY student_id, stage"):
+        print(f"🔒 {row['student_id']}/{row['stage']}: {row['worker']}, intento {row['attempts']}, "
+              f"heartbeat hace {now - row['heartbeat_at']:.0f} s")
+    failed = connection.execute("SELECT * FROM tasks WHERE status = 'failed' ORDER BY student_id, stage").fetchall()
+    for row in failed:
+        print(f"❌ {row['student_id']}/{row['stage']}: {row['error']} ({row['attempts']} intentos)")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cola de trabajo compartida (SQLite) para evaluar con varios workers y hosts')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_common(sub):
+        sub.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+        sub.add_argument('--db', help='Base de la cola (por defecto: <scores-dir>/.queue.sqlite)')
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Agregar o reiniciar las tareas de los estudiantes')
+    enqueue_parser.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los <id>/TAREA01)')
+    add_common(enqueue_parser)
+    enqueue_parser.add_argument('--force', action='append', default=[], choices=STAGES + ['all'],
+                                help='Ejecutar la etapa aunque el manifiesto diga que está al día (repetible)')
+
+    worker = subparsers.add_parser('worker', help='Tomar y ejecutar tareas hasta vaciar la cola')
+    add_common(worker)
+    worker.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Tareas en paralelo en este proceso')
+    worker.add_argument('--worker-id', help='Identificador del worker (por defecto: host:pid)')
+    worker.add_argument('--lease', type=float, default=120.0, help='Duración del lease en segundos (por defecto: 120)')
+    worker.add_argument('--max-attempts', type=int, default=3, help='Intentos por tarea (por defecto: 3)')
+    worker.add_argument('--retry-delay', type=float, default=10.0, help='Espera base entre reintentos en segundos (por defecto: 10)')
+    worker.add_argument('--idle', type=float, default=2.0, help='Espera cuando no hay tareas listas (por defecto: 2)')
+    worker.add_argument('--forever', action='store_true', help='Seguir esperando tareas aunque la cola se vacíe')
+    worker.add_argument('--aggregate', action='store_true', help='Consolidar CSVs y estadísticas al terminar')
+    worker.add_argument('--partials', action='store_true', help='Generar también los PDFs parciales')
+    worker.add_argument('--logs-dir', default='_logs', help='Logs por estudiante y etapa (por defecto: _logs)')
+
+    status = subparsers.add_parser('status', help='Tareas por estado')
+    add_common(status)
+
+    args = parser.parse_args()
+    args.db = args.db or default_db(args.scores_dir)
+    commands = {
+        'enqueue': command_enqueue,
+        'worker': command_worker,
+        'status': command_status,
+    }
+    sys.exit(commands[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
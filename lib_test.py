@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Pruebas a nivel de función: el código del estudiante como biblioteca compartida
+
+prompt.txt pide que operaciones.c defina una función por operación con
+prototipo tipo_de_retorno operacion(int valor1, int valor2). Este modo compila
+cada archivo con gcc -shared -fPIC -Dmain=student_main (main queda fuera del
+camino), encuentra las funciones suma/resta/multiplicacion/division/residuo
+por nombre y las llama con ctypes sobre millones de entradas, sin lanzar un
+proceso por caso ni depender del texto que imprima el programa.
+
+Cada función se ejecuta en un proceso trabajador aislado (fork) con límites de
+CPU y memoria, stdin cerrado y stdout redirigido a /dev/null: si el código del
+estudiante se cae (SIGFPE, SIGSEGV) o se cicla, solo se pierde ese trabajador.
+Los tipos de retorno y parámetros se leen de la definición en el código fuente
+(int por defecto).
+
+Salida: scores/libtest_<id>.json
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import ctypes
+import signal
+import argparse
+import resource
+import subprocess
+import multiprocessing
+from pathlib import Path
+from datetime import datetime
+
+import numpy as np
+
+import tracing
+import workspace
+import artifacts
+from fuzz_test import c_divmod, OPERAND_LIMIT
+
+PROGRAMS = ['operaciones.c', 'conversionCmsMts.c', 'conversionSegsHMS.c', 'resistencia.c']
+
+# Nombres aceptados por operación, en orden de preferencia (minúsculas, sin acentos)
+FUNCTION_NAMES = {
+    'suma': ['suma', 'sumar', 'add'],
+    'resta': ['resta', 'restar', 'diferencia', 'sub'],
+    'multiplicacion': ['multiplicacion', 'multiplicar', 'producto', 'mult', 'multi'],
+    'division': ['division', 'dividir', 'cociente', 'div'],
+    'residuo': ['residuo', 'modulo', 'resto', 'mod'],
+}
+
+C_TYPES = {
+    'int': ctypes.c_int, 'long': ctypes.c_long, 'short': ctypes.c_short, 'unsigned': ctypes.c_uint,
+    'float': ctypes.c_float, 'double': ctypes.c_double,
+}
+FLOAT_TYPES = {'float', 'double'}
+FLOAT_RTOL = 1e-6
+
+WORKER_TIMEOUT = float(os.environ.get('LIBTEST_TIMEOUT', '120'))
+WORKER_CPU_SECONDS = int(WORKER_TIMEOUT) + 5
+WORKER_MEMORY = 1 << 30
+MAX_MISMATCHES = 5
+
+DEFINITION_PATTERN = re.compile(
+    r'^[ \t]*(?:static\s+|inline\s+)*(?P<type>(?:unsigned\s+|signed\s+|long\s+|short\s+)*\w+)\s*\**\s*'
+    r'(?P<name>[A-Za-z_]\w*)\s*\((?P<params>[^()]*)\)\s*\{', re.MULTILINE)
+
+
+def normalize_name(name):
+    table = str.maketrans('áéíóú', 'aeiou')
+    return name.lower().translate(table).replace('_', '')
+
+
+def base_type(declaration):
+    """Tipo de C de una declaración ("unsigned long x" → "long", "double" → "double")"""
+    words = [w for w in re.findall(r'[A-Za-z_]\w*', declaration) if w not in ('const', 'signed', 'register')]
+    for word in words:
+        if word in ('float', 'double'):
+            return word
+    for word in ('long', 'short', 'int', 'unsigned'):
+        if word in words:
+            return word
+    return None
+
+
+def find_functions(source):
+    """{operación: {'symbol', 'restype', 'argtypes'}} de las funciones definidas en el código"""
+    definitions = {}
+    for match in DEFINITION_PATTERN.finditer(source):
+        name = match.group('name')
+        if name in ('if', 'for', 'while', 'switch', 'main', 'return', 'sizeof'):
+            continue
+        params = [p for p in match.group('params').split(',') if p.strip() and p.strip() != 'void']
+        definitions[name] = {
+            'symbol': name,
+            'restype': base_type(match.group('type')),
+            'argtypes': [base_type(p) for p in params],
+        }
+
+    functions = {}
+    for operation, names in FUNCTION_NAMES.items():
+        by_normalized = {normalize_name(name): definition for name, definition in definitions.items()}
+        for candidate in names:
+            definition = by_normalized.get(candidate)
+            if definition and len(definition['argtypes']) == 2 and definition['restype'] in C_TYPES \
+                    and all(t in C_TYPES for t in definition['argtypes']):
+                functions[operation] = definition
+                break
+    return functions
+
+
+def generate_operands(cases, seed):
+    """Operandos de frontera seguidos de aleatorios; b nunca es 0 (división y residuo)"""
+    edges = np.array([0, 1, -1, 2, -2, 7, -7, 10, -10, 100, OPERAND_LIMIT, -OPERAND_LIMIT], dtype=np.int64)
+    a_edge, b_edge = np.meshgrid(edges, edges[edges != 0])
+    rng = np.random.default_rng(seed)
+    a = np.concatenate([a_edge.ravel(), rng.integers(-OPERAND_LIMIT, OPERAND_LIMIT + 1, size=cases)])[:cases]
+    b = np.concatenate([b_edge.ravel(), rng.integers(-OPERAND_LIMIT, OPERAND_LIMIT + 1, size=cases)])[:cases]
+    b[b == 0] = 1
+    return a, b
+
+
+def oracle(operation, a, b, float_result):
+    """Resultado esperado con la semántica de C; con retorno flotante la división es real"""
+    if operation == 'suma':
+        return a + b
+    if operation == 'resta':
+        return a - b
+    if operation == 'multiplicacion':
+        return a * b
+    quotient, remainder = c_divmod(a, b)
+    if operation == 'division':
+        return a / b if float_result else quotient
+    return remainder
+
+
+def _sandbox():
+    """Límites del trabajador; el código del estudiante no puede escribir en nuestro stdout"""
+    resource.setrlimit(resource.RLIMIT_CPU, (WORKER_CPU_SECONDS, WORKER_CPU_SECONDS))
+    resource.setrlimit(resource.RLIMIT_AS, (WORKER_MEMORY, WORKER_MEMORY))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+
+def _worker(connection, library, operation, definition, cases, seed):
+    """Proceso trabajador: llama la función sobre todas las entradas y compara con el oráculo"""
+    _sandbox()
+    function = getattr(ctypes.CDLL(library), definition['symbol'])
+    function.restype = C_TYPES[definition['restype']]
+    function.argtypes = [C_TYPES[t] for t in definition['argtypes']]
+    float_args = any(t in FLOAT_TYPES for t in definition['argtypes'])
+    float_result = definition['restype'] in FLOAT_TYPES
+
+    a, b = generate_operands(cases, seed)
+    expected = oracle(operation, a, b, float_result and (float_args or operation == 'division'))
+    a_values = a.astype(float).tolist() if float_args else a.tolist()
+    b_values = b.astype(float).tolist() if float_args else b.tolist()
+
+    started = time.perf_counter()
+    got = np.fromiter(map(function, a_values, b_values), dtype=np.float64 if float_result else np.int64, count=cases)
+    seconds = time.perf_counter() - started
+
+    if float_result:
+        wrong = ~np.isclose(got, expected, rtol=FLOAT_RTOL, atol=1e-9)
+    else:
+        wrong = got != expected
+    mismatches = np.flatnonzero(wrong)
+    connection.send({
+        'cases': cases,
+        'mismatches': int(len(mismatches)),
+        'calls_per_second': round(cases / seconds) if seconds > 0 else None,
+        'examples': [{'a': int(a[i]), 'b': int(b[i]), 'expected': expected[i].item(), 'got': got[i].item()}
+                     for i in mismatches[:MAX_MISMATCHES]],
+    })
+    connection.close()
+
+
+def run_in_worker(library, operation, definition, cases, seed):
+    """Resultado del trabajador, o el motivo por el que murió"""
+    context = multiprocessing.get_context('fork')
+    receiver, sender = context.Pipe(duplex=False)
+    worker = context.Process(target=_worker, args=(sender, library, operation, definition, cases, seed))
+    worker.start()
+    sender.close()
+    result = None
+    if receiver.poll(WORKER_TIMEOUT):
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = None
+    worker.join(1)
+    if worker.is_alive():
+        worker.kill()
+        worker.join()
+        return {'status': 'TIMEOUT'}
+    if result is None:
+        code = worker.exitcode
+        reason = signal.Signals(-code).name if code is not None and code < 0 else f'exit {code}'
+        return {'status': 'CRASH', 'reason': reason}
+    result['status'] = 'PASS' if result['mismatches'] == 0 else 'FAIL'
+    return result
+
+
+def build_library(source, work_dir):
+    """Compila source como .so con main renombrado; regresa (ruta, errores)"""
+    library = os.path.join(work_dir, f"lib{Path(source).stem}.so")
+    with tracing.span('gcc', bytes_in=tracing.file_size(source)) as sp:
+        result = subprocess.run(['gcc', '-shared', '-fPIC', '-O1', '-Dmain=student_main', '-o', library, source, '-lm'],
+                                capture_output=True, text=True, errors='replace')
+        sp.status = result.returncode
+    if result.returncode != 0:
+        return None, result.stderr[-1000:]
+    return library, None
+
+
+def run_library_tests(student_dir, student_id, scores_dir='scores', cases=1_000_000, seed=0):
+    """Prueba las funciones de operación de cada archivo y escribe scores/libtest_<id>.json"""
+    report = {
+        'student_id': student_id,
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'cases_per_function': cases,
+        'seed': seed,
+        'programs': {},
+    }
+    with workspace.scratch_dir('libtest') as work_dir:
+        for program in PROGRAMS:
+            source = os.path.join(student_dir, program)
+            if not os.path.exists(source):
+                continue
+            with open(source, 'r', encoding='utf-8', errors='replace') as f:
+                functions = find_functions(f.read())
+            if not functions:
+                continue
+
+            library, errors = build_library(source, work_dir)
+            if library is None:
+                report['programs'][program] = {'status': 'COMPILE_ERROR', 'errors': errors}
+                print(f"❌ {program}: error de compilación")
+                continue
+
+            results = {}
+            for operation, definition in functions.items():
+                with tracing.span('libtest', student=student_id) as sp:
+                    result = run_in_worker(library, operation, definition, cases, seed)
+                    sp.status = 0 if result['status'] == 'PASS' else 1
+                signature = f"{definition['restype']} {definition['symbol']}({', '.join(definition['argtypes'])})"
+                results[operation] = dict(result, signature=signature)
+                speed = f", {result['calls_per_second']:,} llamadas/s" if result.get('calls_per_second') else ''
+                if result['status'] == 'PASS':
+                    print(f"✅ {program} {signature}: {result['cases']:,} casos correctos{speed}")
+                elif result['status'] == 'FAIL':
+                    example = result['examples'][0]
+                    print(f"❌ {program} {signature}: {result['mismatches']:,}/{result['cases']:,} incorrectos; "
+                          f"({example['a']}, {example['b']}) → {example['got']}, esperado {example['expected']}")
+                else:
+                    print(f"💥 {program} {signature}: {result['status']} {result.get('reason', '')}")
+            missing = [op for op in FUNCTION_NAMES if op not in functions]
+            report['programs'][program] = {'functions': results, 'missing': missing}
+
+    output_file = artifacts.artifact_path(scores_dir, student_id, 'libtest')
+    workspace.write_text(output_file, json.dumps(report, indent=2, ensure_ascii=False))
+    artifacts.index_student(scores_dir, student_id)
+    print(f"📄 Resultados por función: {output_file}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba las funciones del estudiante cargando su código como biblioteca compartida')
+    parser.add_argument('student_dir', help='Directorio del estudiante (ej: msc25ahl/TAREA01)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-n', '--cases', type=int, default=1_000_000, help='Entradas por función (por defecto: 1000000)')
+    parser.add_argument('-s', '--seed', type=int, default=0, help='Semilla del generador (por defecto: 0)')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.student_dir):
+        print(f"❌ Error: no existe el directorio {args.student_dir}")
+        sys.exit(1)
+
+    student_id = os.path.basename(os.path.dirname(os.path.abspath(args.student_dir)))
+    os.environ.setdefault('TRACE_STUDENT', student_id)
+    report = run_library_tests(args.student_dir, student_id, args.scores_dir, args.cases, args.seed)
+    failed = any(program.get('status') == 'COMPILE_ERROR'
+                 or any(r['status'] != 'PASS' for r in program.get('functions', {}).values())
+                 for program in report['programs'].values())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
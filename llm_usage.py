@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Contabilidad de tokens y costo de las llamadas al LLM
+
+record:  guarda el uso de una solicitud (tokens de todos sus intentos, modelo,
+         latencia, reintentos, cache) en scores/llm_usage_<id>.json, con
+         desglose estimado por ejercicio.
+summary: resumen del grupo: costo total, tokens por ejercicio y las entregas
+         más caras.
+"""
+
+import os
+import re
+import json
+import argparse
+from datetime import datetime
+
+import artifacts
+
+# Precios en USD por millón de tokens: (entrada, entrada en cache, salida)
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.075, 0.60),
+    'gpt-4o': (2.50, 1.25, 10.00),
+    'gpt-4.1': (2.00, 0.50, 8.00),
+    'gpt-4.1-mini': (0.40, 0.10, 1.60),
+    'gpt-4.1-nano': (0.10, 0.025, 0.40),
+}
+
+EXERCISES = ['operaciones', 'resistencia', 'conversionCmsMts', 'conversionSegHMS']
+
+# Archivo fuente de cada ejercicio (con variantes de nombre)
+EXERCISE_FILES = {
+    'operaciones': ['operaciones.c'],
+    'resistencia': ['resistencia.c'],
+    'conversionCmsMts': ['conversionCmsMts.c'],
+    'conversionSegHMS': ['conversionSegsHMS.c', 'conversionSegHMS.c'],
+}
+
+USAGE_PATTERN = re.compile(r'Token usage:\s*([\d,]+)\s+input,\s*([\d,]+)\s+output(?:,\s*(\{.*\}))?')
+
+
+def parse_usage_output(text):
+    """Suma los tokens de las líneas 'Token usage: ...' que imprime `llm -u` (una por intento)"""
+    matches = list(USAGE_PATTERN.finditer(text or ''))
+    if not matches:
+        return None
+    usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    for match in matches:
+        usage['prompt_tokens'] += int(match.group(1).replace(',', ''))
+        usage['completion_tokens'] += int(match.group(2).replace(',', ''))
+        if match.group(3):
+            try:
+                details = json.loads(match.group(3))
+            except json.JSONDecodeError:
+                details = {}
+            cached = (details.get('prompt_tokens_details') or {}).get('cached_tokens')
+            if cached is None:
+                cached = details.get('cache_read_input_tokens', 0)
+            usage['cached_tokens'] += int(cached or 0)
+    return usage
+
+
+def error_lines(text):
+    """stderr de `llm` sin las líneas de uso de tokens (los errores reales, para mostrarlos)"""
+    return ''.join(line for line in (text or '').splitlines(keepends=True) if not USAGE_PATTERN.search(line))
+
+
+def request_cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    """Costo en USD de una solicitud, o None si el modelo no tiene precio"""
+    prices = MODEL_PRICES.get(model)
+    if not prices:
+        return None
+    input_price, cached_price, output_price = prices
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return round((uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1e6, 8)
+
+
+def source_sizes(student_dir):
+    """Tamaño en bytes del código de cada ejercicio (0 si falta)"""
+    sizes = {}
+    for exercise, names in EXERCISE_FILES.items():
+        sizes[exercise] = 0
+        for name in names:
+            path = os.path.join(student_dir, name)
+            if os.path.exists(path):
+                sizes[exercise] = os.path.getsize(path)
+                break
+    return sizes
+
+
+def split_by_exercise(usage, prompt_bytes, code_sizes, response):
+    """Reparte los tokens de una solicitud entre los ejercicios (estimación)
+
+    La parte fija del prompt (rúbrica) se reparte por igual; la parte variable
+    según el tamaño del código de cada ejercicio (los tokens en cache, en la
+    misma proporción que los de entrada). Los tokens de salida se
+    reparten según la longitud de los comentarios de cada ejercicio.
+    """
+    code_total = sum(code_sizes.values())
+    static_share = max(0, prompt_bytes - code_total) / prompt_bytes if prompt_bytes else 1.0
+    comment_lengths = {exercise: len(str((response.get(exercise) or {}).get('comentarios', '')))
+                       for exercise in EXERCISES} if isinstance(response, dict) else {}
+    comment_total = sum(comment_lengths.values())
+
+    split = {}
+    for exercise in EXERCISES:
+        code_fraction = code_sizes.get(exercise, 0) / code_total if code_total else 0
+        prompt_fraction = static_share / len(EXERCISES) + (1 - static_share) * code_fraction
+        completion_fraction = (comment_lengths.get(exercise, 0) / comment_total) if comment_total else 1 / len(EXERCISES)
+        split[exercise] = {
+            'prompt_tokens': round(usage['prompt_tokens'] * prompt_fraction),
+            'cached_tokens': round(usage.get('cached_tokens', 0) * prompt_fraction),
+            'completion_tokens': round(usage['completion_tokens'] * completion_fraction),
+        }
+    return split
+
+
+def usage_path(output_dir, student_id):
+    return os.path.join(output_dir, f"llm_usage_{student_id}.json")
+
+
+def load_usage(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def record_request(student_id, model, usage, latency_ms, retries, output_dir='scores',
+                   prompt_bytes=0, code_sizes=None, response=None, pack_size=1):
+    """Agrega una solicitud al archivo de uso del estudiante y recalcula totales
+
+    Con pack_size > 1 la solicitud calificó a varios estudiantes y usage es la
+    parte que le corresponde a este.
+    """
+    path = usage_path(output_dir, student_id)
+    data = load_usage(path) or {'student_id': student_id, 'requests': []}
+
+    usage = usage or {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0}
+    cost = request_cost(model, usage['prompt_tokens'], usage['completion_tokens'], usage['cached_tokens'])
+    request = {
+        'timestamp': datetime.now().isoformat(),
+        'model': model,
+        'prompt_tokens': usage['prompt_tokens'],
+        'completion_tokens': usage['completion_tokens'],
+        'cached_tokens': usage['cached_tokens'],
+        'cache': 'hit' if usage['cached_tokens'] > 0 else 'miss',
+        'latency_ms': round(latency_ms, 1),
+        'retries': retries,
+        'cost_usd': cost,
+        'usage_reported': usage.get('reported', True),
+        'pack_size': pack_size,
+        'exercises': split_by_exercise(usage, prompt_bytes, code_sizes or {}, response or {}),
+    }
+    data['requests'].append(request)
+
+    # Totales del estudiante y por ejercicio sobre todas las solicitudes
+    totals = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0,
+              'retries': 0, 'latency_ms': 0.0, 'cost_usd': 0.0}
+    exercises = {exercise: {'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0} for exercise in EXERCISES}
+    for entry in data['requests']:
+        totals['requests'] += 1
+        for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens', 'retries'):
+            totals[key] += entry.get(key, 0)
+        totals['latency_ms'] += entry.get('latency_ms', 0)
+        totals['cost_usd'] += entry.get('cost_usd') or 0
+        for exercise, split in entry.get('exercises', {}).items():
+            if exercise not in exercises:
+                continue
+            exercises[exercise]['prompt_tokens'] += split['prompt_tokens']
+            exercises[exercise]['completion_tokens'] += split['completion_tokens']
+            exercises[exercise]['cost_usd'] += request_cost(entry['model'], split['prompt_tokens'], split['completion_tokens'],
+                                                            split.get('cached_tokens', 0)) or 0
+    totals['latency_ms'] = round(totals['latency_ms'], 1)
+    totals['cost_usd'] = round(totals['cost_usd'], 8)
+    for values in exercises.values():
+        values['cost_usd'] = round(values['cost_usd'], 8)
+    data['totals'] = totals
+    data['exercises'] = exercises
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return path, request
+
+
+def cohort_summary(scores_dir, top=10):
+    """Costo total, tokens por ejercicio y entregas más caras del grupo"""
+    students = []
+    totals = {'requests': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0,
+              'retries': 0, 'cost_usd': 0.0}
+    exercises = {exercise: {'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0} for exercise in EXERCISES}
+    models = {}
+    cache_hits = 0
+    for _, path in artifacts.list_artifacts(scores_dir, 'llm_usage'):
+        data = load_usage(path)
+        if not data or 'totals' not in data:
+            continue
+        student_totals = data['totals']
+        students.append({'student_id': data['student_id'], **student_totals})
+        for key in totals:
+            totals[key] += student_totals.get(key, 0)
+        for exercise, values in data.get('exercises', {}).items():
+            if exercise in exercises:
+                for key in exercises[exercise]:
+                    exercises[exercise][key] += values.get(key, 0)
+        for request in data['requests']:
+            models[request['model']] = models.get(request['model'], 0) + 1
+            cache_hits += request.get('cache') == 'hit'
+
+    totals['cost_usd'] = round(totals['cost_usd'], 6)
+    for values in exercises.values():
+        values['cost_usd'] = round(values['cost_usd'], 6)
+    count = len(students)
+    return {
+        'generated_at': datetime.now().isoformat(),
+        'students': count,
+        'totals': totals,
+        'per_student_average': {key: round(value / count, 6) for key, value in totals.items()} if count else {},
+        'cache_hit_rate': round(cache_hits / totals['requests'], 4) if totals['requests'] else None,
+        'models': models,
+        'exercises': exercises,
+        'most_expensive': sorted(students, key=lambda s: -s['cost_usd'])[:top],
+    }
+
+
+def write_summary(scores_dir='scores', top=10):
+    """Escribe scores/llm_usage_summary.json e imprime el resumen del grupo"""
+    result = cohort_summary(scores_dir, top)
+    summary_path = os.path.join(scores_dir, 'llm_usage_summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    totals = result['totals']
+    print(f"🧾 {result['students']} estudiantes, {totals['requests']} solicitudes")
+    print(f"   Tokens: {totals['prompt_tokens']} entrada ({totals['cached_tokens']} en cache), {totals['completion_tokens']} salida")
+    print(f"   Costo total: ${totals['cost_usd']:.4f}")
+    for exercise, values in result['exercises'].items():
+        print(f"   • {exercise}: {values['prompt_tokens']} entrada, {values['completion_tokens']} salida, ${values['cost_usd']:.4f}")
+    if result['most_expensive']:
+        print("   Entregas más caras:")
+        for student in result['most_expensive']:
+            print(f"   • {student['student_id']}: ${student['cost_usd']:.5f} ({student['prompt_tokens'] + student['completion_tokens']} tokens)")
+    print(f"📄 Resumen: {summary_path}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Contabilidad de tokens y costo del LLM')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help='Registrar una solicitud al LLM')
+    record.add_argument('student_id', help='ID del estudiante')
+    record.add_argument('--model', required=True, help='Modelo usado')
+    record.add_argument('--usage-file', help='Archivo con la salida stderr de `llm -u` (de todos los intentos)')
+    record.add_argument('--latency-ms', type=float, default=0.0, help='Latencia total de la solicitud')
+    record.add_argument('--retries', type=int, default=0, help='Reintentos realizados')
+    record.add_argument('--prompt', help='Archivo del prompt enviado (para el desglose por ejercicio)')
+    record.add_argument('--system-prompt', help='Archivo del prompt de sistema (rúbrica), si se envió aparte')
+    record.add_argument('--student-dir', help='Directorio TAREA01 del estudiante (para el desglose por ejercicio)')
+    record.add_argument('--response', help='JSON devuelto por el LLM (para el desglose por ejercicio)')
+    record.add_argument('-o', '--output-dir', default='scores', help='Directorio de salida (por defecto: scores)')
+
+    summary = subparsers.add_parser('summary', help='Resumen de uso y costo del grupo')
+    summary.add_argument('-d', '--scores-dir', default='scores', help='Directorio con llm_usage_<id>.json')
+    summary.add_argument('--top', type=int, default=10, help='Número de entregas más caras a mostrar')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        usage_text = ''
+        if args.usage_file and os.path.exists(args.usage_file):
+            with open(args.usage_file, 'r', encoding='utf-8', errors='replace') as f:
+                usage_text = f.read()
+        usage = parse_usage_output(usage_text)
+        if usage is None:
+            usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'reported': False}
+            print("⚠️  llm no reportó uso de tokens (¿versión sin -u?)")
+        response = None
+        if args.response:
+            response = load_usage(args.response)
+        prompt_bytes = sum(os.path.getsize(path) for path in (args.prompt, args.system_prompt)
+                           if path and os.path.exists(path))
+        code_sizes = source_sizes(args.student_dir) if args.student_dir else {}
+        path, request = record_request(args.student_id, args.model, usage, args.latency_ms, args.retries,
+                                       args.output_dir, prompt_bytes, code_sizes, response)
+        cost = f"${request['cost_usd']:.5f}" if request['cost_usd'] is not None else "costo desconocido"
+        print(f"🧾 Uso LLM: {request['prompt_tokens']} entrada ({request['cached_tokens']} en cache), "
+              f"{request['completion_tokens']} salida, {cost}, {request['latency_ms']:.0f} ms -> {path}")
+    else:
+        write_summary(args.scores_dir, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Manifiesto incremental por estudiante
+
+Cada etapa de general.sh registra en scores/.manifest/<id>.json (dentro del
+directorio de artefactos del estudiante, ver artifacts.py) el hash de sus
+entradas, la versión de las herramientas y los parámetros con que se ejecutó.
+Al volver a correr (por ejemplo, después de que all.sh se interrumpa), una
+etapa cuyas entradas no cambiaron y cuyas salidas siguen presentes se omite.
+
+check:  código de salida 0 si la etapa está al día (se puede omitir), 1 si no.
+record: guarda el estado actual de la etapa después de ejecutarla con éxito.
+clear:  borra la entrada de una etapa (o el manifiesto completo).
+"""
+
+import os
+import sys
+import glob
+import json
+import fcntl
+import shutil
+import socket
+import hashlib
+import argparse
+from datetime import datetime
+from contextlib import contextmanager
+
+import artifacts
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MANIFEST_VERSION = 1
+
+# Etapas de general.sh, en orden
+STAGES = ['score', 'test', 'report']
+
+# Programas que prueba test.sh, en su orden
+TEST_PROGRAMS = ['operaciones.c', 'conversionCmsMts.c', 'conversionSegsHMS.c', 'resistencia.c']
+
+
+def _repo_file(name):
+    return os.path.join(REPO_DIR, name)
+
+
+def student_sources(student_dir):
+    """Fuentes del estudiante: *.c y *.h de TAREA01 (incluye variantes de nombre)"""
+    return sorted(glob.glob(os.path.join(student_dir, '*.c')) + glob.glob(os.path.join(student_dir, '*.h')))
+
+
+def stage_spec(stage, student_id, student_dir, scores_dir='scores'):
+    """Entradas, herramientas, parámetros y salidas de una etapa"""
+    out_dir = artifacts.student_dir(scores_dir, student_id)
+    if stage == 'score':
+        return {
+            'inputs': student_sources(student_dir) + [_repo_file('prompt.txt'), _repo_file('score.sh'),
+                                                      _repo_file('style_check.py'), _repo_file('prompting.py'),
+                                                      _repo_file('consensus.py')],
+            'tools': ['llm'],
+            'params': {'LLM_MODEL': os.environ.get('LLM_MODEL', 'gpt-4o-mini'),
+                       'STYLE_CHECK': os.environ.get('STYLE_CHECK', '1'),
+                       'SCORE_SAMPLES': os.environ.get('SCORE_SAMPLES', '1')},
+            'outputs': [os.path.join(out_dir, f"{student_id}.json")],
+        }
+    if stage == 'test':
+        return {
+            'inputs': student_sources(student_dir) + [_repo_file('test.sh')],
+            'tools': ['gcc'],
+            'params': {'TEST_TIMEOUT': os.environ.get('TEST_TIMEOUT', '5'),
+                       'TEST_MAX_OUTPUT': os.environ.get('TEST_MAX_OUTPUT', '65536')},
+            'outputs': [os.path.join(out_dir, f"{student_id}.csv")],
+        }
+    if stage == 'report':
+        partials = os.environ.get('REPORT_PARTIALS', '0') == '1'
+        outputs = [os.path.join(out_dir, f"final_report_{student_id}.pdf"),
+                   os.path.join(out_dir, f"evaluation_results_{student_id}.json")]
+        if partials:
+            outputs += [os.path.join(out_dir, f"calificaciones_{student_id}.pdf"),
+                        os.path.join(out_dir, f"testing_{student_id}.pdf")]
+        return {
+            'inputs': [os.path.join(out_dir, f"{student_id}.json"), os.path.join(out_dir, f"{student_id}.csv"),
+                       os.path.join(out_dir, f"style_{student_id}.json"),
+                       _repo_file('generate_report.py'), _repo_file('generate_pdf.py'),
+                       _repo_file('generate_test_pdf.py'), _repo_file('public/ibero.png')],
+            'tools': ['pdflatex'],
+            'params': {'REPORT_PARTIALS': partials},
+            'outputs': outputs,
+        }
+    raise ValueError(f"Etapa desconocida: {stage}")
+
+
+def file_hash(path):
+    """sha256 del archivo, o None si no existe"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    return digest.hexdigest()
+
+
+def tool_version(name):
+    """Identidad barata de una herramienta: ruta resuelta, tamaño y mtime del binario
+
+    Evita lanzar `<tool> --version` en cada verificación; cambia cuando la
+    herramienta se reinstala o actualiza.
+    """
+    path = shutil.which(name)
+    if not path:
+        return None
+    real_path = os.path.realpath(path)
+    stat = os.stat(real_path)
+    return f"{real_path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _display_path(path):
+    """Rutas del repositorio relativas a REPO_DIR para que el manifiesto sea portable"""
+    if os.path.isabs(path) and path.startswith(REPO_DIR + os.sep):
+        return os.path.relpath(path, REPO_DIR)
+    return path
+
+
+def stage_state(stage, student_id, student_dir, scores_dir='scores', params=None):
+    """Estado actual de una etapa; params reemplaza los del entorno cuando la etapa se ejecutó con otros"""
+    spec = stage_spec(stage, student_id, student_dir, scores_dir)
+    return {
+        'inputs': {_display_path(path): file_hash(path) for path in spec['inputs']},
+        'tools': {tool: tool_version(tool) for tool in spec['tools']},
+        'params': {**spec['params'], **(params or {})},
+        'outputs': spec['outputs'],
+    }
+
+
+def manifest_path(student_id, scores_dir='scores'):
+    return os.path.join(artifacts.student_dir(scores_dir, student_id), '.manifest', f"{student_id}.json")
+
+
+def load_manifest(student_id, scores_dir='scores'):
+    try:
+        with open(manifest_path(student_id, scores_dir), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {'version': MANIFEST_VERSION, 'student_id': student_id, 'stages': {}}
+    if data.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'student_id': student_id, 'stages': {}}
+    return data
+
+
+def save_manifest(data, student_id, scores_dir='scores'):
+    """Escritura atómica (archivo temporal + rename) para sobrevivir a interrupciones"""
+    path = manifest_path(student_id, scores_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp.{socket.gethostname()}.{os.getpid()}"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+
+def stale_reason(stage, student_id, student_dir, scores_dir='scores'):
+    """None si la etapa está al día; si no, el motivo para volver a ejecutarla"""
+    recorded = load_manifest(student_id, scores_dir)['stages'].get(stage)
+    if not recorded:
+        return 'sin registro previo'
+    current = stage_state(stage, student_id, student_dir, scores_dir)
+    for path in current['outputs']:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return f"falta la salida {path}"
+    for path, digest in current['inputs'].items():
+        if recorded['inputs'].get(path) != digest:
+            return f"cambió {path}"
+    for path in recorded['inputs']:
+        if path not in current['inputs']:
+            return f"ya no existe {path}"
+    for tool, version in current['tools'].items():
+        if recorded['tools'].get(tool) != version:
+            return f"cambió la herramienta {tool}"
+    if recorded['params'] != current['params']:
+        return 'cambiaron los parámetros'
+    return None
+
+
+def changed_programs(student_id, student_dir, scores_dir='scores'):
+    """Programas de test.sh cuyas fuentes cambiaron, o None si hay que probar todos
+
+    Solo hay una lista parcial si la etapa test ya se registró, existe el
+    corpus de salidas y lo único que cambió son fuentes de esos programas;
+    test.sh re-califica el resto desde el corpus (TEST_PROGRAMS).
+    """
+    recorded = load_manifest(student_id, scores_dir)['stages'].get('test')
+    corpus = artifacts.artifact_path(scores_dir, student_id, 'corpus')
+    if not recorded or os.environ.get('TEST_CORPUS') == '0' or not os.path.exists(corpus):
+        return None
+    current = stage_state('test', student_id, student_dir, scores_dir)
+    if current['tools'] != recorded['tools'] or current['params'] != recorded['params']:
+        return None
+    changed = [path for path in set(current['inputs']) | set(recorded['inputs'])
+               if current['inputs'].get(path) != recorded['inputs'].get(path)]
+    if not changed or any(os.path.normpath(os.path.dirname(path)) != os.path.normpath(student_dir)
+                          or os.path.basename(path) not in TEST_PROGRAMS for path in changed):
+        return None
+    names = {os.path.basename(path) for path in changed}
+    return [program for program in TEST_PROGRAMS if program in names]
+
+
+@contextmanager
+def locked(student_id, scores_dir='scores'):
+    """Lock exclusivo del manifiesto de un estudiante (etapas registradas por procesos o hosts distintos)"""
+    path = manifest_path(student_id, scores_dir) + '.lock'
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def record_stage(stage, student_id, student_dir, scores_dir='scores', params=None):
+    state = stage_state(stage, student_id, student_dir, scores_dir, params)
+    state['recorded_at'] = datetime.now().isoformat()
+    with locked(student_id, scores_dir):
+        data = load_manifest(student_id, scores_dir)
+        data['stages'][stage] = state
+        save_manifest(data, student_id, scores_dir)
+    artifacts.index_student(scores_dir, student_id)
+    return state
+
+
+def clear_stage(student_id, stage=None, scores_dir='scores'):
+    if stage is None:
+        try:
+            os.remove(manifest_path(student_id, scores_dir))
+        except FileNotFoundError:
+            pass
+        return
+    with locked(student_id, scores_dir):
+        data = load_manifest(student_id, scores_dir)
+        if data['stages'].pop(stage, None) is not None:
+            save_manifest(data, student_id, scores_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manifiesto incremental de etapas por estudiante')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in [('check', 'Código 0 si la etapa está al día'),
+                            ('record', 'Registrar la etapa después de ejecutarla'),
+                            ('clear', 'Borrar el registro de una etapa (o de todas)')]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('student_id', help='ID del estudiante')
+        sub.add_argument('stage', nargs='?' if name == 'clear' else None, choices=STAGES, help='Etapa')
+        sub.add_argument('--student-dir', help='Directorio de fuentes (por defecto: <id>/TAREA01)')
+        sub.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+
+    args = parser.parse_args()
+    student_dir = args.student_dir or os.path.join(args.student_id, 'TAREA01')
+
+    if args.command == 'check':
+        reason = stale_reason(args.stage, args.student_id, student_dir, args.scores_dir)
+        if reason is None:
+            print(f"⏭️  {args.stage}: entradas sin cambios, se omite")
+            sys.exit(0)
+        print(f"🔄 {args.stage}: {reason}")
+        sys.exit(1)
+    elif args.command == 'record':
+        record_stage(args.stage, args.student_id, student_dir, args.scores_dir)
+    else:
+        clear_stage(args.student_id, args.stage, args.scores_dir)
+
+
+if __name__ == "__main__":
+    main()
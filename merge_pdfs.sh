@@ -32,6 +32,8 @@ PDF1="$1"
 PDF2="$2"
 OUTPUT_PDF="$3"
 
+source "$(dirname "$0")/tracing.sh"
+
 # Verificar que los archivos de entrada existan
 if [ ! -f "$PDF1" ]; then
     echo "❌ Error: El archivo $PDF1 no existe"
@@ -63,10 +65,13 @@ echo "   PDF 2: $PDF2"
 echo "   Salida: $OUTPUT_PDF"
 
 # Concatenar PDFs usando Ghostscript
+trace_begin "gs_merge"
 gs -dBATCH -dNOPAUSE -q -sDEVICE=pdfwrite -sOutputFile="$OUTPUT_PDF" "$PDF1" "$PDF2"
+GS_STATUS=$?
+trace_end "gs_merge" $GS_STATUS $(( $(trace_size "$PDF1") + $(trace_size "$PDF2") )) $(trace_size "$OUTPUT_PDF")
 
 # Verificar si la concatenación fue exitosa
-if [ $? -eq 0 ] && [ -f "$OUTPUT_PDF" ] && [ -s "$OUTPUT_PDF" ]; then
+if [ $GS_STATUS -eq 0 ] && [ -f "$OUTPUT_PDF" ] && [ -s "$OUTPUT_PDF" ]; then
     echo "✅ PDFs concatenados exitosamente: $OUTPUT_PDF"
     
     # Mostrar información del archivo resultante
@@ -74,7 +79,11 @@ if [ $? -eq 0 ] && [ -f "$OUTPUT_PDF" ] && [ -s "$OUTPUT_PDF" ]; then
     echo "📄 Tamaño del archivo: $file_size"
     
     # Verificar que el PDF es válido
-    if gs -q -dNOPAUSE -dBATCH -sDEVICE=nullpage "$OUTPUT_PDF" 2>/dev/null; then
+    trace_begin "gs_validate"
+    gs -q -dNOPAUSE -dBATCH -sDEVICE=nullpage "$OUTPUT_PDF" 2>/dev/null
+    GS_STATUS=$?
+    trace_end "gs_validate" $GS_STATUS $(trace_size "$OUTPUT_PDF") 0
+    if [ $GS_STATUS -eq 0 ]; then
         echo "✅ PDF válido y listo para usar"
     else
         echo "⚠️  Advertencia: El PDF generado podría tener problemas"
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Métricas en vivo para corridas largas del pipeline
+
+MetricsCollector sigue el archivo de trazas (GRADER_TRACE) mientras crece y
+mantiene concurrencia por etapa, histogramas de latencia, fallas por motivo y
+el avance del lote. Las métricas se publican en formato de texto de
+Prometheus, en un archivo y en un endpoint HTTP que solo escucha en localhost.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Límites de los histogramas de latencia, en segundos
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+# Etapas de primer nivel de general.sh, en orden
+PIPELINE_STAGES = ['score', 'test', 'report']
+
+
+class MetricsCollector:
+    """Estado de las métricas alimentado por eventos de traza y por el lote"""
+
+    def __init__(self, students, jobs):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.jobs = jobs
+        self.total_students = len(students)
+        self.queued = set(students)
+        self.running = {}
+        self.finished = {}
+        self.in_flight = defaultdict(int)
+        self.stage_done = defaultdict(set)
+        self.histograms = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sum = defaultdict(float)
+        self.latency_count = defaultdict(int)
+        self.failures = defaultdict(int)
+        self.open_spans = {}
+        self._offset = 0
+        self._partial = ''
+
+    # --- Eventos del lote -------------------------------------------------
+
+    def student_started(self, student):
+        with self.lock:
+            self.queued.discard(student)
+            self.running[student] = time.time()
+
+    def student_finished(self, student, status):
+        with self.lock:
+            started = self.running.pop(student, time.time())
+            self.finished[student] = (status, time.time() - started)
+
+    # --- Eventos de traza -------------------------------------------------
+
+    def consume_event(self, event):
+        stage = event.get('name')
+        args = event.get('args', {})
+        key = (event.get('pid'), event.get('tid'), stage)
+        with self.lock:
+            if event.get('ph') == 'B':
+                self.in_flight[stage] += 1
+                self.open_spans.setdefault(key, []).append(event.get('ts', 0))
+            elif event.get('ph') == 'E':
+                self.in_flight[stage] = max(0, self.in_flight[stage] - 1)
+                starts = self.open_spans.get(key)
+                if starts:
+                    seconds = (event.get('ts', 0) - starts.pop()) / 1e6
+                    self._observe(stage, seconds)
+                status = args.get('status', 0)
+                if status:
+                    self.failures[(stage, args.get('reason') or f"exit_{status}")] += 1
+                elif stage in PIPELINE_STAGES and args.get('student'):
+                    self.stage_done[stage].add(args['student'])
+
+    def _observe(self, stage, seconds):
+        buckets = self.histograms[stage]
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[index] += 1
+                break
+        else:
+            buckets[-1] += 1
+        self.latency_sum[stage] += seconds
+        self.latency_count[stage] += 1
+
+    def poll_trace(self, trace_path):
+        """Lee las líneas nuevas del archivo de trazas"""
+        try:
+            with open(trace_path, 'r', encoding='utf-8', errors='replace') as f:
+                f.seek(self._offset)
+                chunk = f.read()
+                self._offset = f.tell()
+        except FileNotFoundError:
+            return
+        data = self._partial + chunk
+        lines = data.split('\n')
+        self._partial = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                self.consume_event(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+    # --- Exposición -------------------------------------------------------
+
+    def eta_seconds(self):
+        """Estimación del tiempo restante con la duración media por estudiante"""
+        with self.lock:
+            durations = [duration for _, duration in self.finished.values()]
+            remaining = len(self.queued) + len(self.running)
+        if not durations:
+            return None
+        return remaining * (sum(durations) / len(durations)) / max(1, self.jobs)
+
+    def render(self):
+        """Texto en formato de exposición de Prometheus"""
+        eta = self.eta_seconds()
+        with self.lock:
+            lines = []
+
+            def metric(name, kind, help_text):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            metric('grader_students_total', 'gauge', 'Estudiantes en el lote')
+            lines.append(f"grader_students_total {self.total_students}")
+            metric('grader_students', 'gauge', 'Estudiantes por estado')
+            failed = sum(1 for status, _ in self.finished.values() if status)
+            lines.append(f'grader_students{{state="queued"}} {len(self.queued)}')
+            lines.append(f'grader_students{{state="running"}} {len(self.running)}')
+            lines.append(f'grader_students{{state="done"}} {len(self.finished) - failed}')
+            lines.append(f'grader_students{{state="failed"}} {failed}')
+
+            metric('grader_stage_queue_depth', 'gauge', 'Estudiantes que aún no completan cada etapa')
+            for stage in PIPELINE_STAGES:
+                pending = self.total_students - len(self.stage_done[stage])
+                lines.append(f'grader_stage_queue_depth{{stage="{stage}"}} {pending}')
+
+            metric('grader_stage_in_flight', 'gauge', 'Spans abiertos por etapa (llm, gcc, pdflatex, ...)')
+            for stage, count in sorted(self.in_flight.items()):
+                lines.append(f'grader_stage_in_flight{{stage="{stage}"}} {count}')
+
+            metric('grader_stage_latency_seconds', 'histogram', 'Latencia por etapa')
+            for stage in sorted(self.histograms):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, self.histograms[stage]):
+                    cumulative += count
+                    lines.append(f'grader_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                cumulative += self.histograms[stage][-1]
+                lines.append(f'grader_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative}')
+                lines.append(f'grader_stage_latency_seconds_sum{{stage="{stage}"}} {self.latency_sum[stage]:.6f}')
+                lines.append(f'grader_stage_latency_seconds_count{{stage="{stage}"}} {self.latency_count[stage]}')
+
+            metric('grader_failures_total', 'counter', 'Fallas por etapa y motivo (COMPILE_ERROR, timeout, invalid_json, ...)')
+            for (stage, reason), count in sorted(self.failures.items()):
+                lines.append(f'grader_failures_total{{stage="{stage}",reason="{reason}"}} {count}')
+
+            metric('grader_elapsed_seconds', 'gauge', 'Tiempo transcurrido desde el inicio del lote')
+            lines.append(f"grader_elapsed_seconds {time.time() - self.started_at:.1f}")
+            metric('grader_eta_seconds', 'gauge', 'Tiempo restante estimado (NaN sin datos)')
+            lines.append(f"grader_eta_seconds {'NaN' if eta is None else f'{eta:.1f}'}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        """Escribe las métricas de forma atómica (archivo temporal + rename)"""
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, path)
+
+
+def serve_metrics(collector, port):
+    """Inicia el endpoint /metrics en 127.0.0.1 en un hilo de fondo"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') not in ('', '/metrics'):
+                self.send_error(404)
+                return
+            body = collector.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def start_trace_follower(collector, trace_path, textfile=None, interval=1.0):
+    """Hilo que sigue el archivo de trazas y reescribe el archivo de métricas"""
+    stop = threading.Event()
+
+    def follow():
+        while not stop.is_set():
+            collector.poll_trace(trace_path)
+            if textfile:
+                collector.write_textfile(textfile)
+            stop.wait(interval)
+        collector.poll_trace(trace_path)
+        if textfile:
+            collector.write_textfile(textfile)
+
+    thread = threading.Thread(target=follow, daemon=True)
+    thread.start()
+    return stop, thread
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Perfilado de los generadores: tiempos por función y memoria por fase
+
+Con --profile [DIR] (o GRADER_PROFILE=DIR) un punto de entrada corre bajo
+cProfile (tiempos deterministas por función) y tracemalloc. Las fases
+marcadas en el código con phase() ('report.render', 'scores_csv.merge',
+'cohort.aggregate', ...) registran tiempo, memoria y, en sus primeras
+ocurrencias, la diferencia entre snapshots de tracemalloc por línea. Al
+terminar se escriben en DIR (por omisión _profile/):
+
+  <entrada>-<fecha>-<pid>.pstats   estadísticas de cProfile (snakeviz, pstats)
+  <entrada>-<fecha>-<pid>.json     top-N por función, funciones vigiladas,
+                                   fases y asignaciones
+
+y se imprime un resumen. GRADER_PROFILE se exporta a los subprocesos, así
+que los generadores que lanza score.sh también se perfilan. En grader.py
+cada hilo de estudiante tiene su propio perfil y se suman al final.
+
+Uso:
+  python3 grader.py report --force report --profile
+  python3 generate_scores_csv.py --profile
+  python3 profiling.py show _profile/grader-report-*.json
+  python3 profiling.py diff antes.json despues.json   # funciones que empeoraron
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import pstats
+import cProfile
+import argparse
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Funciones que siempre aparecen en el JSON aunque no entren al top-N, para
+# poder comparar su costo entre corridas
+HOT_PATHS = ('clean_unicode_for_latex', 'fix_concatenated_text', 'format_comments_with_bullets',
+             'format_test_results_table', 'calculate_program_scores', 'create_latex_body',
+             'consolidate_scores', 'normalize_program_scores', 'compute_statistics', 'load_test_rows')
+
+# Snapshots de tracemalloc por fase (los siguientes solo miden tiempo y memoria)
+SNAPSHOTS_PER_PHASE = 3
+
+_session = None
+_local = threading.local()
+
+
+class Session:
+    """Perfil de un punto de entrada: cProfile del hilo principal, de los hilos y fases"""
+
+    def __init__(self, name, out_dir, top):
+        self.name = name
+        self.out_dir = out_dir
+        self.top = top
+        self.lock = threading.Lock()
+        self.thread_profiles = []
+        self.phases = {}
+        self.started = time.perf_counter()
+        self.started_at = datetime.now()
+        self.own_tracemalloc = not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start()
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def record_phase(self, label, seconds, memory_delta, allocations):
+        with self.lock:
+            entry = self.phases.setdefault(label, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+                                                   'memory_delta_bytes': 0, 'allocations': {}})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['memory_delta_bytes'] += memory_delta
+            for where, (size, count) in allocations.items():
+                total = entry['allocations'].setdefault(where, [0, 0])
+                total[0] += size
+                total[1] += count
+
+    def take_snapshot(self, label):
+        """True si a esta ocurrencia de la fase le toca snapshot"""
+        with self.lock:
+            return self.phases.get(label, {}).get('count', 0) < SNAPSHOTS_PER_PHASE
+
+    def finish(self):
+        """Detiene los perfiles y escribe .pstats y .json; regresa el reporte"""
+        self.profile.disable()
+        seconds = time.perf_counter() - self.started
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if self.own_tracemalloc:
+            tracemalloc.stop()
+
+        stats = pstats.Stats(self.profile)
+        with self.lock:
+            for profile in self.thread_profiles:
+                stats.add(profile)
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        stem = os.path.join(self.out_dir, f"{self.name}-{self.started_at:%Y%m%d-%H%M%S}-{os.getpid()}")
+        stats.dump_stats(f"{stem}.pstats")
+
+        functions = function_rows(stats)
+        report = {
+            'entry': self.name,
+            'argv': sys.argv,
+            'python': sys.version.split()[0],
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'seconds': round(seconds, 4),
+            'threads_profiled': len(self.thread_profiles),
+            'memory': {'current_bytes': current, 'peak_bytes': peak},
+            'functions': sorted(functions, key=lambda row: -row['tottime'])[:self.top],
+            'cumulative': sorted(functions, key=lambda row: -row['cumtime'])[:self.top],
+            'watched': {row['function']: row for row in functions
+                        if row['name'] in HOT_PATHS and row['file'].endswith('.py') and '/' not in row['file']},
+            'phases': {label: _phase_summary(entry, self.top) for label, entry in sorted(self.phases.items())},
+            'allocations': [_allocation_row(stat) for stat in _top(snapshot.statistics('lineno'), self.top)],
+            'pstats': f"{stem}.pstats",
+            'json': f"{stem}.json",
+        }
+        with open(f"{stem}.json", 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        return report
+
+
+# Asignaciones que son del propio perfilado o de la importación de módulos
+IGNORED_FILES = (tracemalloc.__file__, os.path.abspath(__file__), '<frozen importlib._bootstrap>',
+                 '<frozen importlib._bootstrap_external>', '<unknown>')
+
+
+def _top(statistics, top):
+    """Las primeras top filas de estadísticas de tracemalloc, sin IGNORED_FILES
+
+    Filtrar las filas ya agrupadas es mucho más barato que filter_traces()
+    sobre cada asignación viva.
+    """
+    rows = []
+    for stat in statistics:
+        if stat.traceback[0].filename not in IGNORED_FILES:
+            rows.append(stat)
+            if len(rows) == top:
+                break
+    return rows
+
+
+@contextmanager
+def _paused():
+    """Suspende el cProfile del hilo actual (para no medir los snapshots)"""
+    profile = getattr(_local, 'profile', None)
+    if profile is None and _session is not None and threading.current_thread() is threading.main_thread():
+        profile = _session.profile
+    if profile is not None:
+        profile.disable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.enable()
+
+
+def _short_path(path):
+    """Ruta relativa al repositorio si está dentro de él"""
+    if path.startswith(REPO_DIR + os.sep):
+        return os.path.relpath(path, REPO_DIR)
+    return path
+
+
+def _allocation_row(stat):
+    frame = stat.traceback[0]
+    return {'where': f"{_short_path(frame.filename)}:{frame.lineno}", 'size_bytes': stat.size, 'count': stat.count}
+
+
+def _phase_summary(entry, top):
+    allocations = sorted(entry['allocations'].items(), key=lambda item: -abs(item[1][0]))[:top]
+    return {
+        'count': entry['count'],
+        'seconds': round(entry['seconds'], 4),
+        'max_seconds': round(entry['max_seconds'], 4),
+        'memory_delta_bytes': entry['memory_delta_bytes'],
+        'allocations': [{'where': where, 'size_diff_bytes': size, 'count_diff': count}
+                        for where, (size, count) in allocations],
+    }
+
+
+def function_rows(stats):
+    """Una fila por función de pstats: llamadas, tiempo propio y acumulado"""
+    rows = []
+    for (filename, line, name), (primitive, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({'function': f"{_short_path(filename)}:{line}({name})", 'file': _short_path(filename),
+                     'name': name, 'calls': calls, 'primitive_calls': primitive,
+                     'tottime': round(tottime, 6), 'cumtime': round(cumtime, 6)})
+    return rows
+
+
+def start(name, args=None):
+    """Inicia el perfil del proceso si args.profile (o GRADER_PROFILE) indica un directorio
+
+    El reporte se escribe en stop(), que también corre al salir del intérprete
+    (incluso con sys.exit).
+    """
+    global _session
+    out_dir = getattr(args, 'profile', None) or os.environ.get('GRADER_PROFILE')
+    if not out_dir or _session is not None:
+        return _session
+    # Los generadores que se lancen como subproceso escriben su propio perfil
+    os.environ['GRADER_PROFILE'] = out_dir
+    _session = Session(name, out_dir, getattr(args, 'profile_top', None) or 25)
+    atexit.register(stop)
+    return _session
+
+
+def stop():
+    """Termina el perfil, escribe .pstats y .json e imprime el resumen"""
+    global _session
+    session, _session = _session, None
+    if session is None:
+        return None
+    report = session.finish()
+    print_summary(report, min(session.top, 15))
+    return report
+
+
+@contextmanager
+def phase(label):
+    """Tiempo y memoria de una fase (render, aggregate, ...); no hace nada sin perfilado"""
+    session = _session
+    if session is None:
+        yield
+        return
+    before = None
+    if session.take_snapshot(label):
+        with _paused():
+            before = tracemalloc.take_snapshot()
+    memory_before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        memory_after, _ = tracemalloc.get_traced_memory()
+        allocations = {}
+        if before is not None:
+            with _paused():
+                after = tracemalloc.take_snapshot()
+                for stat in _top(after.compare_to(before, 'lineno'), session.top):
+                    frame = stat.traceback[0]
+                    allocations[f"{_short_path(frame.filename)}:{frame.lineno}"] = (stat.size_diff, stat.count_diff)
+        session.record_phase(label, seconds, memory_after - memory_before, allocations)
+
+
+@contextmanager
+def thread_profile():
+    """cProfile del hilo actual (los hilos no heredan el perfil del principal)"""
+    session = _session
+    if session is None or threading.current_thread() is threading.main_thread():
+        yield
+        return
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # Python 3.12+: el perfil del hilo principal ya cubre todos los hilos
+        yield
+        return
+    _local.profile = profile
+    try:
+        yield
+    finally:
+        profile.disable()
+        _local.profile = None
+        with session.lock:
+            session.thread_profiles.append(profile)
+
+
+def _megabytes(size):
+    if abs(size) < 1e6:
+        return f"{size / 1e3:.1f} KB"
+    return f"{size / 1e6:.1f} MB"
+
+
+def print_summary(report, top=15):
+    """Top-N por tiempo propio, fases y asignaciones"""
+    print(f"\n🔬 Perfil de {report['entry']}: {report['seconds']:.2f} s, "
+          f"pico de memoria {_megabytes(report['memory']['peak_bytes'])}")
+    print(f"   {'tottime':>9} {'cumtime':>9} {'llamadas':>10}  función")
+    for row in report['functions'][:top]:
+        print(f"   {row['tottime']:>9.4f} {row['cumtime']:>9.4f} {row['calls']:>10}  {row['function']}")
+    if report['phases']:
+        print(f"   {'fase':<24} {'veces':>6} {'segundos':>9} {'máx':>8} {'Δ memoria':>11}")
+        for label, entry in report['phases'].items():
+            print(f"   {label:<24} {entry['count']:>6} {entry['seconds']:>9.3f} {entry['max_seconds']:>8.3f} "
+                  f"{_megabytes(entry['memory_delta_bytes']):>11}")
+    if report['allocations']:
+        print("   Memoria viva al final:")
+        for row in report['allocations'][:5]:
+            print(f"   {_megabytes(row['size_bytes']):>10}  {row['where']}")
+    print(f"📄 {report['json']}")
+    print(f"📄 {report['pstats']}")
+
+
+def diff_reports(old, new, threshold=0.0):
+    """Funciones cuyo tiempo propio cambió entre dos perfiles JSON, de mayor a menor aumento"""
+    def by_function(report):
+        rows = {row['function']: row for row in report['functions']}
+        rows.update({row['function']: row for row in report['watched'].values()})
+        return rows
+
+    before, after = by_function(old), by_function(new)
+    changes = []
+    for function in sorted(set(before) | set(after)):
+        old_time = before.get(function, {}).get('tottime', 0.0)
+        new_time = after.get(function, {}).get('tottime', 0.0)
+        if abs(new_time - old_time) > threshold:
+            changes.append((new_time - old_time, old_time, new_time, function))
+    changes.sort(reverse=True)
+    return changes
+
+
+def add_arguments(parser):
+    """--profile [DIR] y --profile-top para los puntos de entrada"""
+    parser.add_argument('--profile', nargs='?', const='_profile', default=os.environ.get('GRADER_PROFILE'),
+                        metavar='DIR', help='Perfilar con cProfile y tracemalloc; escribe .pstats y .json en DIR '
+                                            '(por defecto: _profile)')
+    parser.add_argument('--profile-top', type=int, default=25, metavar='N',
+                        help='Funciones y asignaciones en el resumen (por defecto: 25)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resúmenes y comparación de perfiles de los generadores')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    show = subparsers.add_parser('show', help='Resumen de un perfil .json o .pstats')
+    show.add_argument('profile_file', help='Archivo .json o .pstats')
+    show.add_argument('-n', '--top', type=int, default=25, help='Filas a mostrar (por defecto: 25)')
+    diff = subparsers.add_parser('diff', help='Funciones que cambiaron entre dos perfiles .json')
+    diff.add_argument('old', help='Perfil de referencia')
+    diff.add_argument('new', help='Perfil nuevo')
+    diff.add_argument('-t', '--threshold', type=float, default=0.001,
+                      help='Cambio mínimo de tiempo propio en segundos (por defecto: 0.001)')
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        if args.profile_file.endswith('.pstats'):
+            pstats.Stats(args.profile_file).sort_stats('tottime').print_stats(args.top)
+            return
+        with open(args.profile_file, encoding='utf-8') as f:
+            print_summary(json.load(f), args.top)
+        return
+
+    with open(args.old, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, encoding='utf-8') as f:
+        new = json.load(f)
+    changes = diff_reports(old, new, args.threshold)
+    if not changes:
+        print(f"✅ Sin cambios mayores a {args.threshold} s por función")
+        return
+    print(f"   {'Δ tottime':>10} {'antes':>9} {'después':>9}  función")
+    for delta, old_time, new_time, function in changes:
+        mark = '🔺' if delta > 0 else '🔻'
+        print(f"{mark} {delta:>+10.4f} {old_time:>9.4f} {new_time:>9.4f}  {function}")
+    sys.exit(1 if any(delta > 0 for delta, *_ in changes) else 0)
+
+
+if __name__ == "__main__":
+    main()
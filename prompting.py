@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Armado del prompt de calificación con la rúbrica como prefijo estable
+
+prompt.txt se divide en dos partes en la línea "Ahora, califica las siguientes
+entregas...":
+  • la rúbrica y las instrucciones (todo lo anterior) van como prompt de sistema
+    y son idénticas byte a byte para todo el grupo, así que el proveedor puede
+    reutilizar su prefijo en cache entre estudiantes
+  • la parte del estudiante (hallazgos de style_check.py y el código de cada
+    ejercicio) va como mensaje del usuario, después del prefijo
+
+El mismo prefijo sirve para el modo empaquetado (score_pack.py), que califica a
+varios estudiantes en una sola solicitud con un schema por ID.
+
+Uso:
+  python3 prompting.py single msc25ahl/TAREA01 --system sys.txt --user user.txt
+  python3 prompting.py schema                     # schema JSON de un estudiante
+"""
+
+import os
+import re
+import json
+import argparse
+
+import workspace
+import artifacts
+import style_check
+from llm_usage import EXERCISES, EXERCISE_FILES
+
+PROMPT_ANCHOR = style_check.PROMPT_ANCHOR
+CODE_LINE = re.compile(r'^• Código de (\S+?):')
+CODE_PLACEHOLDER = ' [PEGAR CÓDIGO AQUÍ O DEJAR VACÍO PARA EJEMPLO]'
+
+EXERCISE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'calificacion': {'type': 'integer', 'minimum': 0, 'maximum': 10},
+        'comentarios': {'type': 'string', 'minLength': 10},
+    },
+    'required': ['calificacion', 'comentarios'],
+}
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        **{exercise: EXERCISE_SCHEMA for exercise in EXERCISES},
+        'total': {'type': 'number', 'minimum': 0, 'maximum': 40},
+    },
+    'required': EXERCISES + ['total'],
+}
+
+
+def packed_schema(student_ids):
+    """Schema combinado: un objeto de calificaciones por ID de estudiante"""
+    return {
+        'type': 'object',
+        'properties': {student_id: SCHEMA for student_id in student_ids},
+        'required': list(student_ids),
+    }
+
+
+def load_prompt(prompt_path='prompt.txt'):
+    """(rúbrica, plantilla de entregas); la rúbrica es la misma para todo el grupo"""
+    with open(prompt_path, 'r', encoding='utf-8') as f:
+        prompt = f.read()
+    index = prompt.find(PROMPT_ANCHOR)
+    if index < 0:
+        raise ValueError(f"{prompt_path} no contiene la línea '{PROMPT_ANCHOR}...'")
+    # Sin saltos de línea al final: score.sh la pasa con "$(cat ...)", que los recorta
+    return prompt[:index].rstrip(), prompt[index:]
+
+
+def exercise_source(student_dir, file_name):
+    """Ruta del código de un renglón '• Código de <archivo>:' (con variantes de nombre), o None"""
+    names = EXERCISE_FILES.get(file_name[:-2] if file_name.endswith('.c') else file_name, [file_name])
+    for name in names:
+        path = os.path.join(student_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def render_code_line(line, student_dir):
+    """'• Código de X: [PEGAR...]' → la línea seguida del código, o '(archivo no encontrado)'"""
+    match = CODE_LINE.match(line)
+    path = exercise_source(student_dir, match.group(1))
+    if path is None:
+        return line.replace('[PEGAR CÓDIGO AQUÍ O DEJAR VACÍO PARA EJEMPLO]', '(archivo no encontrado)')
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        code = f.read()
+    return line.replace(CODE_PLACEHOLDER, '') + code + ('' if code.endswith('\n') else '\n')
+
+
+def code_section(template, student_dir):
+    """Solo los renglones de código de la plantilla, ya llenos"""
+    return ''.join(render_code_line(line, student_dir) for line in template.splitlines(keepends=True)
+                   if CODE_LINE.match(line))
+
+
+def student_prompt(template, student_dir, style_block=''):
+    """Mensaje del usuario: hallazgos de estilo y la plantilla con el código del estudiante"""
+    rendered = ''.join(render_code_line(line, student_dir) if CODE_LINE.match(line) else line
+                       for line in template.splitlines(keepends=True))
+    return (style_block + '\n' if style_block else '') + rendered
+
+
+def style_findings(student_dir, student_id, scores_dir='scores'):
+    """Corre style_check, guarda scores/style_<id>.json y regresa el bloque para el prompt"""
+    report = style_check.analyze_student(student_dir)
+    workspace.write_text(os.path.join(scores_dir, f"style_{student_id}.json"),
+                         json.dumps(report, indent=2, ensure_ascii=False))
+    return style_check.format_prompt_block(report)
+
+
+def packed_prompt(template, students, scores_dir='scores', style=True):
+    """Mensaje del usuario con las entregas de varios estudiantes, cada una bajo su ID"""
+    header = (f"Ahora, califica por separado las entregas de los siguientes {len(students)} alumnos. "
+              f"Responde un objeto JSON con una clave por ID de alumno ({', '.join(students)}); "
+              "el valor de cada clave es la calificación de ese alumno con la estructura indicada arriba. "
+              "No mezcles el código ni los comentarios de un alumno con los de otro.\n\n")
+    sections = []
+    for student_id, student_dir in students.items():
+        block = style_findings(student_dir, student_id, artifacts.student_dir(scores_dir, student_id)) if style else ''
+        sections.append(f"=== Alumno {student_id} ===\n" + (block + '\n' if block else '')
+                        + code_section(template, student_dir))
+    return header + '\n'.join(sections) + '\nRespuesta en JSON estricto.\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arma el prompt de calificación con la rúbrica como prefijo estable')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    single = subparsers.add_parser('single', help='Prompt de sistema (rúbrica) y prompt de un estudiante')
+    single.add_argument('student_dir', help='Directorio del estudiante (ej: msc25ahl/TAREA01)')
+    single.add_argument('--system', required=True, help='Archivo de salida para la rúbrica')
+    single.add_argument('--user', required=True, help='Archivo de salida para la parte del estudiante')
+    single.add_argument('-p', '--prompt', default='prompt.txt', help='Plantilla (por defecto: prompt.txt)')
+    single.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    single.add_argument('--no-style', action='store_true', help='No agregar los hallazgos de style_check.py')
+
+    subparsers.add_parser('schema', help='Imprime el schema JSON de un estudiante')
+
+    args = parser.parse_args()
+    if args.command == 'schema':
+        print(json.dumps(SCHEMA, ensure_ascii=False))
+        return
+
+    rubric, template = load_prompt(args.prompt)
+    student_id = os.path.basename(os.path.dirname(os.path.abspath(args.student_dir)))
+    block = '' if args.no_style else style_findings(args.student_dir, student_id, args.scores_dir)
+    workspace.write_text(args.system, rubric)
+    workspace.write_text(args.user, student_prompt(template, args.student_dir, block))
+    style_note = '' if args.no_style else ' con hallazgos de estilo'
+    print(f"✅ Prompt armado{style_note}: rúbrica {len(rubric.encode())} bytes (prefijo estable), "
+          f"entregas {os.path.getsize(args.user)} bytes")
+
+
+if __name__ == "__main__":
+    main()
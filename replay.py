@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Re-calificación sobre el corpus de salidas archivadas, sin compilar ni ejecutar
+
+test.sh guarda la salida cruda de cada caso en scores/.corpus/<id>.tar.gz.
+Después de cambiar un matcher de test.sh (una variante como "multiplliacion",
+acentos, residuo vs cociente), este script vuelve a pasar test.sh en modo
+--replay sobre cada corpus del grupo y muestra qué veredictos cambiaron
+respecto a scores/<id>.csv. Con --write los CSVs re-calificados reemplazan a
+los actuales.
+
+Los matchers siguen siendo los de test.sh (bash y grep), para que el replay
+califique exactamente como una corrida normal: se ahorra compilar y ejecutar,
+pero cada caso todavía cuesta un pipeline de grep y cada estudiante un
+proceso test.sh (-j los reparte entre núcleos).
+
+Salida: scores/replay_diff.csv (un renglón por veredicto que cambió)
+"""
+
+import os
+import csv
+import sys
+import time
+import argparse
+import subprocess
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import workspace
+import artifacts
+from generate_test_pdf import load_csv_data
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def find_corpora(scores_dir, students=None):
+    """{student_id: ruta del corpus}, según el índice de artifacts.py"""
+    return dict(artifacts.list_artifacts(scores_dir, 'corpus', students))
+
+
+def verdict_key(rows):
+    """{(programa, tipo, entrada, n): renglón}; n distingue entradas repetidas"""
+    keyed = {}
+    seen = Counter()
+    for row in rows or []:
+        base = (row['Program_Name'], row['Test_Type'], row['Input_Values'])
+        seen[base] += 1
+        keyed[base + (seen[base],)] = row
+    return keyed
+
+
+def diff_verdicts(student_id, old_rows, new_rows):
+    """Renglones [(estudiante, programa, entrada, antes, después, notas)] cuyo veredicto cambió"""
+    old, new = verdict_key(old_rows), verdict_key(new_rows)
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        before = old.get(key)
+        after = new.get(key)
+        before_verdict = f"{before['Test_Status']}({before['Test_Score']})" if before else 'ausente'
+        after_verdict = f"{after['Test_Status']}({after['Test_Score']})" if after else 'ausente'
+        if before_verdict != after_verdict:
+            changes.append([student_id, key[0], key[2], before_verdict, after_verdict,
+                            (after or before).get('Notes', '')])
+    return changes
+
+
+def replay_student(student_id, corpus, work_dir):
+    """Re-califica un estudiante; regresa (student_id, CSV re-calificado, error)"""
+    replay_csv = os.path.join(work_dir, f"{student_id}.csv")
+    cmd = [os.path.join(REPO_DIR, 'test.sh'), os.path.join(student_id, 'TAREA01'), '-o', replay_csv,
+           '--replay', corpus]
+    env = dict(os.environ, TRACE_STUDENT=student_id)
+    result = subprocess.run(cmd, env=env, capture_output=True, text=True, errors='replace')
+    if result.returncode != 0 or not os.path.exists(replay_csv):
+        return student_id, None, (result.stdout + result.stderr)[-500:]
+    return student_id, replay_csv, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-califica el corpus de salidas archivadas con los matchers actuales de test.sh')
+    parser.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los del corpus)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    parser.add_argument('--write', action='store_true', help='Reemplazar scores/<id>.csv con los resultados re-calificados')
+    args = parser.parse_args()
+
+    corpora = find_corpora(args.scores_dir, set(args.students))
+    if not corpora:
+        print(f"❌ Error: no hay corpus en {args.scores_dir} (ejecuta test.sh primero)")
+        sys.exit(1)
+
+    print(f"🔁 Re-calificando {len(corpora)} estudiantes sin compilar ni ejecutar...")
+    started = time.time()
+    changes = []
+    failed = []
+    replayed_cases = 0
+    with workspace.scratch_dir('replay') as work_dir, ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        futures = [pool.submit(replay_student, student_id, corpus, work_dir)
+                   for student_id, corpus in corpora.items()]
+        for future in futures:
+            student_id, replay_csv, error = future.result()
+            if error:
+                print(f"❌ {student_id}: {error}")
+                failed.append(student_id)
+                continue
+            old_csv = artifacts.artifact_path(args.scores_dir, student_id, 'tests')
+            old_rows = load_csv_data(old_csv) if os.path.exists(old_csv) else []
+            new_rows = load_csv_data(replay_csv)
+            replayed_cases += len(new_rows or [])
+            changes.extend(diff_verdicts(student_id, old_rows, new_rows))
+            if args.write:
+                workspace.publish(replay_csv, old_csv)
+                artifacts.index_student(args.scores_dir, student_id)
+
+    for student_id, program, test_input, before, after, notes in changes:
+        print(f"   {student_id} {program} [{test_input}]: {before} → {after}  {notes}")
+
+    diff_file = os.path.join(args.scores_dir, 'replay_diff.csv')
+    with workspace.scratch_dir('replay') as work_dir:
+        scratch_csv = os.path.join(work_dir, 'replay_diff.csv')
+        with open(scratch_csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Student_ID', 'Program_Name', 'Input_Values', 'Before', 'After', 'Notes'])
+            writer.writerows(changes)
+        workspace.publish(scratch_csv, diff_file)
+
+    students_changed = len({change[0] for change in changes})
+    print(f"✅ {replayed_cases} casos de {len(corpora) - len(failed)} estudiantes en {time.time() - started:.1f} s: "
+          f"{len(changes)} veredictos cambiaron ({students_changed} estudiantes)")
+    print(f"📄 Diferencias: {diff_file}")
+    if args.write:
+        print("💾 CSVs re-calificados publicados en scores/ (el reporte se regenera en la siguiente corrida)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,13 @@
 
 # Script para calificar un solo estudiante con JSON schema y PDF estético
 # Ejecutar desde EJ01 como: ./score.sh msc25ahl/TAREA01
-# Requiere: llm, python3, generate_aesthetic_pdf.py, prompt.txt
-# Genera: JSON con calificaciones y PDF estético
+# Requiere: llm, python3, generate_aesthetic_pdf.py, prompt.txt, prompting.py
+# Genera: JSON con calificaciones, PDF estético y uso de tokens (scores/llm_usage_<id>.json)
+# Variables opcionales: LLM_MODEL (por defecto gpt-4o-mini), LLM_RETRIES (por defecto 2),
+#   SCORE_SKIP_PDF=1 (no genera calificaciones_<id>.pdf; general.sh usa generate_report.py),
+#   STYLE_CHECK=0 (no agrega los hallazgos de style_check.py al prompt),
+#   SCORE_SAMPLES=K (consenso de K muestras en paralelo con parada temprana, ver consensus.py)
+# Para calificar a varios estudiantes por solicitud ver score_pack.py
 
 if [ $# -ne 1 ]; then
     echo "🎓 Script de Calificación Automática"
@@ -18,7 +23,7 @@ if [ $# -ne 1 ]; then
     echo "  • llm (instalado y configurado)"
     echo "  • python3"
     echo "  • generate_aesthetic_pdf.py"
-    echo "  • prompt.txt"
+    echo "  • prompt.txt, prompting.py"
     echo ""
     exit 1
 fi
@@ -27,6 +32,9 @@ STUDENT_DIR="$1"
 PROMPT_PATH="prompt.txt"
 student=$(basename $(dirname "$STUDENT_DIR"))
 
+source "$(dirname "$0")/tracing.sh"
+export TRACE_STUDENT="${TRACE_STUDENT:-$student}"
+
 # Verifica que el directorio exista
 if [ ! -d "$STUDENT_DIR" ]; then
     echo "Directorio $STUDENT_DIR no encontrado."
@@ -35,126 +43,128 @@ fi
 
 echo "Procesando estudiante: $student"
 
+# Directorio de artefactos del estudiante: scores/ o scores/<aa>/<id>/ (ver artifacts.py)
+SCORES_DIR=$(python3 artifacts.py dir "$student")
+mkdir -p "$SCORES_DIR"
+
+# La rúbrica va como prompt de sistema, idéntica byte a byte para todo el grupo
+# (prefijo reutilizable por el cache del proveedor); el código del estudiante y
+# los hallazgos de style_check.py (STYLE_CHECK=0 los omite) van después
+SYSTEM_PROMPT=$(mktemp)
 TEMP_PROMPT=$(mktemp)
-cp "$PROMPT_PATH" "$TEMP_PROMPT"
-
-# Función para reemplazar código en prompt temporal
-replace_code() {
-    local temp_prompt="$1"
-    local file_path="$2"
-    local key="$3"
-    if [ -f "$file_path" ]; then
-        sed -i '' "/• Código de $key:/ s/ \[PEGAR CÓDIGO AQUÍ O DEJAR VACÍO PARA EJEMPLO\]//" "$temp_prompt"
-        sed -i '' "/• Código de $key:/ r $file_path" "$temp_prompt"
-    else
-        sed -i '' "/• Código de $key:/ s/\[PEGAR CÓDIGO AQUÍ O DEJAR VACÍO PARA EJEMPLO\]/ (archivo no encontrado)/" "$temp_prompt"
-    fi
-}
-
-# Reemplazos para cada archivo
-replace_code "$TEMP_PROMPT" "$STUDENT_DIR/operaciones.c" "operaciones.c"
-replace_code "$TEMP_PROMPT" "$STUDENT_DIR/resistencia.c" "resistencia.c"
-replace_code "$TEMP_PROMPT" "$STUDENT_DIR/conversionCmsMts.c" "conversionCmsMts.c"
-
-# Maneja variaciones de nombre para conversionSegHMS.c
-if [ -f "$STUDENT_DIR/conversionSegsHMS.c" ]; then
-    replace_code "$TEMP_PROMPT" "$STUDENT_DIR/conversionSegsHMS.c" "conversionSegHMS.c"
-elif [ -f "$STUDENT_DIR/conversionSegHMS.c" ]; then
-    replace_code "$TEMP_PROMPT" "$STUDENT_DIR/conversionSegHMS.c" "conversionSegHMS.c"
-else
-    replace_code "$TEMP_PROMPT" "" "conversionSegHMS.c"
+PROMPT_ARGS=()
+if [ "${STYLE_CHECK:-1}" = "0" ]; then
+    PROMPT_ARGS+=(--no-style)
 fi
+if ! python3 prompting.py single "$STUDENT_DIR" -p "$PROMPT_PATH" -d "$SCORES_DIR" \
+        --system "$SYSTEM_PROMPT" --user "$TEMP_PROMPT" "${PROMPT_ARGS[@]}"; then
+    echo "❌ Error: No se pudo armar el prompt"
+    rm -f "$SYSTEM_PROMPT" "$TEMP_PROMPT"
+    exit 1
+fi
+
+# Ejecutar llm con schema y guardar JSON en el directorio de artefactos
+JSON_FILE="$SCORES_DIR/${student}.json"
+
+# Schema para validación JSON (uno por estudiante, ver prompting.py)
+SCHEMA=$(python3 prompting.py schema)
 
-# Crear directorio scores si no existe
-mkdir -p scores
-
-# Ejecutar llm con schema y guardar JSON en scores/
-JSON_FILE="scores/${student}.json"
-
-# Schema para validación JSON
-SCHEMA='{
-  "type": "object",
-  "properties": {
-    "operaciones": {
-      "type": "object",
-      "properties": {
-        "calificacion": {"type": "integer", "minimum": 0, "maximum": 10},
-        "comentarios": {"type": "string", "minLength": 10}
-      },
-      "required": ["calificacion", "comentarios"]
-    },
-    "resistencia": {
-      "type": "object",
-      "properties": {
-        "calificacion": {"type": "integer", "minimum": 0, "maximum": 10},
-        "comentarios": {"type": "string", "minLength": 10}
-      },
-      "required": ["calificacion", "comentarios"]
-    },
-    "conversionCmsMts": {
-      "type": "object",
-      "properties": {
-        "calificacion": {"type": "integer", "minimum": 0, "maximum": 10},
-        "comentarios": {"type": "string", "minLength": 10}
-      },
-      "required": ["calificacion", "comentarios"]
-    },
-    "conversionSegHMS": {
-      "type": "object",
-      "properties": {
-        "calificacion": {"type": "integer", "minimum": 0, "maximum": 10},
-        "comentarios": {"type": "string", "minLength": 10}
-      },
-      "required": ["calificacion", "comentarios"]
-    },
-    "total": {"type": "number", "minimum": 0, "maximum": 40}
-  },
-  "required": ["operaciones", "resistencia", "conversionCmsMts", "conversionSegHMS", "total"]
-}'
+# Modelo y reintentos (respuestas vacías o JSON inválido)
+LLM_MODEL="${LLM_MODEL:-gpt-4o-mini}"
+LLM_RETRIES="${LLM_RETRIES:-2}"
+USAGE_OUTPUT=$(mktemp)
 
 echo "Generando calificación con schema JSON..."
-cat "$TEMP_PROMPT" | llm --schema "$SCHEMA" -m gpt-4o-mini > "$JSON_FILE"
+trace_begin "llm"
+LLM_START=$(trace_now_us)
+LLM_ATTEMPT=0
+if [ "${SCORE_SAMPLES:-1}" -gt 1 ]; then
+    # Consenso de varias muestras en paralelo (registra su propio uso de tokens)
+    python3 consensus.py sample "$student" --system "$SYSTEM_PROMPT" --user "$TEMP_PROMPT" \
+        -k "$SCORE_SAMPLES" -m "$LLM_MODEL" --student-dir "$STUDENT_DIR" -d "$SCORES_DIR" -o "$JSON_FILE"
+    LLM_STATUS=$?
+    LLM_END=$(trace_now_us)
+    rm -f "$USAGE_OUTPUT"
+    if [ $LLM_STATUS -ne 0 ]; then
+        rm -f "$JSON_FILE"
+    fi
+else
+    rm -f "$SCORES_DIR/consensus_${student}.json"
+    LLM_STDERR=$(mktemp)
+    while true; do
+        llm --schema "$SCHEMA" -m "$LLM_MODEL" -u -s "$(cat "$SYSTEM_PROMPT")" < "$TEMP_PROMPT" > "$JSON_FILE" 2> "$LLM_STDERR"
+        LLM_STATUS=$?
+        # Acumular el uso de cada intento (los fallidos también cuestan) y mostrar los errores reales de llm
+        cat "$LLM_STDERR" >> "$USAGE_OUTPUT"
+        grep -v '^Token usage:' "$LLM_STDERR" >&2
+        if [ -s "$JSON_FILE" ] && python3 -m json.tool "$JSON_FILE" > /dev/null 2>&1; then
+            break
+        fi
+        if [ $LLM_ATTEMPT -ge $LLM_RETRIES ]; then
+            break
+        fi
+        LLM_ATTEMPT=$((LLM_ATTEMPT + 1))
+        echo "⚠️  Respuesta inválida del LLM, reintento $LLM_ATTEMPT/$LLM_RETRIES..."
+    done
+    LLM_END=$(trace_now_us)
+    rm -f "$LLM_STDERR"
+
+    # Registrar tokens, latencia, reintentos y cache en scores/llm_usage_<id>.json
+    python3 llm_usage.py record "$student" --model "$LLM_MODEL" --usage-file "$USAGE_OUTPUT" \
+        --latency-ms $(( (LLM_END - LLM_START) / 1000 )) --retries $LLM_ATTEMPT \
+        --prompt "$TEMP_PROMPT" --system-prompt "$SYSTEM_PROMPT" --student-dir "$STUDENT_DIR" --response "$JSON_FILE" -o "$SCORES_DIR"
+    rm -f "$USAGE_OUTPUT"
+fi
 
 # Verificar que el JSON se generó correctamente
 if [ ! -s "$JSON_FILE" ]; then
+    trace_end "llm" 1 $(( $(trace_size "$SYSTEM_PROMPT") + $(trace_size "$TEMP_PROMPT") )) 0 "empty_response"
     echo "❌ Error: No se pudo generar el JSON de calificación"
-    rm "$TEMP_PROMPT"
+    rm -f "$SYSTEM_PROMPT" "$TEMP_PROMPT"
     exit 1
 fi
 
 # Verificar que el JSON es válido
 if ! python3 -m json.tool "$JSON_FILE" > /dev/null 2>&1; then
+    trace_end "llm" 1 $(( $(trace_size "$SYSTEM_PROMPT") + $(trace_size "$TEMP_PROMPT") )) $(trace_size "$JSON_FILE") "invalid_json"
     echo "❌ Error: El JSON generado no es válido"
     echo "Contenido del archivo:"
     cat "$JSON_FILE"
-    rm "$TEMP_PROMPT"
+    rm -f "$SYSTEM_PROMPT" "$TEMP_PROMPT"
     exit 1
 fi
 
+trace_end "llm" $LLM_STATUS $(( $(trace_size "$SYSTEM_PROMPT") + $(trace_size "$TEMP_PROMPT") )) $(trace_size "$JSON_FILE")
+
 echo "JSON generado exitosamente:"
 cat "$JSON_FILE"
 echo ""
 
-# Generar PDF estético
-echo "Generando PDF estético..."
-if [ ! -f "generate_pdf.py" ]; then
-    echo "❌ Error: generate_pdf.py no encontrado"
-    rm "$TEMP_PROMPT"
-    exit 1
-fi
+# Generar PDF estético (se omite con SCORE_SKIP_PDF=1)
+PDF_FILE="$SCORES_DIR/calificaciones_${student}.pdf"
+if [ "${SCORE_SKIP_PDF:-0}" != "1" ]; then
+    echo "Generando PDF estético..."
+    if [ ! -f "generate_pdf.py" ]; then
+        echo "❌ Error: generate_pdf.py no encontrado"
+        rm -f "$SYSTEM_PROMPT" "$TEMP_PROMPT"
+        exit 1
+    fi
 
-python3 generate_pdf.py "$JSON_FILE" -o scores/
+    python3 generate_pdf.py "$JSON_FILE" -o "$SCORES_DIR/"
 
-# Verificar que el PDF se generó
-PDF_FILE="scores/calificaciones_${student}.pdf"
-if [ -f "$PDF_FILE" ]; then
-    echo "✅ PDF generado exitosamente: $PDF_FILE"
-else
-    echo "❌ Error: No se pudo generar el PDF"
+    # Verificar que el PDF se generó
+    if [ -f "$PDF_FILE" ]; then
+        echo "✅ PDF generado exitosamente: $PDF_FILE"
+    else
+        echo "❌ Error: No se pudo generar el PDF"
+    fi
 fi
 
 # Limpiar archivo temporal
-rm "$TEMP_PROMPT"
+rm -f "$SYSTEM_PROMPT" "$TEMP_PROMPT"
+
+# Actualizar el índice de artefactos de scores/
+python3 artifacts.py index "$student"
 
 echo "🎓 Calificación completada para $student"
 echo "📄 Archivos generados:"
@@ -168,4 +178,4 @@ if [ -f "$PDF_FILE" ]; then
 fi
 echo ""
 echo "✨ Proceso completado exitosamente"
-echo "📁 Todos los archivos (JSON y PDF) se guardan en el directorio 'scores/' para fácil acceso"
\ No newline at end of file
+echo "📁 Todos los archivos (JSON y PDF) se guardan en $SCORES_DIR/ (índice en scores/.index.sqlite)"
\ No newline at end of file
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Calificación empaquetada: varios estudiantes por solicitud al LLM
+
+score.sh manda la rúbrica completa una vez por estudiante. Aquí se agrupan
+-n estudiantes por solicitud: la rúbrica va una sola vez como prompt de sistema
+(el mismo prefijo estable de prompting.py) y el mensaje del usuario lleva la
+entrega de cada estudiante bajo su ID. El schema combinado tiene una clave por
+ID; la respuesta se separa en scores/<id>.json, igual que la de score.sh.
+
+Los tokens de cada solicitud se reparten entre sus estudiantes en
+scores/llm_usage_<id>.json (la rúbrica por igual, el código según su tamaño).
+Un estudiante cuya parte de la respuesta no cumple el schema se vuelve a
+calificar solo con score.sh.
+
+Uso:
+  python3 score_pack.py                       # todos los <id>/TAREA01, 5 por solicitud
+  python3 score_pack.py msc25ahl msc25apn -n 2
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import manifest
+import tracing
+import prompting
+import workspace
+import artifacts
+import llm_usage
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def valid_scores(entry):
+    """True si la parte de un estudiante cumple el schema de score.sh"""
+    if not isinstance(entry, dict) or not isinstance(entry.get('total'), (int, float)):
+        return False
+    for exercise in llm_usage.EXERCISES:
+        result = entry.get(exercise)
+        if not isinstance(result, dict) or not isinstance(result.get('calificacion'), int) \
+                or not 0 <= result['calificacion'] <= 10 or len(str(result.get('comentarios', ''))) < 10:
+            return False
+    return True
+
+
+def call_llm(rubric, user_prompt, schema, model, retries):
+    """Solicitud con reintentos ante respuesta vacía o JSON inválido; (respuesta, uso de todos los intentos, reintentos)"""
+    cmd = ['llm', '--schema', json.dumps(schema, ensure_ascii=False), '-m', model, '-u', '-s', rubric]
+    attempt = 0
+    stderr = ''
+    while True:
+        result = subprocess.run(cmd, input=user_prompt, capture_output=True, text=True, errors='replace')
+        # Los intentos fallidos también consumen tokens: se suma el uso de todos
+        stderr += result.stderr
+        sys.stderr.write(llm_usage.error_lines(result.stderr))
+        try:
+            response = json.loads(result.stdout)
+        except json.JSONDecodeError:
+            response = None
+        if isinstance(response, dict) or attempt >= retries:
+            return response, llm_usage.parse_usage_output(stderr), attempt
+        attempt += 1
+        print(f"⚠️  Respuesta inválida del LLM, reintento {attempt}/{retries}...")
+
+
+def share_usage(usage, fraction):
+    return {key: round(usage[key] * fraction) for key in ('prompt_tokens', 'completion_tokens', 'cached_tokens')}
+
+
+def score_pack(students, rubric, template, args):
+    """Califica un paquete {id: directorio}; regresa los IDs que hay que calificar por separado"""
+    ids = list(students)
+    user_prompt = prompting.packed_prompt(template, students, args.scores_dir, not args.no_style)
+    schema = prompting.packed_schema(ids)
+    prompt_bytes = len(rubric.encode()) + len(user_prompt.encode())
+
+    started = time.time()
+    with tracing.span('llm', student=','.join(ids), bytes_in=prompt_bytes) as sp:
+        response, usage, retries = call_llm(rubric, user_prompt, schema, args.model, args.retries)
+        sp.status = 0 if response is not None else 1
+        sp.bytes_out = len(json.dumps(response or {}, ensure_ascii=False).encode())
+    latency_ms = (time.time() - started) * 1000
+
+    if response is None:
+        print(f"❌ Paquete {', '.join(ids)}: sin JSON válido tras {retries} reintentos")
+        return ids
+    if usage is None:
+        usage = {'prompt_tokens': 0, 'completion_tokens': 0, 'cached_tokens': 0, 'reported': False}
+
+    code_sizes = {student_id: llm_usage.source_sizes(student_dir) for student_id, student_dir in students.items()}
+    code_total = sum(sum(sizes.values()) for sizes in code_sizes.values())
+    static_bytes = max(0, prompt_bytes - code_total)
+    answer_lengths = {student_id: len(json.dumps(response.get(student_id) or {}, ensure_ascii=False)) for student_id in ids}
+    answer_total = sum(answer_lengths.values()) or 1
+
+    fallback = []
+    for student_id, student_dir in students.items():
+        entry = response.get(student_id)
+        if not valid_scores(entry):
+            print(f"⚠️  {student_id}: su parte de la respuesta no cumple el schema, se califica por separado")
+            fallback.append(student_id)
+            continue
+        json_file = artifacts.artifact_path(args.scores_dir, student_id, 'scores')
+        workspace.write_text(json_file, json.dumps(entry, indent=2, ensure_ascii=False))
+
+        student_bytes = static_bytes / len(ids) + sum(code_sizes[student_id].values())
+        prompt_fraction = student_bytes / prompt_bytes if prompt_bytes else 1 / len(ids)
+        student_usage = share_usage(usage, prompt_fraction)
+        student_usage['completion_tokens'] = round(usage['completion_tokens'] * answer_lengths[student_id] / answer_total)
+        student_usage['reported'] = usage.get('reported', True)
+        llm_usage.record_request(student_id, args.model, student_usage, latency_ms / len(ids), retries,
+                                 artifacts.student_dir(args.scores_dir, student_id), round(student_bytes),
+                                 code_sizes[student_id], entry, len(ids))
+        # Los parámetros con los que se calificó de verdad, no los del entorno (SCORE_SAMPLES=K no aplica aquí)
+        manifest.record_stage('score', student_id, student_dir, args.scores_dir, params={
+            'LLM_MODEL': args.model, 'STYLE_CHECK': '0' if args.no_style else '1', 'SCORE_SAMPLES': '1'})
+    print(f"✅ Paquete de {len(ids)} ({', '.join(ids)}): {usage['prompt_tokens']} tokens de entrada "
+          f"({usage['cached_tokens']} en cache), {latency_ms / 1000:.1f} s")
+    return fallback
+
+
+def score_single(student_id, scores_dir):
+    """Respaldo: score.sh para un estudiante"""
+    env = dict(os.environ, SCORE_SKIP_PDF='1', TRACE_STUDENT=student_id)
+    result = subprocess.run([os.path.join(REPO_DIR, 'score.sh'), os.path.join(student_id, 'TAREA01')],
+                            env=env, capture_output=True, text=True, errors='replace')
+    if result.returncode == 0:
+        manifest.record_stage('score', student_id, os.path.join(student_id, 'TAREA01'), scores_dir)
+    return result.returncode
+
+
+def score_students(student_ids, args):
+    """Califica en paquetes de args.pack_size con args.jobs solicitudes en paralelo; regresa los que fallaron"""
+    rubric, template = prompting.load_prompt(args.prompt)
+    os.makedirs(args.scores_dir, exist_ok=True)
+    packs = [{student_id: os.path.join(student_id, 'TAREA01') for student_id in student_ids[i:i + args.pack_size]}
+             for i in range(0, len(student_ids), args.pack_size)]
+    print(f"📦 {len(student_ids)} estudiantes en {len(packs)} solicitudes de hasta {args.pack_size}")
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        fallback = [student_id for pending in pool.map(lambda pack: score_pack(pack, rubric, template, args), packs)
+                    for student_id in pending]
+        statuses = list(pool.map(lambda student_id: score_single(student_id, args.scores_dir), fallback))
+    failed = [student_id for student_id, status in zip(fallback, statuses) if status != 0]
+    for student_id in failed:
+        print(f"❌ {student_id}: score.sh también falló")
+    return failed
+
+
+def add_arguments(parser):
+    parser.add_argument('-n', '--pack-size', type=int, default=5, help='Estudiantes por solicitud (por defecto: 5)')
+    parser.add_argument('-p', '--prompt', default='prompt.txt', help='Plantilla (por defecto: prompt.txt)')
+    parser.add_argument('-m', '--model', default=os.environ.get('LLM_MODEL', 'gpt-4o-mini'),
+                        help='Modelo (por defecto: LLM_MODEL o gpt-4o-mini)')
+    parser.add_argument('--retries', type=int, default=int(os.environ.get('LLM_RETRIES', '2')),
+                        help='Reintentos por solicitud (por defecto: LLM_RETRIES o 2)')
+    parser.add_argument('--no-style', action='store_true', default=os.environ.get('STYLE_CHECK', '1') == '0',
+                        help='No agregar los hallazgos de style_check.py')
+
+
+def options(scores_dir='scores', pack_size=5, jobs=4):
+    """Opciones por defecto (variables de entorno incluidas) para llamar a score_students desde otro módulo"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_arguments(parser)
+    args = parser.parse_args([])
+    args.scores_dir, args.pack_size, args.jobs = scores_dir, pack_size, jobs
+    return args
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Califica a varios estudiantes por solicitud al LLM')
+    parser.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los <id>/TAREA01)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-j', '--jobs', type=int, default=4, help='Solicitudes en paralelo (por defecto: 4)')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    students = args.students or sorted(os.path.basename(os.path.dirname(path.rstrip('/')))
+                                       for path in glob.glob(os.path.join('*', 'TAREA01', '')))
+    if not students:
+        print("❌ Error: no se encontraron directorios <id>/TAREA01")
+        sys.exit(1)
+    started = time.time()
+    failed = score_students(students, args)
+    print(f"🎉 {len(students)} estudiantes en {time.time() - started:.1f} s: "
+          f"{len(students) - len(failed)} ok, {len(failed)} con error")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Detección de entregas casi idénticas entre estudiantes
+
+Para cada ejercicio (<id>/TAREA01/<programa>.c) se normalizan los tokens de C
+(identificadores → ID, números → NUM, cadenas → STR, sin comentarios), se
+forman shingles de SHINGLE_SIZE tokens y se calcula una firma MinHash con
+numpy. Un índice LSH por bandas agrupa las firmas: solo los pares que caen en
+la misma cubeta de alguna banda son candidatos, así que el costo crece casi
+linealmente con el grupo en lugar de comparar todos contra todos. Para los
+candidatos se calcula la similitud de Jaccard exacta y los pares por encima
+del umbral se unen en clusters.
+
+Las firmas se guardan en scores/.similarity/<programa>.npz junto con el
+sha256 de cada archivo; en la siguiente corrida solo se calculan las de
+entregas nuevas o modificadas.
+
+Salida:
+  scores/similarity_report.json  clusters por ejercicio con sus pares
+  scores/similarity_pairs.csv    un renglón por par sospechoso
+"""
+
+import os
+import re
+import csv
+import sys
+import glob
+import json
+import zlib
+import hashlib
+import argparse
+from datetime import datetime
+from collections import defaultdict
+
+import numpy as np
+
+import tracing
+import workspace
+
+EXERCISES = ['operaciones.c', 'conversionCmsMts.c', 'conversionSegsHMS.c', 'resistencia.c']
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bandas de 8 filas: un par con Jaccard 0.8 es candidato con probabilidad ~0.95
+# y uno con 0.5 (soluciones parecidas pero independientes) solo ~0.06
+BANDS = 16
+MIN_SHINGLES = 10  # Entregas más cortas (vacías, solo plantilla) no se comparan
+
+MERSENNE_PRIME = (1 << 31) - 1
+SEED = 20250901
+
+C_KEYWORDS = {
+    'auto', 'break', 'case', 'char', 'const', 'continue', 'default', 'do', 'double', 'else', 'enum',
+    'extern', 'float', 'for', 'goto', 'if', 'int', 'long', 'register', 'return', 'short', 'signed',
+    'sizeof', 'static', 'struct', 'switch', 'typedef', 'union', 'unsigned', 'void', 'volatile', 'while',
+    # Funciones de la biblioteca estándar: forman parte de la estructura del programa
+    'printf', 'scanf', 'main', 'include', 'define', 'stdio', 'h', 'math', 'stdlib',
+}
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<number>\d+\.?\d*(?:[eE][+-]?\d+)?[fFlLuU]*|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<op><<=|>>=|->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%=<>!&|^~?:;,.()\[\]{}#])
+""", re.VERBOSE | re.DOTALL)
+
+_PERMUTATIONS = None
+
+
+def permutations():
+    """Coeficientes (a, b) de las NUM_PERM funciones hash; fijos para que el cache sea válido"""
+    global _PERMUTATIONS
+    if _PERMUTATIONS is None:
+        rng = np.random.default_rng(SEED)
+        a = rng.integers(1, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+        b = rng.integers(0, MERSENNE_PRIME, size=NUM_PERM, dtype=np.uint64)
+        _PERMUTATIONS = (a, b)
+    return _PERMUTATIONS
+
+
+def normalize_tokens(source):
+    """Tokens de C normalizados: los nombres y literales se reemplazan por su clase"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(source):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        if kind == 'string':
+            tokens.append('STR')
+        elif kind == 'number':
+            tokens.append('NUM')
+        elif kind == 'word':
+            word = match.group()
+            tokens.append(word if word in C_KEYWORDS else 'ID')
+        else:
+            tokens.append(match.group())
+    return tokens
+
+
+def shingle_hashes(source):
+    """Hashes de 31 bits de los shingles de tokens (sin repetidos)"""
+    tokens = normalize_tokens(source)
+    if len(tokens) < SHINGLE_SIZE:
+        return np.zeros(0, dtype=np.uint64)
+    shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = [zlib.crc32(shingle.encode('utf-8')) & MERSENNE_PRIME for shingle in shingles]
+    return np.unique(np.array(hashes, dtype=np.uint64))
+
+
+def minhash_signature(hashes):
+    """Firma MinHash de NUM_PERM valores; (a·x + b) mod p cabe en uint64 porque a, x < 2^31"""
+    a, b = permutations()
+    if len(hashes) == 0:
+        return np.full(NUM_PERM, MERSENNE_PRIME, dtype=np.uint64)
+    values = (a[:, None] * hashes[None, :] + b[:, None]) % MERSENNE_PRIME
+    return values.min(axis=1)
+
+
+def jaccard(hashes_a, hashes_b):
+    """Similitud de Jaccard exacta entre dos conjuntos de shingles"""
+    if len(hashes_a) == 0 or len(hashes_b) == 0:
+        return 0.0
+    intersection = len(np.intersect1d(hashes_a, hashes_b, assume_unique=True))
+    return intersection / (len(hashes_a) + len(hashes_b) - intersection)
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def read_source(path):
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read()
+
+
+def find_submissions(exercise, base_dir='.', students=None):
+    """{student_id: ruta} de las entregas de un ejercicio"""
+    submissions = {}
+    for path in sorted(glob.glob(os.path.join(base_dir, '*', 'TAREA01', exercise))):
+        student_id = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        if not students or student_id in students:
+            submissions[student_id] = path
+    return submissions
+
+
+def cache_path(scores_dir, exercise):
+    return os.path.join(scores_dir, '.similarity', exercise.replace('.c', '') + '.npz')
+
+
+def load_cache(scores_dir, exercise):
+    """{student_id: (sha256, shingles, firma)} de la corrida anterior"""
+    path = cache_path(scores_dir, exercise)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path) as data:
+            if data['signatures'].shape[1:] != (NUM_PERM,) or int(data['shingle_size']) != SHINGLE_SIZE:
+                return {}
+            return {str(student): (str(digest), int(count), signature)
+                    for student, digest, count, signature
+                    in zip(data['students'], data['digests'], data['shingle_counts'], data['signatures'])}
+    except Exception as e:
+        print(f"⚠️  Cache de firmas ilegible ({path}): {e}")
+        return {}
+
+
+def save_cache(scores_dir, exercise, entries):
+    students = sorted(entries)
+    with workspace.scratch_dir('similarity') as work_dir:
+        scratch_file = os.path.join(work_dir, 'cache.npz')
+        np.savez(scratch_file,
+                 students=np.array(students, dtype=str),
+                 digests=np.array([entries[s][0] for s in students], dtype=str),
+                 shingle_counts=np.array([entries[s][1] for s in students], dtype=np.int64),
+                 signatures=np.array([entries[s][2] for s in students], dtype=np.uint64).reshape(-1, NUM_PERM),
+                 shingle_size=SHINGLE_SIZE)
+        workspace.publish(scratch_file, cache_path(scores_dir, exercise))
+
+
+def update_signatures(submissions, cached):
+    """Firmas de todas las entregas; solo se recalculan las nuevas o modificadas"""
+    entries = {}
+    computed = 0
+    for student_id, path in submissions.items():
+        digest = file_digest(path)
+        previous = cached.get(student_id)
+        if previous and previous[0] == digest:
+            entries[student_id] = previous
+            continue
+        hashes = shingle_hashes(read_source(path))
+        entries[student_id] = (digest, len(hashes), minhash_signature(hashes))
+        computed += 1
+    return entries, computed
+
+
+def lsh_candidates(entries, bands=BANDS):
+    """Pares (a, b) que comparten la cubeta de al menos una banda"""
+    rows = NUM_PERM // bands
+    students = sorted(s for s, entry in entries.items() if entry[1] >= MIN_SHINGLES)
+    if len(students) < 2:
+        return set()
+    signatures = np.array([entries[s][2] for s in students], dtype=np.uint64)
+    candidates = set()
+    for band in range(bands):
+        buckets = defaultdict(list)
+        band_rows = signatures[:, band * rows:(band + 1) * rows]
+        for index, key in enumerate(map(bytes, band_rows)):
+            buckets[key].append(index)
+        for members in buckets.values():
+            if len(members) > 1:
+                for i, first in enumerate(members):
+                    for second in members[i + 1:]:
+                        candidates.add((students[first], students[second]))
+    return candidates
+
+
+def verify_candidates(candidates, submissions, threshold):
+    """[(a, b, jaccard)] de los candidatos con similitud exacta >= threshold"""
+    shingles = {}
+
+    def shingles_of(student_id):
+        if student_id not in shingles:
+            shingles[student_id] = shingle_hashes(read_source(submissions[student_id]))
+        return shingles[student_id]
+
+    pairs = []
+    for first, second in sorted(candidates):
+        similarity = jaccard(shingles_of(first), shingles_of(second))
+        if similarity >= threshold:
+            pairs.append((first, second, round(similarity, 4)))
+    return pairs
+
+
+def build_clusters(pairs):
+    """Componentes conexas de los pares sospechosos (union-find)"""
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for first, second, _ in pairs:
+        parent[find(first)] = find(second)
+
+    groups = defaultdict(list)
+    for node in list(parent):
+        groups[find(node)].append(node)
+
+    clusters = []
+    for members in groups.values():
+        member_set = set(members)
+        cluster_pairs = [p for p in pairs if p[0] in member_set]
+        clusters.append({
+            'students': sorted(members),
+            'max_similarity': max(p[2] for p in cluster_pairs),
+            'pairs': [{'student_a': a, 'student_b': b, 'jaccard': s} for a, b, s in cluster_pairs],
+        })
+    clusters.sort(key=lambda c: (-len(c['students']), -c['max_similarity']))
+    return clusters
+
+
+def analyze_exercise(exercise, base_dir, scores_dir, threshold, students=None):
+    """Firmas, candidatos LSH, similitud exacta y clusters de un ejercicio"""
+    submissions = find_submissions(exercise, base_dir, students)
+    cached = load_cache(scores_dir, exercise)
+    entries, computed = update_signatures(submissions, cached)
+    # Con un subconjunto de estudiantes se conservan las firmas del resto
+    save_cache(scores_dir, exercise, {**cached, **entries} if students else entries)
+
+    candidates = lsh_candidates(entries)
+    pairs = verify_candidates(candidates, submissions, threshold)
+    return {
+        'submissions': len(submissions),
+        'signatures_computed': computed,
+        'too_short': sum(1 for entry in entries.values() if entry[1] < MIN_SHINGLES),
+        'candidates': len(candidates),
+        'pairs': len(pairs),
+        'clusters': build_clusters(pairs),
+    }
+
+
+def write_similarity_report(base_dir='.', scores_dir='scores', threshold=0.8, students=None):
+    """Analiza todos los ejercicios y escribe el reporte JSON y el CSV de pares"""
+    os.makedirs(scores_dir, exist_ok=True)
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'threshold': threshold,
+        'shingle_size': SHINGLE_SIZE,
+        'num_perm': NUM_PERM,
+        'bands': BANDS,
+        'exercises': {},
+    }
+    rows = []
+    for exercise in EXERCISES:
+        with tracing.span('similarity', student='_cohort'):
+            result = analyze_exercise(exercise, base_dir, scores_dir, threshold, students)
+        report['exercises'][exercise] = result
+        for number, cluster in enumerate(result['clusters'], 1):
+            for pair in cluster['pairs']:
+                rows.append([exercise, number, pair['student_a'], pair['student_b'], pair['jaccard']])
+        print(f"🔎 {exercise}: {result['submissions']} entregas "
+              f"({result['signatures_computed']} firmas nuevas), {result['candidates']} candidatos, "
+              f"{result['pairs']} pares ≥ {threshold:.2f} en {len(result['clusters'])} clusters")
+
+    json_file = os.path.join(scores_dir, 'similarity_report.json')
+    workspace.write_text(json_file, json.dumps(report, indent=2, ensure_ascii=False))
+
+    lines = [['Exercise', 'Cluster', 'Student_A', 'Student_B', 'Jaccard']] + rows
+    with workspace.scratch_dir('similarity') as work_dir:
+        scratch_csv = os.path.join(work_dir, 'pairs.csv')
+        with open(scratch_csv, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(lines)
+        csv_file = workspace.publish(scratch_csv, os.path.join(scores_dir, 'similarity_pairs.csv'))
+
+    print(f"✅ Reporte de similitud: {json_file}")
+    print(f"✅ Pares sospechosos: {csv_file}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detecta entregas casi idénticas entre estudiantes (MinHash + LSH)')
+    parser.add_argument('students', nargs='*', help='IDs de estudiantes (por defecto: todos los <id>/TAREA01)')
+    parser.add_argument('-b', '--base-dir', default='.', help='Directorio con los <id>/TAREA01 (por defecto: .)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-t', '--threshold', type=float, default=0.8,
+                        help='Similitud de Jaccard mínima para reportar un par (por defecto: 0.8)')
+    args = parser.parse_args()
+
+    if not 0 < args.threshold <= 1:
+        print("❌ Error: el umbral debe estar entre 0 y 1")
+        sys.exit(1)
+
+    write_similarity_report(args.base_dir, args.scores_dir, args.threshold, set(args.students))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Analizador de estilo determinista para los criterios ESTILO de prompt.txt
+
+Tokeniza cada archivo C del estudiante y revisa, sin el LLM:
+  • fscanf/fprintf en lugar de scanf/printf
+  • int main() como función principal
+  • prototipos de funciones al principio
+  • variables declaradas al inicio de cada función
+  • comentarios descriptivos
+  • indentación consistente
+  • constante descriptiva para π
+
+Los hallazgos se insertan en el prompt en forma compacta (el modelo ya no
+tiene que redescubrirlos y sus comentarios de estilo son iguales para todo el
+grupo) y se guardan en scores/style_<id>.json para el reporte. Los tipos de
+datos apropiados siguen a cargo del LLM.
+
+Uso:
+  python3 style_check.py msc25ahl/TAREA01                       # hallazgos en pantalla
+  python3 style_check.py msc25ahl/TAREA01 --insert-into prompt  # bloque en el prompt
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+from collections import Counter, namedtuple
+
+import workspace
+import artifacts
+
+# Clave del JSON del LLM → nombres de archivo aceptados (como score.sh)
+EXERCISE_FILES = {
+    'operaciones': ['operaciones.c'],
+    'resistencia': ['resistencia.c'],
+    'conversionCmsMts': ['conversionCmsMts.c'],
+    'conversionSegHMS': ['conversionSegsHMS.c', 'conversionSegHMS.c'],
+}
+
+# Criterio → (etiqueta corta para el prompt, comentario de la rúbrica)
+CHECKS = {
+    'io': ('fscanf/fprintf', 'Considera usar fscanf/fprintf para prepararte para trabajar con archivos'),
+    'int_main': ('int main()', 'Usa int main() como función principal'),
+    'prototypes': ('prototipos al inicio', 'Define los prototipos de funciones al inicio del código'),
+    'declarations': ('variables al inicio', 'Declara todas las variables al inicio de cada función'),
+    'comments': ('comentarios', 'Agrega comentarios para explicar la lógica del código'),
+    'indentation': ('indentación', 'Mantén una indentación uniforme en todo el código'),
+    'pi_constant': ('constante para π', 'Usar constantes para valores como π mejora la legibilidad del código'),
+}
+
+# Marcador del prompt antes del cual se inserta el bloque de estilo
+PROMPT_ANCHOR = 'Ahora, califica las siguientes entregas'
+
+TYPE_WORDS = {'int', 'float', 'double', 'char', 'long', 'short', 'unsigned', 'signed', 'const', 'static',
+              'struct', 'enum', 'bool', 'size_t', 'FILE'}
+CONTROL_WORDS = {'if', 'for', 'while', 'switch', 'return', 'sizeof', 'do', 'else'}
+PI_LITERAL = re.compile(r'^3\.14\d*[fFlL]?$')
+TAB_WIDTH = 4
+INDENT_TOLERANCE = 0.9
+
+Token = namedtuple('Token', 'kind text line')
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<preprocessor>\#[^\n]*(?:\\\n[^\n]*)*)
+  | (?P<string>"(?:\\.|[^"\\\n])*"?)
+  | (?P<char>'(?:\\.|[^'\\\n])*'?)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[fFlLuU]*)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<op><<=|>>=|->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%=<>!&|^~?:;,.()\[\]{}])
+  | (?P<space>\s+)
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+
+def tokenize(source):
+    """Tokens de C con número de línea (sin espacios)"""
+    tokens = []
+    line = 1
+    for match in TOKEN_PATTERN.finditer(source):
+        kind = match.lastgroup
+        text = match.group()
+        if kind != 'space':
+            tokens.append(Token(kind, text, line))
+        line += text.count('\n')
+    return tokens
+
+
+def find_functions(tokens):
+    """Definiciones y prototipos de nivel superior
+
+    Regresa (definiciones, prototipos); cada definición es un dict con name,
+    return_type, line, body (índices de '{' y '}' en tokens).
+    """
+    code = [i for i, t in enumerate(tokens) if t.kind not in ('comment', 'preprocessor')]
+    definitions, prototypes = [], {}
+    depth = 0
+    position = 0
+    while position < len(code):
+        token = tokens[code[position]]
+        if token.text == '{':
+            depth += 1
+        elif token.text == '}':
+            depth -= 1
+        elif depth == 0 and token.kind == 'word' and token.text not in CONTROL_WORDS \
+                and position + 1 < len(code) and tokens[code[position + 1]].text == '(':
+            # Saltar la lista de parámetros
+            close = position + 1
+            parens = 0
+            while close < len(code):
+                text = tokens[code[close]].text
+                parens += (text == '(') - (text == ')')
+                if parens == 0:
+                    break
+                close += 1
+            after = tokens[code[close + 1]].text if close + 1 < len(code) else ''
+            # Tipo de retorno: palabras inmediatamente antes del nombre en la misma declaración
+            start = position - 1
+            while start >= 0 and (tokens[code[start]].kind == 'word' or tokens[code[start]].text == '*'):
+                start -= 1
+            return_type = ' '.join(tokens[code[i]].text for i in range(start + 1, position))
+            if after == '{':
+                open_index = code[close + 1]
+                level = 0
+                end = close + 1
+                while end < len(code):
+                    text = tokens[code[end]].text
+                    level += (text == '{') - (text == '}')
+                    if level == 0:
+                        break
+                    end += 1
+                definitions.append({'name': token.text, 'return_type': return_type, 'line': token.line,
+                                    'body': (open_index, code[min(end, len(code) - 1)])})
+                position = end + 1
+                continue
+            if after == ';':
+                prototypes.setdefault(token.text, token.line)
+            position = close + 1
+            continue
+        position += 1
+    return definitions, prototypes
+
+
+def check_io(tokens):
+    words = Counter(t.text for t in tokens if t.kind == 'word')
+    plain = [name for name in ('scanf', 'printf') if words[name]]
+    explicit = [name for name in ('fscanf', 'fprintf') if words[name]]
+    if not plain and not explicit:
+        return None, 'sin entrada/salida'
+    if plain:
+        return False, f"usa {', '.join(plain)}"
+    return True, ', '.join(explicit)
+
+
+def check_int_main(definitions):
+    main = next((d for d in definitions if d['name'] == 'main'), None)
+    if main is None:
+        return False, 'no se encontró main'
+    if 'int' in main['return_type'].split():
+        return True, f"línea {main['line']}"
+    return False, f"main declarada como '{main['return_type'] or 'sin tipo'}' (línea {main['line']})"
+
+
+def check_prototypes(definitions, prototypes):
+    functions = [d for d in definitions if d['name'] != 'main']
+    if not functions:
+        return None, 'sin funciones auxiliares'
+    main = next((d for d in definitions if d['name'] == 'main'), None)
+    first_body = min(d['line'] for d in definitions)
+    missing = [d['name'] for d in functions
+               if d['name'] not in prototypes or prototypes[d['name']] > first_body]
+    if missing:
+        where = ' antes de main' if main else ''
+        return False, f"sin prototipo{where}: {', '.join(missing)}"
+    return True, f"{len(functions)} funciones"
+
+
+def check_declarations(tokens, definitions):
+    late = []
+    for definition in definitions:
+        open_index, close_index = definition['body']
+        depth = 0
+        statement_start = True
+        seen_statement = False
+        for token in tokens[open_index + 1:close_index]:
+            if token.kind in ('comment', 'preprocessor'):
+                continue
+            if token.text == '{':
+                depth += 1
+                statement_start = True
+                seen_statement = True
+                continue
+            if token.text == '}':
+                depth -= 1
+                statement_start = True
+                continue
+            if depth == 0 and statement_start:
+                is_declaration = token.kind == 'word' and token.text in TYPE_WORDS
+                if is_declaration and seen_statement:
+                    late.append(f"{definition['name']}:{token.line}")
+                elif not is_declaration:
+                    seen_statement = True
+                statement_start = False
+            if depth == 0 and token.text == ';':
+                statement_start = True
+    if late:
+        return False, f"declaraciones después de instrucciones ({', '.join(late[:4])})"
+    return True, 'al inicio'
+
+
+def check_comments(tokens):
+    comments = sum(1 for t in tokens if t.kind == 'comment')
+    code_lines = len({t.line for t in tokens if t.kind != 'comment'})
+    needed = max(1, code_lines // 25)
+    if comments >= needed:
+        return True, f"{comments} comentarios en {code_lines} líneas"
+    return False, f"{comments} comentarios en {code_lines} líneas"
+
+
+def check_indentation(source, tokens):
+    """Sangría proporcional a la profundidad de llaves (se tolera un nivel extra, p. ej. if sin llaves)"""
+    lines = source.split('\n')
+    depth_at_line = {}
+    first_token_at_line = {}
+    skip_lines = set()
+    depth = 0
+    parens = 0
+    for token in tokens:
+        if token.line not in depth_at_line:
+            depth_at_line[token.line] = depth
+            first_token_at_line[token.line] = token
+            if parens > 0:
+                skip_lines.add(token.line)
+        if token.kind in ('comment', 'string') and '\n' in token.text:
+            skip_lines.update(range(token.line + 1, token.line + token.text.count('\n') + 1))
+        if token.kind == 'preprocessor':
+            skip_lines.add(token.line)
+        if token.text == '{':
+            depth += 1
+        elif token.text == '}':
+            depth = max(0, depth - 1)
+        elif token.text == '(':
+            parens += 1
+        elif token.text == ')':
+            parens = max(0, parens - 1)
+
+    uses_tabs = uses_spaces = False
+    samples = []
+    for number, depth in depth_at_line.items():
+        if number in skip_lines or number > len(lines):
+            continue
+        text = lines[number - 1]
+        leading = text[:len(text) - len(text.lstrip(' \t'))]
+        uses_tabs |= '\t' in leading
+        uses_spaces |= ' ' in leading
+        if first_token_at_line[number].text == '}':
+            depth = max(0, depth - 1)
+        samples.append((depth, len(leading.expandtabs(TAB_WIDTH))))
+
+    units = Counter(width // depth for depth, width in samples if depth > 0 and width % depth == 0 and width)
+    unit = units.most_common(1)[0][0] if units else TAB_WIDTH
+    consistent = sum(1 for depth, width in samples if width in (depth * unit, (depth + 1) * unit))
+    ratio = consistent / len(samples) if samples else 1.0
+    detail = f"{ratio * 100:.0f}% de líneas con sangría de {unit}"
+    if uses_tabs and uses_spaces:
+        return False, detail + ', mezcla tabuladores y espacios'
+    return ratio >= INDENT_TOLERANCE, detail
+
+
+def check_pi_constant(tokens, exercise):
+    words = {t.text for t in tokens if t.kind == 'word'}
+    literals = [t for t in tokens if t.kind == 'number' and PI_LITERAL.match(t.text)]
+    named = any(t.kind == 'preprocessor' and re.search(r'#\s*define\s+\w+\s+3\.14', t.text) for t in tokens)
+    named = named or 'M_PI' in words
+    # Una declaración const double PI = 3.1416; también es una constante con nombre
+    for i, token in enumerate(tokens):
+        if token in literals and i >= 3 and tokens[i - 1].text == '=' and \
+                any(t.text == 'const' for t in tokens[max(0, i - 5):i]):
+            literals.remove(token)
+            named = True
+    if literals:
+        lines = ', '.join(str(t.line) for t in literals[:3])
+        return False, f"π escrito como número en la línea {lines}"
+    if named:
+        return True, 'constante con nombre'
+    if exercise == 'resistencia':
+        return None, 'no se encontró π'
+    return None, 'no aplica'
+
+
+def analyze_source(source, exercise):
+    """{criterio: {'ok', 'detail'}}; ok es None cuando el criterio no aplica"""
+    tokens = tokenize(source)
+    definitions, prototypes = find_functions(tokens)
+    results = {
+        'io': check_io(tokens),
+        'int_main': check_int_main(definitions),
+        'prototypes': check_prototypes(definitions, prototypes),
+        'declarations': check_declarations(tokens, definitions),
+        'comments': check_comments(tokens),
+        'indentation': check_indentation(source, tokens),
+        'pi_constant': check_pi_constant(tokens, exercise),
+    }
+    return {name: {'ok': ok, 'detail': detail} for name, (ok, detail) in results.items()}
+
+
+def analyze_student(student_dir):
+    """{clave del ejercicio: {'file', 'checks'}} para los archivos presentes"""
+    report = {}
+    for exercise, names in EXERCISE_FILES.items():
+        path = next((os.path.join(student_dir, n) for n in names if os.path.exists(os.path.join(student_dir, n))), None)
+        if path is None:
+            continue
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            source = f.read()
+        if not source.strip():
+            continue
+        report[exercise] = {'file': os.path.basename(path), 'checks': analyze_source(source, exercise)}
+    return report
+
+
+def format_prompt_block(report):
+    """Bloque compacto para el prompt: una línea por ejercicio"""
+    lines = ["ANÁLISIS DE ESTILO AUTOMÁTICO (verificado con un analizador estático; no vuelvas a revisar "
+             "estos criterios: usa estos hallazgos tal cual en los comentarios de estilo y dedica el análisis "
+             "a funcionalidad, lógica y tipos de datos):"]
+    for exercise, entry in report.items():
+        marks = []
+        for name, result in entry['checks'].items():
+            if result['ok'] is None:
+                continue
+            label = CHECKS[name][0]
+            marks.append(f"✔ {label}" if result['ok'] else f"✘ {label} ({result['detail']})")
+        lines.append(f"• {entry['file']}: {'; '.join(marks)}")
+    return '\n'.join(lines) + '\n'
+
+
+def insert_into_prompt(prompt_file, block):
+    """Inserta el bloque antes de la lista de entregas del prompt (o al final si no está el marcador)"""
+    with open(prompt_file, 'r', encoding='utf-8') as f:
+        prompt = f.read()
+    index = prompt.find(PROMPT_ANCHOR)
+    if index < 0:
+        prompt = prompt.rstrip('\n') + '\n\n' + block
+    else:
+        prompt = prompt[:index] + block + '\n' + prompt[index:]
+    workspace.write_text(prompt_file, prompt)
+
+
+def load_style(scores_dir, student_id):
+    """Hallazgos guardados de un estudiante, o None"""
+    path = os.path.join(scores_dir, f"style_{student_id}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Revisa los criterios de estilo de la rúbrica sin usar el LLM')
+    parser.add_argument('student_dir', help='Directorio del estudiante (ej: msc25ahl/TAREA01)')
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('--insert-into', metavar='PROMPT', help='Insertar el bloque de hallazgos en este archivo de prompt')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.student_dir):
+        print(f"❌ Error: no existe el directorio {args.student_dir}")
+        sys.exit(1)
+
+    student_id = os.path.basename(os.path.dirname(os.path.abspath(args.student_dir)))
+    report = analyze_student(args.student_dir)
+    output_file = artifacts.artifact_path(args.scores_dir, student_id, 'style')
+    workspace.write_text(output_file, json.dumps(report, indent=2, ensure_ascii=False))
+    artifacts.index_student(args.scores_dir, student_id)
+
+    block = format_prompt_block(report)
+    if args.insert_into:
+        insert_into_prompt(args.insert_into, block)
+        print(f"✅ Hallazgos de estilo agregados al prompt ({len(report)} archivos): {output_file}")
+    else:
+        print(block)
+
+
+if __name__ == "__main__":
+    main()
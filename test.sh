@@ -1,14 +1,27 @@
 #!/bin/bash
 
 # Test Suite for C Programs - Per Directory Execution
-# Usage: ./test.sh <student_directory> -o <output_csv_file>
+# Usage: ./test.sh <student_directory> -o <output_csv_file> [--replay <corpus.tar.gz>]
 # Example: ./test.sh msc25ahl/TAREA01 -o scores/msc25ahl.csv
+#
+# Every run archives the raw output of each test case (keyed by program and
+# input) in <output_dir>/.corpus/<student_id>.tar.gz. With --replay the
+# programs are neither compiled nor executed: the archived outputs are fed
+# through the current matchers, so a matcher change can be re-scored over the
+# whole cohort (see replay.py). A replay still runs the grep-based matchers for
+# every case; it only skips gcc and the student programs. TEST_CORPUS=0
+# disables archiving.
+#
+# TEST_PROGRAMS="operaciones.c resistencia.c" compiles and runs only the listed
+# programs; the others are re-scored from the existing corpus, as in a replay
+# (used after a resubmission that touched a single exercise, see watch.py).
+# Without a corpus every program is run.
 
 # Parse command line arguments
 if [ $# -lt 3 ] || [ "$2" != "-o" ]; then
     echo "🎓 C Program Test Suite"
     echo ""
-    echo "Usage: $0 <student_directory> -o <output_csv_file>"
+    echo "Usage: $0 <student_directory> -o <output_csv_file> [--replay <corpus.tar.gz>]"
     echo ""
     echo "Examples:"
     echo "  $0 msc25ahl/TAREA01 -o scores/msc25ahl.csv"
@@ -22,9 +35,21 @@ fi
 STUDENT_DIR="$1"
 OUTPUT_CSV="$3"
 STUDENT_ID=$(basename "$(dirname "$STUDENT_DIR")")
+REPLAY_CORPUS=""
+if [ "$4" = "--replay" ]; then
+    REPLAY_CORPUS="$5"
+    if [ ! -f "$REPLAY_CORPUS" ]; then
+        echo "❌ Error: Corpus $REPLAY_CORPUS not found"
+        exit 1
+    fi
+fi
+
+source "$(dirname "$0")/tracing.sh"
+export TRACE_STUDENT="${TRACE_STUDENT:-$STUDENT_ID}"
+source "$(dirname "$0")/workspace.sh"
 
-# Verify directory exists
-if [ ! -d "$STUDENT_DIR" ]; then
+# Verify directory exists (a replay only needs the corpus)
+if [ -z "$REPLAY_CORPUS" ] && [ ! -d "$STUDENT_DIR" ]; then
     echo "❌ Error: Directory $STUDENT_DIR not found"
     exit 1
 fi
@@ -32,6 +57,28 @@ fi
 # Create output directory if it doesn't exist
 mkdir -p "$(dirname "$OUTPUT_CSV")"
 
+# Executables and the CSV under construction live in a scratch directory
+# (GRADER_SCRATCH, /dev/shm or TMPDIR); the CSV is published atomically at the end
+WORK_DIR=$(workspace_dir test) || exit 1
+trap 'rm -rf "$WORK_DIR"' EXIT
+FINAL_CSV="$OUTPUT_CSV"
+OUTPUT_CSV="$WORK_DIR/results.csv"
+
+# Output corpus: <program>/compile.status|compile.out and <program>/<key>.in|.out|.status
+CORPUS_DIR="$WORK_DIR/corpus"
+CORPUS_FILE="$(dirname "$FINAL_CSV")/.corpus/$STUDENT_ID.tar.gz"
+mkdir -p "$CORPUS_DIR"
+if [ -n "$REPLAY_CORPUS" ]; then
+    tar -xzf "$REPLAY_CORPUS" -C "$CORPUS_DIR" || exit 1
+elif [ -n "$TEST_PROGRAMS" ]; then
+    if [ ! -f "$CORPUS_FILE" ] || ! tar -xzf "$CORPUS_FILE" -C "$CORPUS_DIR"; then
+        rm -rf "$CORPUS_DIR" && mkdir -p "$CORPUS_DIR"
+        TEST_PROGRAMS=""
+    fi
+fi
+CURRENT_PROGRAM=""
+REPLAYING=false
+
 # Initialize CSV file with headers
 echo "Student_ID,Program_Name,Test_Type,Input_Values,Expected_Result,Actual_Result,Test_Status,Compilation_Status,Error_Details,Test_Score,Notes" > "$OUTPUT_CSV"
 
@@ -80,15 +127,84 @@ extract_number() {
     return 1
 }
 
+# Limits for each test execution (infinite loops, endless output)
+TEST_TIMEOUT="${TEST_TIMEOUT:-5}"
+TEST_MAX_OUTPUT="${TEST_MAX_OUTPUT:-65536}"
+TIMEOUT_BIN=$(command -v timeout || command -v gtimeout)
+
+# Corpus key of a test input: checksum and length of the printf format
+corpus_key() {
+    printf '%s' "$1" | cksum | awk '{print $1 "_" $2}'
+}
+
+# Run one test case: feeds printf-formatted input to the executable
+# and leaves its combined stdout/stderr in RUN_OUTPUT
+run_test_case() {
+    local executable_path="$1"
+    local input_format="$2"
+    local run_status
+    local reason=""
+    local case_file="$CORPUS_DIR/$CURRENT_PROGRAM/$(corpus_key "$input_format")"
+    
+    trace_begin "run"
+    if [ "$REPLAYING" = true ]; then
+        if [ -f "$case_file.out" ]; then
+            RUN_OUTPUT=$(cat "$case_file.out")
+            (exit "$(cat "$case_file.status")")
+        else
+            RUN_OUTPUT="[REPLAY: no archived output for this input]"
+            false
+        fi
+    elif [ -n "$TIMEOUT_BIN" ]; then
+        RUN_OUTPUT=$(printf "$input_format" | "$TIMEOUT_BIN" -k 1 "$TEST_TIMEOUT" "$executable_path" 2>&1 | head -c "$TEST_MAX_OUTPUT"; exit ${PIPESTATUS[1]})
+    else
+        RUN_OUTPUT=$(printf "$input_format" | "$executable_path" 2>&1 | head -c "$TEST_MAX_OUTPUT"; exit ${PIPESTATUS[1]})
+    fi
+    run_status=$?
+    if [ "$REPLAYING" = false ] && [ "$TEST_CORPUS" != "0" ]; then
+        printf '%s' "$input_format" > "$case_file.in"
+        printf '%s' "$RUN_OUTPUT" > "$case_file.out"
+        echo "$run_status" > "$case_file.status"
+    fi
+    if [ $run_status -eq 124 ] || [ $run_status -eq 137 ]; then
+        reason="timeout"
+        RUN_OUTPUT="$RUN_OUTPUT
+[TIMEOUT: program exceeded ${TEST_TIMEOUT}s]"
+    fi
+    trace_end "run" $run_status ${#input_format} ${#RUN_OUTPUT} "$reason"
+    return $run_status
+}
+
 # Function to test a single program
 test_program() {
     local program_file="$1"
     local program_name="$2"
     
     log "Testing $program_name for student $STUDENT_ID"
+    CURRENT_PROGRAM="$program_name"
+    local program_corpus="$CORPUS_DIR/$program_name"
+    
+    # Replay the whole corpus, or the programs left out of TEST_PROGRAMS
+    REPLAYING=false
+    if [ -n "$REPLAY_CORPUS" ]; then
+        REPLAYING=true
+    elif [ -n "$TEST_PROGRAMS" ] && [[ " $TEST_PROGRAMS " != *" $program_name "* ]]; then
+        REPLAYING=true
+        log "⏭️  $program_name unchanged, re-scoring archived outputs"
+    else
+        rm -rf "$program_corpus"
+    fi
+    mkdir -p "$program_corpus"
     
-    # Check if file exists
-    if [ ! -f "$program_file" ]; then
+    # Check if file exists (in a replay, whether it existed when archived)
+    local file_missing=false
+    if [ "$REPLAYING" = true ]; then
+        [ "$(cat "$program_corpus/compile.status" 2>/dev/null)" = "missing" ] && file_missing=true
+    elif [ ! -f "$program_file" ]; then
+        file_missing=true
+        echo "missing" > "$program_corpus/compile.status"
+    fi
+    if [ "$file_missing" = true ]; then
         log "❌ File $program_name not found for $STUDENT_ID"
         echo "$STUDENT_ID,$program_name,FILE_NOT_FOUND,N/A,N/A,N/A,FAIL,NO_FILE,File not found,0,Missing program file" >> "$OUTPUT_CSV"
         return 1
@@ -99,8 +215,21 @@ test_program() {
     local compile_output
     local compile_status
     
-    compile_output=$(gcc -o "$STUDENT_DIR/$executable" "$program_file" 2>&1)
-    compile_status=$?
+    if [ "$REPLAYING" = true ]; then
+        compile_output=$(cat "$program_corpus/compile.out" 2>/dev/null)
+        compile_status=$(cat "$program_corpus/compile.status" 2>/dev/null || echo 1)
+    else
+        trace_begin "gcc"
+        compile_output=$(gcc -o "$WORK_DIR/$executable" "$program_file" 2>&1)
+        compile_status=$?
+        if [ $compile_status -ne 0 ]; then
+            trace_end "gcc" $compile_status $(trace_size "$program_file") 0 "COMPILE_ERROR"
+        else
+            trace_end "gcc" 0 $(trace_size "$program_file") $(trace_size "$WORK_DIR/$executable")
+        fi
+        echo "$compile_status" > "$program_corpus/compile.status"
+        printf '%s' "$compile_output" > "$program_corpus/compile.out"
+    fi
     
     if [ $compile_status -ne 0 ]; then
         log "❌ Compilation failed for $program_name ($STUDENT_ID)"
@@ -115,16 +244,16 @@ test_program() {
     # Define test cases based on program type
     case "$program_name" in
         "operaciones.c")
-            test_operaciones "$STUDENT_DIR" "$executable"
+            test_operaciones "$WORK_DIR" "$executable"
             ;;
         "conversionCmsMts.c")
-            test_conversion_cms_mts "$STUDENT_DIR" "$executable"
+            test_conversion_cms_mts "$WORK_DIR" "$executable"
             ;;
         "conversionSegsHMS.c")
-            test_conversion_segs_hms "$STUDENT_DIR" "$executable"
+            test_conversion_segs_hms "$WORK_DIR" "$executable"
             ;;
         "resistencia.c")
-            test_resistencia "$STUDENT_DIR" "$executable"
+            test_resistencia "$WORK_DIR" "$executable"
             ;;
         *)
             log "⚠️  Unknown program type: $program_name"
@@ -133,7 +262,7 @@ test_program() {
     esac
     
     # Clean up executable
-    rm -f "$STUDENT_DIR/$executable"
+    rm -f "$WORK_DIR/$executable"
 }
 
 # Enhanced test function for operaciones.c
@@ -154,7 +283,8 @@ test_operaciones() {
         local input="a=$a, b=$b"
         local expected_output="Suma: $expected_sum, Resta: $expected_rest, Multiplicacion: $expected_mult, Division: $expected_div, Residuo: $expected_mod"
         
-        local actual_output=$(printf "$a\n$b" | "$student_dir/$executable" 2>&1)
+        run_test_case "$student_dir/$executable" "$a\n$b"
+        local actual_output="$RUN_OUTPUT"
         local status="PASS"
         local score=10
         local notes="All operations correct"
@@ -224,7 +354,8 @@ test_conversion_cms_mts() {
         IFS=':' read -r input expected_m expected_c description <<< "$test_case"
         local expected_output="Equivalente: $expected_m metros y $expected_c cm"
         
-        local actual_output=$(echo "$input" | "$student_dir/$executable" 2>&1)
+        run_test_case "$student_dir/$executable" "$input\n"
+        local actual_output="$RUN_OUTPUT"
         local status="PASS"
         local score=10
         local notes="Conversion correct"
@@ -271,7 +402,8 @@ test_conversion_segs_hms() {
         IFS=':' read -r input expected_h expected_m expected_s description <<< "$test_case"
         local expected_output="Horas: $expected_h, Minutos: $expected_m, Segundos: $expected_s"
         
-        local actual_output=$(echo "$input" | "$student_dir/$executable" 2>&1)
+        run_test_case "$student_dir/$executable" "$input\n"
+        local actual_output="$RUN_OUTPUT"
         local status="PASS"
         local score=10
         local notes="Time conversion correct"
@@ -319,7 +451,8 @@ test_resistencia() {
         local input="Length=$length m, Radius=$radius m"
         local expected_output="Resistance calculation with given parameters"
         
-        local actual_output=$(printf "$length\n$radius" | "$student_dir/$executable" 2>&1)
+        run_test_case "$student_dir/$executable" "$length\n$radius"
+        local actual_output="$RUN_OUTPUT"
         local status="PASS"
         local score=10
         local notes="Resistance calculation successful"
@@ -345,7 +478,7 @@ test_resistencia() {
 main() {
     log "🚀 Starting C program test suite for $STUDENT_ID"
     log "📁 Testing directory: $STUDENT_DIR"
-    log "📊 Results will be saved to: $OUTPUT_CSV"
+    log "📊 Results will be saved to: $FINAL_CSV"
     
     # Test each program type
     local programs=("operaciones.c" "conversionCmsMts.c" "conversionSegsHMS.c" "resistencia.c")
@@ -355,6 +488,12 @@ main() {
     done
     
     log "✅ Completed testing for $STUDENT_ID"
+    workspace_publish "$OUTPUT_CSV" "$FINAL_CSV"
+    
+    # Archive the raw outputs for replay
+    if [ -z "$REPLAY_CORPUS" ] && [ "$TEST_CORPUS" != "0" ]; then
+        tar -czf "$WORK_DIR/corpus.tar.gz" -C "$CORPUS_DIR" . && workspace_publish "$WORK_DIR/corpus.tar.gz" "$CORPUS_FILE"
+    fi
     
     # Generate summary statistics
     local total_tests=$(tail -n +2 "$OUTPUT_CSV" | wc -l)
@@ -377,7 +516,7 @@ main() {
         echo "Score percentage: $(( (total_score * 100) / max_possible_score ))%"
     fi
     echo ""
-    echo "📄 Detailed results: $OUTPUT_CSV"
+    echo "📄 Detailed results: $FINAL_CSV"
 }
 
 # Run main function
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Pool de procesos pdflatex precalentados con preámbulo precompilado
+
+Casi todo el tiempo de un pdflatex en frío se va en cargar el formato y los
+paquetes del preámbulo, que es el mismo en todos los reportes. Dos piezas lo
+quitan del camino de cada reporte:
+
+  • Formato precompilado: todo lo que está antes de la línea %endofdump
+    (paquetes, colores, lstset) se vuelca una vez con `pdflatex -ini` a un
+    .fmt en GRADER_SCRATCH/grader_texfmt/, con nombre según el texto del
+    preámbulo y la versión de pdflatex. Los documentos se compilan con
+    -fmt y solo leen lo que sigue a la marca.
+  • Pool: pdflatex escribe un solo PDF por ejecución, así que cada hilo del
+    pool mantiene un proceso ya arrancado, con el formato cargado y detenido
+    en un \\read de la terminal. Un trabajo solo le escribe la ruta del .tex
+    por stdin, y en cuanto termina se arranca el reemplazo para el
+    siguiente. Un proceso que muere antes de recibir trabajo se reemplaza; uno
+    que excede el timeout se mata y el llamador recibe TimeoutExpired.
+
+compile_latex() es lo que usan generate_pdf.py y generate_test_pdf.py: con el
+pool iniciado (grader.py run/report/serve) el trabajo va a la cola; sin pool
+se lanza un pdflatex como antes, pero con el formato precompilado. Con
+TEX_FORMAT=0 no se usa el formato.
+
+Uso:
+  python3 tex_pool.py reporte.tex otro.tex -j 8   # compila .tex junto a sí mismos
+  python3 tex_pool.py --clear                      # borra los formatos guardados
+"""
+
+import os
+import sys
+import glob
+import time
+import queue
+import shutil
+import atexit
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future
+
+import tracing
+import workspace
+from manifest import tool_version
+
+# Marca de fin del preámbulo precompilable (la misma que usa mylatexformat)
+FORMAT_MARKER = '%endofdump'
+
+# Primera línea de un proceso del pool: lee la ruta del .tex desde stdin
+# (sin fin de línea) y ya en modo nonstop la compila
+READ_JOB = r'\endlinechar=-1 \read16 to\pooljob \endlinechar=13 \nonstopmode\input\pooljob'
+
+_format_lock = threading.Lock()
+_failed_formats = set()
+_pool = None
+
+
+def format_dir():
+    """Directorio de los .fmt; en tmpfs si GRADER_SCRATCH o /dev/shm lo permiten"""
+    return os.path.join(workspace.scratch_root(), 'grader_texfmt')
+
+
+def split_document(latex_content):
+    """(preámbulo precompilable, resto); el preámbulo es None si no hay marca"""
+    if os.environ.get('TEX_FORMAT', '1') == '0':
+        return None, latex_content
+    head, marker, rest = latex_content.partition(FORMAT_MARKER)
+    if not marker:
+        return None, latex_content
+    return head, rest
+
+
+def format_file(head):
+    """Ruta del .fmt para este preámbulo; lo genera si no existe. None si falla"""
+    version = tool_version('pdflatex') or ''
+    key = hashlib.sha1(f"{version}\n{head}".encode('utf-8')).hexdigest()[:16]
+    fmt = os.path.join(format_dir(), f"preamble-{key}.fmt")
+    if os.path.exists(fmt):
+        return fmt
+    with _format_lock:
+        if os.path.exists(fmt):
+            return fmt
+        if key in _failed_formats:
+            return None
+        if not build_format(head, fmt):
+            _failed_formats.add(key)
+            return None
+    return fmt
+
+
+def build_format(head, fmt):
+    """`pdflatex -ini "&pdflatex" preamble.tex` con \\dump al final; publica el .fmt con rename"""
+    name = os.path.splitext(os.path.basename(fmt))[0]
+    os.makedirs(os.path.dirname(fmt), exist_ok=True)
+    with workspace.scratch_dir('texfmt') as work_dir:
+        ini_file = os.path.join(work_dir, 'preamble.tex')
+        with open(ini_file, 'w', encoding='utf-8', errors='ignore') as f:
+            f.write(head + '\n\\dump\n')
+        cmd = ['pdflatex', '-ini', '-interaction=nonstopmode', f'-jobname={name}',
+               f'-output-directory={work_dir}', '&pdflatex', ini_file]
+        with tracing.span('tex_format', bytes_in=len(head.encode('utf-8'))) as sp:
+            try:
+                result = subprocess.run(cmd, cwd=work_dir, capture_output=True, text=True, timeout=120,
+                                        encoding='utf-8', errors='replace')
+                sp.status = result.returncode
+            except (OSError, subprocess.TimeoutExpired) as e:
+                sp.status = 1
+                print(f"⚠️  No se pudo precompilar el preámbulo: {e}")
+                return False
+            built = os.path.join(work_dir, f"{name}.fmt")
+            sp.bytes_out = tracing.file_size(built)
+        if result.returncode != 0 or not os.path.exists(built):
+            print(f"⚠️  No se pudo precompilar el preámbulo; se compila sin formato: {result.stdout[-300:]}")
+            return False
+        temp_path = f"{fmt}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(built, temp_path)
+        os.replace(temp_path, fmt)
+    return True
+
+
+def clear_formats():
+    """Borra los .fmt guardados; regresa cuántos"""
+    files = glob.glob(os.path.join(format_dir(), 'preamble-*.fmt'))
+    for path in files:
+        os.remove(path)
+    return len(files)
+
+
+def _job_files(latex_content, work_dir, base_name):
+    """Escribe <base>.tex (documento completo) y, si aplica, <base>-body.tex; regresa (fmt, archivo a compilar)"""
+    tex_file = os.path.join(work_dir, f"{base_name}.tex")
+    with open(tex_file, 'w', encoding='utf-8', errors='ignore') as f:
+        f.write(latex_content)
+    head, rest = split_document(latex_content)
+    fmt = format_file(head) if head is not None else None
+    if fmt is None:
+        return None, tex_file
+    body_file = os.path.join(work_dir, f"{base_name}-body.tex")
+    with open(body_file, 'w', encoding='utf-8', errors='ignore') as f:
+        f.write(rest)
+    return fmt, body_file
+
+
+def run_pdflatex(latex_content, work_dir, base_name, cwd='.', timeout=30):
+    """Un pdflatex por documento (sin pool), con el formato precompilado si existe"""
+    fmt, source = _job_files(latex_content, work_dir, base_name)
+    cmd = ['pdflatex']
+    if fmt:
+        cmd.append(f'-fmt={fmt}')
+    cmd += ['-interaction=nonstopmode', f'-jobname={base_name}', f'-output-directory={work_dir}', source]
+    return subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, timeout=timeout,
+                          encoding='utf-8', errors='replace')
+
+
+def compile_latex(latex_content, work_dir, base_name, cwd='.', timeout=30):
+    """Compila latex_content a <work_dir>/<base_name>.pdf (y .tex/.log)
+
+    cwd es el directorio desde el que se resuelven las rutas relativas del
+    documento (el logo). Regresa un CompletedProcess; lanza TimeoutExpired.
+    """
+    if _pool is not None:
+        return _pool.compile(latex_content, work_dir, base_name, cwd, timeout)
+    return run_pdflatex(latex_content, work_dir, base_name, cwd, timeout)
+
+
+class _Warm:
+    """Un pdflatex arrancado con un formato, esperando la ruta del trabajo en stdin"""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.out_dir = tempfile.mkdtemp(prefix='grader_texw_', dir=workspace.scratch_root())
+        self.console_path = os.path.join(self.out_dir, 'console.txt')
+        cmd = ['pdflatex'] + ([f'-fmt={fmt}'] if fmt else []) + \
+              ['-jobname=job', f'-output-directory={self.out_dir}', READ_JOB]
+        with open(self.console_path, 'w') as console:
+            self.process = subprocess.Popen(cmd, cwd=os.getcwd(), stdin=subprocess.PIPE, stdout=console,
+                                            stderr=subprocess.STDOUT, text=True, encoding='utf-8')
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, source, timeout):
+        """Envía el trabajo y espera; regresa (returncode, salida de la terminal)"""
+        try:
+            self.process.stdin.write(source + '\n')
+            self.process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            returncode = self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.discard()
+            raise
+        with open(self.console_path, encoding='utf-8', errors='replace') as f:
+            return returncode, f.read()
+
+    def discard(self):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        if self.process.stdin and not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+
+
+class TexPool:
+    """Hilos con un pdflatex precalentado cada uno, alimentados desde una cola"""
+
+    def __init__(self, size=None):
+        self.size = max(1, size or os.cpu_count() or 4)
+        self.jobs = queue.Queue()
+        self.threads = [threading.Thread(target=self._worker, name=f"tex-{i}", daemon=True)
+                        for i in range(self.size)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, latex_content, work_dir, base_name, cwd='.', timeout=30):
+        future = Future()
+        self.jobs.put((future, latex_content, work_dir, base_name, os.path.abspath(cwd), timeout))
+        return future
+
+    def compile(self, latex_content, work_dir, base_name, cwd='.', timeout=30):
+        return self.submit(latex_content, work_dir, base_name, cwd, timeout).result()
+
+    def close(self):
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def _worker(self):
+        warm = None
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                future = job[0]
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    warm, result = self._run(warm, *job[1:])
+                    future.set_result(result)
+                except BaseException as e:
+                    warm = None
+                    future.set_exception(e)
+        finally:
+            if warm is not None:
+                warm.discard()
+
+    def _run(self, warm, latex_content, work_dir, base_name, cwd, timeout):
+        """Un trabajo en el proceso precalentado; regresa (reemplazo, CompletedProcess)"""
+        fmt, source = _job_files(latex_content, work_dir, base_name)
+        # Otro preámbulo, o el proceso murió mientras esperaba: se reemplaza
+        if warm is not None and (warm.fmt != fmt or not warm.alive()):
+            warm.discard()
+            warm = None
+        if warm is None:
+            warm = _Warm(fmt)
+
+        # Las rutas relativas (el logo) se resuelven desde cwd aunque el proceso
+        # ya esté corriendo en otro directorio
+        job_file = os.path.join(warm.out_dir, 'input.tex')
+        with open(job_file, 'w', encoding='utf-8', errors='ignore') as f:
+            f.write(f"\\makeatletter\\def\\input@path{{{{{cwd}/}}}}\\makeatother\\input{{{source}}}\n")
+        try:
+            returncode, console = warm.run(job_file, timeout)
+            for ext in ('.pdf', '.log'):
+                produced = os.path.join(warm.out_dir, f"job{ext}")
+                if os.path.exists(produced):
+                    os.replace(produced, os.path.join(work_dir, f"{base_name}{ext}"))
+        finally:
+            warm.discard()
+        args = ['pdflatex'] + ([f'-fmt={fmt}'] if fmt else []) + [source]
+        return _Warm(fmt), subprocess.CompletedProcess(args, returncode, console, '')
+
+
+def start(size=None):
+    """Inicia el pool del proceso (si no está iniciado); size=0 lo deja apagado"""
+    global _pool
+    if size == 0 or _pool is not None or shutil.which('pdflatex') is None:
+        return _pool
+    _pool = TexPool(size)
+    atexit.register(stop)
+    return _pool
+
+
+def stop():
+    """Detiene el pool y mata los procesos en espera"""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def add_arguments(parser):
+    """--tex-workers para los subcomandos que generan reportes"""
+    parser.add_argument('--tex-workers', type=int, default=int(os.environ.get('TEX_WORKERS', os.cpu_count() or 4)),
+                        metavar='N', help='Procesos pdflatex precalentados (0 = uno nuevo por reporte; '
+                                          'por defecto: TEX_WORKERS o núcleos)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compila .tex con el pool de pdflatex precalentado')
+    parser.add_argument('tex_files', nargs='*', help='Documentos .tex; el PDF queda junto a cada uno')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Procesos del pool')
+    parser.add_argument('--clear', action='store_true', help='Borrar los formatos precompilados')
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"🧹 {clear_formats()} formatos borrados de {format_dir()}")
+    if not args.tex_files:
+        return
+    if start(args.jobs) is None:
+        print("❌ Error: pdflatex no está instalado")
+        sys.exit(1)
+
+    started = time.time()
+    failed = 0
+    with workspace.scratch_dir('latex') as work_dir:
+        futures = []
+        for i, tex_file in enumerate(args.tex_files):
+            with open(tex_file, encoding='utf-8', errors='ignore') as f:
+                latex_content = f.read()
+            base_name = f"doc{i}"
+            futures.append((tex_file, base_name, _pool.submit(latex_content, work_dir, base_name,
+                                                              os.path.dirname(tex_file) or '.')))
+        for tex_file, base_name, future in futures:
+            try:
+                future.result()
+            except subprocess.TimeoutExpired:
+                pass
+            scratch_pdf = os.path.join(work_dir, f"{base_name}.pdf")
+            if os.path.exists(scratch_pdf) and os.path.getsize(scratch_pdf) > 0:
+                output_file = os.path.splitext(tex_file)[0] + '.pdf'
+                workspace.publish(scratch_pdf, output_file)
+                print(f"✅ {output_file}")
+            else:
+                failed += 1
+                print(f"❌ {tex_file}")
+    stop()
+    print(f"🎉 {len(args.tex_files)} documentos en {time.time() - started:.1f} s con {args.jobs} procesos")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
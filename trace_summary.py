@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Resumen de trazas del pipeline de evaluación
+
+Lee el archivo JSONL escrito por tracing.py / tracing.sh (variable GRADER_TRACE),
+reporta p50/p95 por etapa y la ruta crítica por estudiante y del grupo.
+Con --chrome exporta el archivo en formato Chrome Trace (chrome://tracing, Perfetto).
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+
+
+def load_events(trace_path):
+    """Carga los eventos del archivo JSONL, ignorando líneas incompletas"""
+    events = []
+    with open(trace_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def build_spans(events):
+    """Empareja eventos B/E por proceso/hilo y devuelve spans cerrados y abiertos"""
+    stacks = defaultdict(list)
+    spans = []
+    for event in sorted(events, key=lambda e: e.get('ts', 0)):
+        key = (event.get('pid'), event.get('tid'))
+        if event.get('ph') == 'B':
+            stacks[key].append(event)
+        elif event.get('ph') == 'E':
+            stack = stacks[key]
+            # Buscar el B abierto más reciente con el mismo nombre
+            for index in range(len(stack) - 1, -1, -1):
+                if stack[index]['name'] == event['name']:
+                    begin = stack.pop(index)
+                    break
+            else:
+                continue
+            args = event.get('args', {})
+            spans.append({
+                'stage': event['name'],
+                'student': args.get('student') or begin.get('args', {}).get('student', ''),
+                'start': begin['ts'],
+                'end': event['ts'],
+                'duration_ms': (event['ts'] - begin['ts']) / 1000.0,
+                'status': args.get('status', 0),
+                'bytes_in': args.get('bytes_in', 0),
+                'bytes_out': args.get('bytes_out', 0),
+                'reason': args.get('reason'),
+            })
+    open_spans = [begin for stack in stacks.values() for begin in stack]
+    return spans, open_spans
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por interpolación lineal sobre una lista ordenada"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def stage_statistics(spans):
+    """p50/p95/total por etapa"""
+    durations = defaultdict(list)
+    failures = defaultdict(int)
+    for span in spans:
+        durations[span['stage']].append(span['duration_ms'])
+        if span['status']:
+            failures[span['stage']] += 1
+    stats = {}
+    for stage, values in durations.items():
+        values.sort()
+        stats[stage] = {
+            'count': len(values),
+            'failures': failures[stage],
+            'p50_ms': round(percentile(values, 0.5), 2),
+            'p95_ms': round(percentile(values, 0.95), 2),
+            'max_ms': round(values[-1], 2),
+            'total_ms': round(sum(values), 2),
+        }
+    return stats
+
+
+def critical_path(student_spans):
+    """Ruta crítica de un estudiante
+
+    Las etapas de primer nivel (no contenidas en otro span) se ejecutan en
+    secuencia; para cada una se indica el sub-proceso que domina su tiempo.
+    """
+    ordered = sorted(student_spans, key=lambda s: (s['start'], -s['end']))
+    top_level = []
+    for span in ordered:
+        if top_level and span['start'] >= top_level[-1]['start'] and span['end'] <= top_level[-1]['end']:
+            continue
+        top_level.append(span)
+
+    path = []
+    for parent in top_level:
+        children = defaultdict(float)
+        for span in ordered:
+            if span is not parent and span['start'] >= parent['start'] and span['end'] <= parent['end']:
+                children[span['stage']] += span['duration_ms']
+        dominant = max(children.items(), key=lambda item: item[1]) if children else None
+        path.append({
+            'stage': parent['stage'],
+            'duration_ms': round(parent['duration_ms'], 2),
+            'status': parent['status'],
+            'dominant_substage': dominant[0] if dominant else None,
+            'dominant_substage_ms': round(dominant[1], 2) if dominant else None,
+        })
+
+    wall_ms = (max(s['end'] for s in student_spans) - min(s['start'] for s in student_spans)) / 1000.0
+    return {'wall_ms': round(wall_ms, 2), 'path': path}
+
+
+def summarize(spans):
+    """Estadísticas por etapa, ruta crítica por estudiante y del grupo"""
+    by_student = defaultdict(list)
+    for span in spans:
+        by_student[span['student']].append(span)
+
+    students = {student: critical_path(student_spans) for student, student_spans in by_student.items()}
+
+    cohort = {}
+    if spans:
+        start = min(s['start'] for s in spans)
+        end = max(s['end'] for s in spans)
+        # El estudiante que termina al final determina la duración total de la corrida
+        last_student = max(by_student, key=lambda student: max(s['end'] for s in by_student[student]))
+        stage_share = defaultdict(float)
+        for result in students.values():
+            for step in result['path']:
+                stage_share[step['stage']] += step['duration_ms']
+        total = sum(stage_share.values()) or 1.0
+        cohort = {
+            'makespan_ms': round((end - start) / 1000.0, 2),
+            'students': len(by_student),
+            'critical_student': last_student,
+            'critical_path': students[last_student]['path'],
+            'stage_share': {stage: round(value / total, 4) for stage, value in
+                            sorted(stage_share.items(), key=lambda item: -item[1])},
+        }
+
+    return {
+        'stages': stage_statistics(spans),
+        'students': students,
+        'cohort': cohort,
+    }
+
+
+def write_chrome_trace(events, output_path):
+    """Exporta los eventos en el formato JSON que abre chrome://tracing"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def print_summary(summary, show_students):
+    print("⏱️  Tiempos por etapa")
+    print(f"{'Etapa':<14} {'N':>6} {'Fallas':>7} {'p50 ms':>10} {'p95 ms':>10} {'Total ms':>12}")
+    for stage, stats in sorted(summary['stages'].items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{stage:<14} {stats['count']:>6} {stats['failures']:>7} {stats['p50_ms']:>10.1f} "
+              f"{stats['p95_ms']:>10.1f} {stats['total_ms']:>12.1f}")
+
+    cohort = summary['cohort']
+    if cohort:
+        print("")
+        print(f"🎓 Grupo: {cohort['students']} estudiantes, duración total {cohort['makespan_ms'] / 1000:.1f} s")
+        print(f"   Ruta crítica ({cohort['critical_student']}):")
+        for step in cohort['critical_path']:
+            detail = f" ← {step['dominant_substage']} {step['dominant_substage_ms']:.1f} ms" if step['dominant_substage'] else ""
+            print(f"   • {step['stage']}: {step['duration_ms']:.1f} ms{detail}")
+        print("   Proporción del tiempo por etapa:")
+        for stage, share in cohort['stage_share'].items():
+            print(f"   • {stage}: {share * 100:.1f}%")
+
+    if show_students:
+        print("")
+        for student, result in sorted(summary['students'].items()):
+            path = " → ".join(f"{step['stage']} {step['duration_ms']:.0f}ms" for step in result['path'])
+            print(f"{student}: {result['wall_ms']:.0f} ms | {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resumen de trazas del pipeline de evaluación')
+    parser.add_argument('trace_file', nargs='?', default=os.environ.get('GRADER_TRACE'),
+                        help='Archivo JSONL de trazas (por defecto: $GRADER_TRACE)')
+    parser.add_argument('--json', dest='json_output', help='Guardar el resumen completo en JSON')
+    parser.add_argument('--chrome', help='Exportar en formato Chrome Trace a este archivo')
+    parser.add_argument('--students', action='store_true', help='Mostrar la ruta crítica de cada estudiante')
+    args = parser.parse_args()
+
+    if not args.trace_file or not os.path.exists(args.trace_file):
+        print("Error: archivo de trazas no encontrado (usa GRADER_TRACE o pásalo como argumento)")
+        sys.exit(1)
+
+    events = load_events(args.trace_file)
+    spans, open_spans = build_spans(events)
+    summary = summarize(spans)
+    summary['open_spans'] = [{'stage': e['name'], 'student': e.get('args', {}).get('student', '')} for e in open_spans]
+
+    print_summary(summary, args.students)
+    if open_spans:
+        print(f"\n⚠️  {len(open_spans)} spans sin cerrar (proceso interrumpido)")
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+        print(f"\n📄 Resumen JSON: {args.json_output}")
+    if args.chrome:
+        write_chrome_trace(events, args.chrome)
+        print(f"📄 Chrome trace: {args.chrome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Spans de tiempo para el pipeline de evaluación
+
+Cada etapa escribe eventos "B"/"E" en formato Chrome Trace (una línea JSON por
+evento) al archivo indicado en la variable de entorno GRADER_TRACE. Si la
+variable no está definida no se escribe nada. tracing.sh escribe el mismo
+formato desde los scripts de bash.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_context = threading.local()
+
+
+def trace_file():
+    """Ruta del archivo de trazas, o None si el trazado está desactivado"""
+    return os.environ.get('GRADER_TRACE') or None
+
+
+def _write_event(event):
+    path = trace_file()
+    if not path:
+        return
+    line = json.dumps(event, ensure_ascii=False) + '\n'
+    with _lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def _event(phase, stage, args):
+    return {
+        'name': stage,
+        'cat': 'grader',
+        'ph': phase,
+        'ts': time.time_ns() // 1000,
+        'pid': os.getpid(),
+        'tid': threading.get_native_id(),
+        'args': args,
+    }
+
+
+def set_student(student):
+    """Estudiante por omisión para los spans del hilo actual (etapas en proceso)"""
+    _context.student = student
+
+
+def current_student():
+    return getattr(_context, 'student', None) or os.environ.get('TRACE_STUDENT', '')
+
+
+class Span:
+    """Datos que la etapa puede completar antes de cerrar el span"""
+
+    def __init__(self, stage, student):
+        self.stage = stage
+        self.student = student
+        self.status = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.reason = None
+
+
+@contextmanager
+def span(stage, student=None, bytes_in=0):
+    """Envuelve una etapa en un span; una excepción marca status=1"""
+    student = student or current_student()
+    current = Span(stage, student)
+    current.bytes_in = bytes_in
+    _write_event(_event('B', stage, {'student': student}))
+    try:
+        yield current
+    except BaseException as e:
+        if current.status == 0:
+            current.status = 1
+        current.reason = current.reason or type(e).__name__
+        raise
+    finally:
+        args = {
+            'student': student,
+            'status': current.status,
+            'bytes_in': current.bytes_in,
+            'bytes_out': current.bytes_out,
+        }
+        if current.reason:
+            args['reason'] = current.reason
+        _write_event(_event('E', stage, args))
+
+
+def file_size(path):
+    """Tamaño de un archivo en bytes, 0 si no existe"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -0,0 +1,53 @@
+#!/bin/bash
+
+# Spans de tiempo para los scripts de bash (mismo formato que tracing.py)
+# Uso: source ./tracing.sh
+#   trace_begin <etapa>
+#   trace_end <etapa> <status> [bytes_in] [bytes_out] [motivo]
+# Solo escribe si GRADER_TRACE apunta a un archivo. El estudiante se toma de TRACE_STUDENT.
+
+# Marca de tiempo en microsegundos
+trace_now_us() {
+    if [ -n "$EPOCHREALTIME" ]; then
+        local now="${EPOCHREALTIME/[.,]/}"
+        echo "$now"
+    else
+        echo "$(date +%s)000000"
+    fi
+}
+
+trace_event() {
+    local phase="$1"
+    local stage="$2"
+    local args="$3"
+    [ -z "$GRADER_TRACE" ] && return 0
+    local student="${TRACE_STUDENT//\"/}"
+    printf '{"name":"%s","cat":"grader","ph":"%s","ts":%s,"pid":%s,"tid":%s,"args":{"student":"%s"%s}}\n' \
+        "$stage" "$phase" "$(trace_now_us)" "$BASHPID" "$BASHPID" "$student" "$args" >> "$GRADER_TRACE"
+}
+
+trace_begin() {
+    trace_event "B" "$1" ""
+}
+
+trace_end() {
+    local stage="$1"
+    local status="${2:-0}"
+    local bytes_in="${3:-0}"
+    local bytes_out="${4:-0}"
+    local reason="$5"
+    local args=",\"status\":$status,\"bytes_in\":$bytes_in,\"bytes_out\":$bytes_out"
+    if [ -n "$reason" ]; then
+        args="$args,\"reason\":\"${reason//\"/}\""
+    fi
+    trace_event "E" "$stage" "$args"
+}
+
+# Tamaño de un archivo en bytes (0 si no existe o si el trazado está desactivado)
+trace_size() {
+    if [ -n "$GRADER_TRACE" ] && [ -f "$1" ]; then
+        wc -c < "$1" | tr -d ' '
+    else
+        echo 0
+    fi
+}
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Modo vigilancia: re-califica solo las entregas que cambian
+
+Durante la ventana de entrega los estudiantes suben nuevas versiones a
+<id>/TAREA01/. Este proceso vigila esos directorios con inotify (o, si no está
+disponible, revisando mtime y tamaño cada pocos segundos), agrupa las ráfagas
+de escrituras de un mismo estudiante (debounce) y, cuando el estudiante deja de
+escribir, ejecuta score → test → report solo para él. El manifiesto decide qué
+etapas están al día y test.sh solo vuelve a ejecutar los programas cuyo .c
+cambió. Después de cada tanda se actualizan los CSVs consolidados y las
+estadísticas del grupo.
+
+Un reenvío tarda unos segundos más una llamada al LLM, en lugar de una corrida
+completa de all.sh.
+"""
+
+import os
+import sys
+import glob
+import time
+import errno
+import ctypes
+import select
+import struct
+import argparse
+import ctypes.util
+
+import grader
+import tex_pool
+
+WATCHED_SUFFIXES = ('.c', '.h')
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+EVENT_HEADER = struct.Struct('iIII')
+
+FILE_EVENTS = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+DIR_EVENTS = IN_CREATE | IN_MOVED_TO
+
+
+class InotifyWatcher:
+    """Eventos de inotify vía ctypes: raíz, <id>/ y <id>/TAREA01/"""
+
+    def __init__(self, base_dir, ignored):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify no disponible')
+        self.libc = libc
+        self.base_dir = os.path.abspath(base_dir)
+        self.ignored = {os.path.abspath(path) for path in ignored}
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.watches = {}
+        self._add(self.base_dir, DIR_EVENTS)
+        for entry in sorted(os.listdir(self.base_dir)):
+            self._add_student(entry)
+
+    def _add(self, path, mask):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, 'límite de inotify alcanzado (fs.inotify.max_user_watches)')
+            return None
+        self.watches[wd] = path
+        return wd
+
+    def _add_student(self, student_id):
+        """Vigila <id>/ (para cuando aparezca TAREA01/) y <id>/TAREA01/ si ya existe"""
+        student_path = os.path.join(self.base_dir, student_id)
+        if student_id.startswith('.') or student_path in self.ignored or not os.path.isdir(student_path):
+            return False
+        self._add(student_path, DIR_EVENTS)
+        tarea_path = os.path.join(student_path, 'TAREA01')
+        return os.path.isdir(tarea_path) and self._add(tarea_path, FILE_EVENTS) is not None
+
+    def wait(self, timeout):
+        """Estudiantes con cambios; espera hasta timeout segundos (None: sin límite)"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_len].rstrip(b'\0'))
+            offset += EVENT_HEADER.size + name_len
+            if mask & IN_Q_OVERFLOW:
+                print("⚠️  Cola de inotify desbordada: se revisa a todo el grupo")
+                changed.update(grader.discover_students(self.base_dir))
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            path = self.watches.get(wd)
+            if path is None:
+                continue
+            if path == self.base_dir:
+                if mask & IN_ISDIR and self._add_student(name):
+                    changed.add(name)
+            elif os.path.dirname(path) == self.base_dir:
+                if mask & IN_ISDIR and name == 'TAREA01':
+                    self._add(os.path.join(path, name), FILE_EVENTS)
+                    changed.add(os.path.basename(path))
+            elif name.endswith(WATCHED_SUFFIXES):
+                changed.add(os.path.basename(os.path.dirname(path)))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Respaldo sin inotify: compara mtime y tamaño de */TAREA01/*.c|*.h cada intervalo"""
+
+    def __init__(self, base_dir, interval):
+        self.base_dir = base_dir
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for suffix in WATCHED_SUFFIXES:
+            for path in glob.glob(os.path.join(self.base_dir, '*', 'TAREA01', f"*{suffix}")):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if remaining > 0:
+                time.sleep(remaining)
+            current = self._scan()
+            changed = {os.path.basename(os.path.dirname(os.path.dirname(path)))
+                       for path in set(current) | set(self.snapshot)
+                       if current.get(path) != self.snapshot.get(path)}
+            self.snapshot = current
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(base_dir, args):
+    if not args.poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(base_dir, [args.scores_dir, args.logs_dir])
+        except OSError as e:
+            print(f"⚠️  inotify no disponible ({e}); se revisa cada {args.interval:g} s")
+    return PollingWatcher(base_dir, args.interval)
+
+
+def regrade(students, first_seen, args):
+    """Etapas pendientes de los estudiantes listos y, después, los agregados del grupo"""
+    students = [s for s in students if os.path.isdir(os.path.join(s, 'TAREA01'))]
+    if not students:
+        return
+    print(f"🔄 Re-calificando: {', '.join(students)}")
+    failed = grader.run_students(students, grader.STAGES, args)
+    if not args.no_aggregate:
+        grader.command_aggregate(args)
+    now = time.monotonic()
+    for student_id in students:
+        mark = '❌' if student_id in failed else '✅'
+        print(f"{mark} {student_id}: {now - first_seen[student_id]:.1f} s desde el cambio")
+
+
+def watch(args):
+    """Ciclo principal: junta eventos por estudiante y re-califica al terminar la ráfaga"""
+    os.makedirs(args.scores_dir, exist_ok=True)
+    watcher = make_watcher('.', args)
+    backend = 'inotify' if isinstance(watcher, InotifyWatcher) else 'sondeo'
+    if not args.no_initial:
+        students = grader.discover_students()
+        print(f"🔎 Poniendo al día a {len(students)} estudiantes antes de vigilar...")
+        grader.run_students(students, grader.STAGES, args)
+        if not args.no_aggregate:
+            grader.command_aggregate(args)
+    print(f"👀 Vigilando */TAREA01/ con {backend} (debounce {args.debounce:g} s, Ctrl+C para salir)")
+
+    last_event = {}
+    first_seen = {}
+    try:
+        while True:
+            timeout = None
+            if last_event:
+                timeout = max(0.0, min(last_event.values()) + args.debounce - time.monotonic())
+            changed = watcher.wait(timeout)
+            now = time.monotonic()
+            for student_id in changed:
+                last_event[student_id] = now
+                first_seen.setdefault(student_id, now)
+            now = time.monotonic()
+            ready = sorted(s for s, seen in last_event.items() if now - seen >= args.debounce)
+            if ready:
+                for student_id in ready:
+                    del last_event[student_id]
+                regrade(ready, first_seen, args)
+                for student_id in ready:
+                    first_seen.pop(student_id, None)
+    except KeyboardInterrupt:
+        print("\n👋 Vigilancia detenida")
+    finally:
+        watcher.close()
+    return 0
+
+
+def add_arguments(parser):
+    parser.add_argument('-d', '--scores-dir', default='scores', help='Directorio de resultados (por defecto: scores)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 4, help='Estudiantes en paralelo')
+    parser.add_argument('--debounce', type=float, default=2.0,
+                        help='Segundos sin escrituras antes de re-calificar a un estudiante (por defecto: 2)')
+    parser.add_argument('--poll', action='store_true', help='Revisar mtime periódicamente en lugar de usar inotify')
+    parser.add_argument('--interval', type=float, default=2.0, help='Intervalo de sondeo en segundos (por defecto: 2)')
+    parser.add_argument('--no-initial', action='store_true', help='No poner al día al grupo antes de empezar a vigilar')
+    parser.add_argument('--partials', action='store_true', help='Generar también los PDFs parciales')
+    parser.add_argument('--logs-dir', default='_logs', help='Logs por estudiante (por defecto: _logs)')
+    parser.add_argument('--no-aggregate', action='store_true', help='No actualizar CSVs consolidados ni estadísticas')
+    tex_pool.add_arguments(parser)
+    parser.set_defaults(force=[])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Re-califica automáticamente las entregas que cambian')
+    add_arguments(parser)
+    sys.exit(watch(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
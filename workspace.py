@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Directorio de trabajo temporal y publicación atómica de artefactos
+
+Los intermedios (.tex, .aux, .log, ejecutables) se escriben en un directorio
+por trabajo bajo GRADER_SCRATCH, o en /dev/shm (tmpfs) si existe. Solo los
+artefactos finales se publican en scores/: se copian a un archivo temporal en
+el directorio destino y se renombran, de modo que un lector nunca ve un PDF a
+medio escribir. Con GRADER_KEEP_TEX=1 se conservan el .tex y el .log junto al
+PDF para depurar. workspace.sh ofrece lo mismo para los scripts de bash.
+"""
+
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+def scratch_root():
+    """Raíz de los directorios temporales: GRADER_SCRATCH, /dev/shm o el temporal del sistema"""
+    root = os.environ.get('GRADER_SCRATCH')
+    if root:
+        os.makedirs(root, exist_ok=True)
+        return root
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def keep_debug_files():
+    """True si se deben conservar .tex y .log junto a los artefactos"""
+    return os.environ.get('GRADER_KEEP_TEX', '0') == '1'
+
+
+@contextmanager
+def scratch_dir(prefix='job'):
+    """Directorio temporal exclusivo del trabajo; se borra al salir"""
+    path = tempfile.mkdtemp(prefix=f"grader_{prefix}_", dir=scratch_root())
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def publish(source, dest):
+    """Copia source a dest de forma atómica (temporal en el directorio destino + rename)"""
+    directory = os.path.dirname(dest) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(dest)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as out, open(source, 'rb') as src:
+            shutil.copyfileobj(src, out)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, dest)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return dest
+
+
+def write_text(dest, text):
+    """Escribe un archivo de texto de forma atómica"""
+    directory = os.path.dirname(dest) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(dest)}.", suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', errors='ignore') as out:
+            out.write(text)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, dest)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return dest
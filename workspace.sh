@@ -0,0 +1,34 @@
+#!/bin/bash
+
+# Directorio de trabajo temporal y publicación atómica (mismo esquema que workspace.py)
+# Uso: source ./workspace.sh
+#   WORK_DIR=$(workspace_dir <prefijo>)     # en GRADER_SCRATCH, /dev/shm o TMPDIR
+#   workspace_publish <origen> <destino>    # copia a <destino>.tmp.<pid> y renombra
+
+# Raíz de los directorios temporales: GRADER_SCRATCH, o tmpfs si existe
+workspace_root() {
+    if [ -n "$GRADER_SCRATCH" ]; then
+        echo "$GRADER_SCRATCH"
+    elif [ -d /dev/shm ] && [ -w /dev/shm ]; then
+        echo "/dev/shm"
+    else
+        echo "${TMPDIR:-/tmp}"
+    fi
+}
+
+workspace_dir() {
+    local root
+    root=$(workspace_root)
+    mkdir -p "$root"
+    mktemp -d "${root%/}/grader_${1:-job}_XXXXXX"
+}
+
+# El rename ocurre dentro del directorio destino, así que los lectores ven el
+# archivo anterior o el nuevo completo, nunca uno a medio escribir
+workspace_publish() {
+    local source="$1"
+    local dest="$2"
+    local temp="${dest}.tmp.$$"
+    mkdir -p "$(dirname "$dest")"
+    cp "$source" "$temp" && mv -f "$temp" "$dest"
+}